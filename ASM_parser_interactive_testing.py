@@ -1,6 +1,55 @@
+import os
+import time
+
 from CPU_ASM_parser import program
 
 hardcode_file_path = False
+# Seconds between checks of a watched file for changes
+watch_interval_global = 0.25
+
+def watch_file(file_path):
+    """
+    Parses the file again every time it changes until stopped with Ctrl+C
+    The parsing is incremental(see CPU_ASM_parser.program.reparse) so only the blocks that were edited get parsed again
+    Only a summary of each parse is printed as the full instructions of a big program would take longer to print than to parse
+    """
+    print("Watching "+file_path+" for changes, press Ctrl+C to stop")
+    asm_out = None
+    last_stamp = None
+    try:
+        while True:
+            try:
+                file_stat = os.stat(file_path)
+                stamp = (file_stat.st_mtime_ns, file_stat.st_size)
+            except OSError:
+                # The file can briefly disappear while an editor saves it
+                stamp = None
+            if stamp != None and stamp != last_stamp:
+                last_stamp = stamp
+                start_time = time.perf_counter()
+                try:
+                    with open(file_path, "r") as asm_file:
+                        if asm_out == None:
+                            asm_out = program(asm_file, incremental = True)
+                        else:
+                            asm_out = asm_out.reparse(asm_file)
+                    elapsed = time.perf_counter() - start_time
+                    instruction_count = 0
+                    for block_id in asm_out.block_ids:
+                        instruction_count = instruction_count + len(asm_out.program_instructions[block_id])
+                    print("-----")
+                    print("Parsed "+str(asm_out.line_count)+" lines in "+str(round(elapsed * 1000, 1))+"ms: "+str(len(asm_out.block_ids))+" blocks, "+str(instruction_count)+" instructions")
+                    print("Sections reused: "+str(asm_out.reused_sections)+", parsed: "+str(asm_out.parsed_sections))
+                except Exception as e:
+                    # The last program that parsed is kept so the next parse can still reuse its blocks
+                    print("-----")
+                    print("!!!Failed parsing!!!")
+                    print("Error below")
+                    print(type(e))
+                    print(e)
+            time.sleep(watch_interval_global)
+    except KeyboardInterrupt:
+        print("Stopped watching "+file_path)
 
 def main():
     exit_enable = False
@@ -14,12 +63,15 @@ def main():
                 file_path = r"""INSERT_HARD_CODED_FILE_PATH"""
             else:
                 file_path = input("File path to ASM?")
-            with open(file_path, "r") as asm_file:
-                file_string = asm_file.read()
-            split_asm_lines = file_string.splitlines()
+            watch = input("Watch the file for changes? ")
+            if watch.upper() in ["Y", "YES"]:
+                watch_file(file_path)
+                continue
             success = False
             try:
-                asm_out = program(split_asm_lines)
+                # The file is streamed into the parser instead of being read into memory
+                with open(file_path, "r") as asm_file:
+                    asm_out = program(asm_file)
                 success = True
             except Exception as e:
                 print("!!!Failed parsing!!!")
@@ -1,9 +1,358 @@
+import re
+
 data_prefixes_global = ["0b", "0d", "0x"]
 special_named_registers_global = ["CARRY", "MEMAD"]
 register_prefix_global = "R_"
+# Block IDs that are reserved for internal use
+reserved_block_IDs_global = {"NO_BLOCK_ID", "END"}
+# Base of the number after each data prefix
+data_bases_global = {"0b": 2, "0d": 10, "0x": 16}
+# Full data literals of each data prefix, note that we tolerate both capital and lower case A-F for hexadecimal
+data_patterns_global = {"0b": re.compile("0b[01]*\\Z"),
+                        "0d": re.compile("0d[0-9]*\\Z"),
+                        "0x": re.compile("0x[0-9a-fA-F]*\\Z")}
+# Reason given for a data literal with a valid prefix but a character that does not fit it
+data_character_reasons_global = {"0b": "nonbinary character detected",
+                                 "0d": "nondecimal character detected",
+                                 "0x": "nonhexadecimal character detected"}
+
+# Kinds of operands an instruction can take
+register_operand_global = "register"
+# Any register including MEMAD
+register_or_MEMAD_operand_global = "register or MEMAD"
+data_operand_global = "data"
+block_operand_global = "block"
+
+# FORM of every instruction(other than BLOCK, which declares blocks instead of adding an instruction) as the kinds of its operands in order
+# Instructions with a single operand keep the operand itself instead of a tuple in program_instructions
+instruction_forms_global = {
+    # FORM: END
+    # Ends the execution
+    "END": (),
+    # FORM: JMP NAME
+    # Unconditional jump to the indicated block
+    "JMP": (block_operand_global,),
+    # FORM: JNE REG_1 REG_2 NAME
+    # Jump to the indicated block if the contents of the two registers are different
+    "JNE": (register_operand_global, register_operand_global, block_operand_global),
+    # FORM: JIE REG_1 REG_2 NAME
+    # Jump to the indicated block if the contents of the two registers are same
+    "JIE": (register_operand_global, register_operand_global, block_operand_global),
+    # FORM: CMP REG_1 REG_2 REG_3 REG_4 REG_5
+    # Compare REG_1 and REG_2 contents
+    # If the two match, REG_5 will be set to the contents of REG_3, else it will be set to the contents of REG_4
+    "CMP": (register_operand_global, register_operand_global, register_operand_global, register_operand_global, register_operand_global),
+    # FORM: GT REG_1 REG_2 REG_3 REG_4 REG_5
+    # Compare REG_1 and REG_2 contents as unsigned integers
+    # If REG_1 is greater than REG_2, REG_5 will be set to the contents of REG_3, else it will be set to the contents of REG_4
+    "GT": (register_operand_global, register_operand_global, register_operand_global, register_operand_global, register_operand_global),
+    # FORM: LT REG_1 REG_2 REG_3 REG_4 REG_5
+    # Compare REG_1 and REG_2 contents as unsigned integers
+    # If REG_1 is less than REG_2, REG_5 will be set to the contents of REG_3, else it will be set to the contents of REG_4
+    "LT": (register_operand_global, register_operand_global, register_operand_global, register_operand_global, register_operand_global),
+    # FORM: ADD REG_1 REG_2 REG_3
+    # Perform an unsigned addition of REG_1 and REG_2
+    # The results of the addition will be written to REG_3
+    # Any overflow(or no overflow) will be written to the CARRY register
+    "ADD": (register_operand_global, register_operand_global, register_operand_global),
+    # FORM: MUL REG_1 REG_2 REG_3
+    # Perform an unsigned multiplication of REG_1 and REG_2
+    # The results of the multiplication will be written to REG_3
+    # Any overflow will be discarded
+    "MUL": (register_operand_global, register_operand_global, register_operand_global),
+    # FORM: SHUP REG_1 REG_2 REG_3
+    # Perform a shift of REG_2 bits on REG_1 towards the most significant bit
+    # The results of the shift will be written to REG_3
+    # Any overflow will be discarded
+    "SHUP": (register_operand_global, register_operand_global, register_operand_global),
+    # FORM: SHDO REG_1 REG_2 REG_3
+    # Perform a shift of REG_2 bits on REG_1 towards the least significant bit
+    # The results of the shift will be written to REG_3
+    # Any underflow will be discarded
+    "SHDO": (register_operand_global, register_operand_global, register_operand_global),
+    # FORM: NOT REG_1 REG_2
+    # Perform a bitwise NOT (negation) of REG_1
+    # The result will be written to REG_2
+    "NOT": (register_operand_global, register_operand_global),
+    # FORM: AND REG_1 REG_2 REG_3
+    # Perform a bitwise AND of REG_1 and REG_2
+    # The result will be written to REG_3
+    "AND": (register_operand_global, register_operand_global, register_operand_global),
+    # FORM: OR REG_1 REG_2 REG_3
+    # Perform a bitwise OR of REG_1 and REG_2
+    # The result will be written to REG_3
+    "OR": (register_operand_global, register_operand_global, register_operand_global),
+    # FORM: XOR REG_1 REG_2 REG_3
+    # Perform a bitwise XOR of REG_1 and REG_2
+    # The result will be written to REG_3
+    "XOR": (register_operand_global, register_operand_global, register_operand_global),
+    # FORM: LOAD REG_1
+    # Takes the current memory address in the special register MEMAD and loads the contents of the memory at said address into REG_1
+    "LOAD": (register_operand_global,),
+    # FORM: STORE REG_1
+    # Stores the contents of REG_1 into the memory address in the special register MEMAD
+    "STORE": (register_operand_global,),
+    # FORM: SET REG_1 DATA
+    # Sets REG_1 to the specified data
+    "SET": (register_operand_global, data_operand_global),
+    # FORM: COPY REG_1 REG_2
+    # Copies the contents from REG_1 to REG_2
+    "COPY": (register_operand_global, register_operand_global),
+    # FORM: SETMEMAD DATA
+    # Sets the special register MEMAD to data
+    "SETMEMAD": (data_operand_global,),
+    # FORM: ADDMEMAD REG_1
+    # Adds the contents of REG_1 to the special register MEMAD
+    # NOTE: You can use the MEMAD register in this instruction unlike other instructions
+    # This allows you to double the currently stored memory address
+    "ADDMEMAD": (register_or_MEMAD_operand_global,),
+}
+
+def operand_signature(form):
+    """
+    Returns the operand signature of an instruction FORM as a tuple of (kind, name used in errors) for every operand
+    Registers are named REG_1, REG_2, ... in order, data is named DATA and blocks are named block ID
+    """
+    signature = list()
+    register_number = 0
+    for kind in form:
+        if kind == register_operand_global or kind == register_or_MEMAD_operand_global:
+            register_number = register_number + 1
+            signature.append((kind, "REG_"+str(register_number)))
+        elif kind == data_operand_global:
+            signature.append((kind, "DATA"))
+        else:
+            signature.append((kind, "block ID"))
+    return(tuple(signature))
+
+# Operand signature of every instruction, see operand_signature
+instruction_signatures_global = {instruction_name: operand_signature(instruction_forms_global[instruction_name]) for instruction_name in instruction_forms_global}
+
+class block_parser():
+    def __init__(self, assembly_string_lines = None):
+        """
+        Parses assembly one line at a time for program, assembly_string_lines can be any iterable of lines and is only iterated over once
+        Trailing line breaks(as left by iterating over a file) are ignored
+        """
+        self.assembly_string_lines = assembly_string_lines
+        # The declared blocks in order, and a set of them to quickly look up and see what blocks there are
+        self.block_ids = list()
+        self.declared_blocks_set = set()
+        # (target block ID, line index) of every jump in line order, the targets must be declared by the end
+        self.jumps = list()
+        # Amount of lines that were read, set once all of them were parsed
+        self.line_count = 0
+    def blocks(self):
+        """
+        Generator of (block ID, instructions, source lines) for every block in the order they were declared, where instructions and source lines are the dicts of the block in program.program_instructions and program.source_lines
+        Every block is handed out as soon as it is complete, ie when the next block is declared or the lines run out
+        The checks that need every block(a START block exists and every jump target was declared) are done after the last block was handed out, so a ValueError can still be raised at the end
+        """
+        for block in self.parse_lines(self.assembly_string_lines):
+            yield block
+        self.check_blocks()
+    def parse_lines(self, assembly_string_lines, first_line_index = 0):
+        """
+        Works like blocks for the given lines(numbered from first_line_index) but without the checks that need every block
+        The declared blocks and jumps are kept across calls so the lines of a program can be parsed in several parts(see program.reparse)
+        """
+        declared_blocks = self.block_ids
+        declared_blocks_set = self.declared_blocks_set
+        jumps = self.jumps
+        instruction_signatures = instruction_signatures_global
+        special_named_registers = set(special_named_registers_global)
+        data_patterns = data_patterns_global
+        data_bases = data_bases_global
+        # Assembly before the first block is parsed into these, which are never handed out so that it gets removed from the final result
+        current_block_ID = None
+        current_block_instructions = dict()
+        current_block_source_lines = dict()
+        block_assembly_number = 0
+        line_index = first_line_index - 1
+        for line_index, assembly_line in enumerate(assembly_string_lines, first_line_index):
+            # Lines read from a file still end with their line break
+            assembly_line = assembly_line.rstrip("\r\n")
+            if assembly_line == "" or assembly_line[0] == "#":
+                continue
+            # Splitting on whitespace never leaves empty strings in the list
+            assembly_line_parameters = assembly_line.split()
+            if assembly_line_parameters == []:
+                continue
+            # There is at least 1 item which will be our prefix
+            prefix = assembly_line_parameters[0]
+            signature = instruction_signatures.get(prefix)
+            if signature == None:
+                if prefix != "BLOCK":
+                    fmt_string = """Invalid prefix found on assembly line {line_index_value}. The invalid prefix was: "{faulty_prefix}"."""
+                    error_string = fmt_string.format(line_index_value = line_index, faulty_prefix = prefix)
+                    raise ValueError(error_string)
+                # FORM: BLOCK NAME
+                # Declares a new unique block of assembly
+                # Name must not collide with registers (which start with R_ or are one of the few named registers)
+                # Name may be any string that does not contain spaces or new lines
+                # Do be careful though about the extent which you stretch the above
+                if len(assembly_line_parameters) != 2:
+                    fmt_string = """Invalid block declaration with an incorrect amount ({argument_amount}) of arguments on line {line_index_value}. There should be 2 arguments. Declaration was: {invalid_block_declaration} ."""
+                    error_string = fmt_string.format(argument_amount = len(assembly_line_parameters), line_index_value = line_index, invalid_block_declaration = assembly_line)
+                    raise ValueError(error_string)
+                block_ID = assembly_line_parameters[1]
+                block_ID_allowed, reason = validate_block_ID(block_ID)
+                if block_ID_allowed == False:
+                    fmt_string = """Encountered invalid block ID in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
+                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
+                    raise ValueError(error_string)
+                if block_ID in declared_blocks_set:
+                    fmt_string = """Encountered invalid block ID in line {line_index_value}. Reason: block ID already declared. Block ID provided was {invalid_block_id} ."""
+                    error_string = fmt_string.format(line_index_value = line_index, invalid_block_id = block_ID)
+                    raise ValueError(error_string)
+                # Alright, this is a valid block ID, the previous block is complete and we can configure the state of the parser to handle the new block of assembly
+                if current_block_ID != None:
+                    yield (current_block_ID, current_block_instructions, current_block_source_lines)
+                declared_blocks.append(block_ID)
+                declared_blocks_set.add(block_ID)
+                current_block_ID = block_ID
+                current_block_instructions = dict()
+                current_block_source_lines = dict()
+                block_assembly_number = 0
+                continue
+            if len(assembly_line_parameters) != len(signature) + 1:
+                if len(signature) == 0:
+                    expected_arguments = "1 argument"
+                else:
+                    expected_arguments = str(len(signature) + 1) + " arguments"
+                fmt_string = """Invalid {instruction} instruction with an incorrect amount ({argument_amount}) of arguments on line {line_index_value}. There should be {expected_arguments}. The line was: {invalid_line}."""
+                error_string = fmt_string.format(instruction = prefix, argument_amount = len(assembly_line_parameters), line_index_value = line_index, expected_arguments = expected_arguments, invalid_line = assembly_line)
+                raise ValueError(error_string)
+            operands = assembly_line_parameters[1:]
+            operand_number = 0
+            for kind, operand_name in signature:
+                operand = operands[operand_number]
+                # The common valid cases are checked inline, the validate_* functions are only called to get the reason of an invalid operand
+                if kind == register_operand_global:
+                    if operand[0:2] != register_prefix_global and (operand not in special_named_registers or operand == "MEMAD"):
+                        operand_allowed, reason = validate_register(operand)
+                        raise_invalid_operand(operand_name, reason, line_index, assembly_line)
+                elif kind == data_operand_global:
+                    data_pattern = data_patterns.get(operand[0:2])
+                    if data_pattern == None or data_pattern.match(operand) == None:
+                        operand_allowed, reason = validate_data(operand)
+                        raise_invalid_operand(operand_name, reason, line_index, assembly_line)
+                    # Pad with a zero because we may have an empty number like "0b"
+                    operands[operand_number] = int("0" + operand[2:], data_bases[operand[0:2]])
+                elif kind == block_operand_global:
+                    operand_allowed, reason = validate_block_ID(operand)
+                    if operand_allowed == False:
+                        raise_invalid_operand(operand_name, reason, line_index, assembly_line)
+                    jumps.append((operand, line_index))
+                else:
+                    operand_allowed, reason = validate_register(operand, no_MEMAD = False)
+                    if operand_allowed == False:
+                        raise_invalid_operand(operand_name, reason, line_index, assembly_line)
+                operand_number = operand_number + 1
+            if len(operands) == 1:
+                parameters = operands[0]
+            else:
+                parameters = tuple(operands)
+            instruction_number = str(block_assembly_number)
+            current_block_instructions[instruction_number] = (prefix, parameters)
+            # Remember the line the instruction came from
+            current_block_source_lines[instruction_number] = line_index
+            block_assembly_number = block_assembly_number + 1
+        self.line_count = line_index + 1
+        if current_block_ID != None:
+            yield (current_block_ID, current_block_instructions, current_block_source_lines)
+    def add_block(self, block_ID, line_index, jumps):
+        """
+        Declares a block that was parsed before(see program.reparse) with its BLOCK line at line_index, jumps is a list of (target block ID, line index) of the jumps in it
+        block_ID is None for the lines before the first block, which only add their jumps
+        """
+        if block_ID == None:
+            self.jumps.extend(jumps)
+            return
+        if block_ID in self.declared_blocks_set:
+            fmt_string = """Encountered invalid block ID in line {line_index_value}. Reason: block ID already declared. Block ID provided was {invalid_block_id} ."""
+            error_string = fmt_string.format(line_index_value = line_index, invalid_block_id = block_ID)
+            raise ValueError(error_string)
+        self.block_ids.append(block_ID)
+        self.declared_blocks_set.add(block_ID)
+        self.jumps.extend(jumps)
+    def check_blocks(self):
+        """
+        Does the checks that need every block, raises a ValueError if they fail
+        """
+        declared_blocks_set = self.declared_blocks_set
+        # First a quick check that we do have a START block ID
+        if "START" not in declared_blocks_set:
+            raise ValueError("""Missing "START" block ID, the program will not run""")
+        # Now we check that each block ID needed for the jumps are valid, the jumps are in line order so the first undefined target found is the first one used
+        for target_jump_block_ID, line_index in self.jumps:
+            if target_jump_block_ID not in declared_blocks_set:
+                fmt_string = """Encountered implied jump target block IDs that are undefined at lines: {invalid_lines} ."""
+                # Every line that uses the undefined target, nicely formatted with a comma between them
+                invalid_lines = [str(line_number) for jump_target, line_number in self.jumps if jump_target == target_jump_block_ID]
+                error_string = fmt_string.format(invalid_lines = ", ".join(invalid_lines))
+                raise ValueError(error_string)
+
+class parsed_section():
+    def __init__(self, block_ID, instructions, line_offsets, jump_offsets):
+        """
+        A section of the lines of a program kept by an incremental program(see program.reparse), which is a BLOCK line and the lines up to the next one or the lines before the first BLOCK line
+        block_ID is None for the lines before the first BLOCK line, whose instructions are not part of the program
+        Line indexes are kept as offsets from the first line of the section so that the section can be reused wherever it moves to
+        line_offsets is a dict of instruction number -> offset of its line and jump_offsets is a list of (target block ID, offset of the line) of every jump
+        """
+        self.block_ID = block_ID
+        self.instructions = instructions
+        self.line_offsets = line_offsets
+        self.jump_offsets = jump_offsets
+        # The source lines(see program.source_lines) and jumps of the section for the first line it was last used at
+        self.first_line_index = None
+        self.source_lines = None
+        self.jumps = None
+    def move_to(self, first_line_index):
+        """
+        Sets source_lines and jumps to their line indexes for a section starting at first_line_index
+        """
+        if first_line_index != self.first_line_index:
+            self.source_lines = {instruction_number: first_line_index + line_offset for instruction_number, line_offset in self.line_offsets.items()}
+            self.jumps = [(target_jump_block_ID, first_line_index + line_offset) for target_jump_block_ID, line_offset in self.jump_offsets]
+            self.first_line_index = first_line_index
+
+def parse_section(parser, section_lines, first_line_index):
+    """
+    Parses the lines of a section(see parsed_section) starting at first_line_index with the block_parser parser and returns its parsed_section
+    """
+    first_jump = len(parser.jumps)
+    block_ID = None
+    instructions = dict()
+    block_source_lines = dict()
+    # A section holds at most one block, which is handed out once the lines run out
+    for block_ID, instructions, block_source_lines in parser.parse_lines(section_lines, first_line_index):
+        pass
+    line_offsets = {instruction_number: line_index - first_line_index for instruction_number, line_index in block_source_lines.items()}
+    jump_offsets = [(target_jump_block_ID, line_index - first_line_index) for target_jump_block_ID, line_index in parser.jumps[first_jump:]]
+    section = parsed_section(block_ID, instructions, line_offsets, jump_offsets)
+    section.first_line_index = first_line_index
+    section.source_lines = block_source_lines
+    section.jumps = parser.jumps[first_jump:]
+    return(section)
+
+def split_sections(assembly_string_lines):
+    """
+    Generator of (index of the first line, list of lines) for every section(see parsed_section) of the lines, trailing line breaks are removed from the lines
+    The first section holds the lines before the first BLOCK line and may be empty
+    """
+    lines = [assembly_line.rstrip("\r\n") for assembly_line in assembly_string_lines]
+    # Same test as the parser uses for a BLOCK line, the substring check skips most lines cheaply
+    block_line_indexes = [line_index for line_index, assembly_line in enumerate(lines) if "BLOCK" in assembly_line and assembly_line[0] != "#" and assembly_line.split(None, 1)[0] == "BLOCK"]
+    first_line_index = 0
+    for line_index in block_line_indexes:
+        yield (first_line_index, lines[first_line_index:line_index])
+        first_line_index = line_index
+    yield (first_line_index, lines[first_line_index:])
 
 class program():
-    def __init__(self, assembly_string_lines):
+    def __init__(self, assembly_string_lines, incremental = False):
         """
         This function creates a program object which is a set of parsed assembly blocks by the provided lines of assembly.
         This parser performs some basic validation of the provided lines of assembly.
@@ -14,785 +363,77 @@ class program():
         Note that all the parser does is chunk each block of assembly into their own blocks and ensure that the basic minimum ie that there is a START block is present, all jmps go to valid block identifiers, and that all assembly instructions are correctly formatted.
         No garantees are provided regarding the validity, or well formedness, or proper ordering of the assembly instructions.
         Also note that if there are assembly instructions before any block is declared, those assembly instructions will be parsed but will NOT be part of the program.
+        The index of the line(in assembly_string_lines) that each instruction came from is kept in source_lines, keyed the same way as program_instructions(block ID then instruction number).
+        Every line is checked against the operand signature of its instruction(see instruction_signatures_global) in a single pass.
+        assembly_string_lines can be any iterable of lines(a list, a file object or a generator), it is parsed one line at a time by block_parser without keeping the lines around.
+        If incremental is True the program keeps every parsed section of the lines(see parsed_section) instead, so that an edited version of the lines can be parsed by reparse while only parsing the sections that changed.
         """
+        # Parsed sections keyed by their text, only kept for incremental programs
+        self.sections = None
+        if incremental == True:
+            self.parse_sections(assembly_string_lines, dict())
+            return
+        parser = block_parser(assembly_string_lines)
         # Contains the actual seperate blocks of assembly
         program_instructions = dict()
-        # Used to quickly look up and see what blocks there are
-        declared_blocks = list()
-        # Used to quickly see what blocks are jumped to(and therefore must be present) and which assembly lines use those implied blocks(for error responses)
-        jump_blocks_declared = dict()
-        # All valid assembly prefixes that are not comments(ie starts with "#")
-        valid_prefixes = ["BLOCK", "END",
-                          "JMP", "JNE", "JIE",
-                          "CMP", "GT", "LT",
-                          "ADD", "MUL",
-                          "SHUP", "SHDO",
-                          "NOT ", "AND", "OR", "XOR ",
-                          "LOAD ", "STORE", "SET", "COPY", "SETMEMAD", "ADDMEMAD"]
-        # This reserved block ID ensures that if we start in an assembly input that does not start with a block ID, the assembly will get removed from the final result
-        current_block_ID = "NO_BLOCK_ID"
-        block_assembly_number = 0
-        for line_index in range(len(assembly_string_lines)):
-            assembly_line = assembly_string_lines[line_index]
-            if assembly_line == "":
-                pass
-            elif assembly_line[0] == "#":
-                pass
-            else:
-                split_line = assembly_line.split()
-                assembly_line_parameters = list()
-                # Remove all the empty spaces(which will show up as empty strings in the list)
-                for string in split_line:
-                    if string != "":
-                        assembly_line_parameters.append(string)
-                if assembly_line_parameters == []:
-                    # Check to see if we end up with an empty set of parameters after stripping out all the spaces from the list of fragments
-                    pass
-                else:
-                    # There is at least 1 item which will be our prefix
-                    prefix = assembly_line_parameters[0]
-                    if prefix not in valid_prefixes:
-                        fmt_string = """Invalid prefix found on assembly line {line_index_value}.  The invalid prefix was: "{faulty_prefix}"."""
-                        error_string = fmt_string.format(line_index_value = line_index, faulty_prefix = prefix)
-                        raise ValueError(error_string)
-                    else:
-                        if prefix == "BLOCK":
-                        # FORM: BLOCK NAME
-                        # Declares a new unique block of assembly
-                        # Name must not collide with registers (which start with R_ or are one of the few named registers)
-                        # Name may be any string that does not contain spaces or new lines
-                        # Do be careful though about the extent which you stretch the above
-                        # Verify this is not a previously defined block
-                        # Add new block to blocks list
-                        # Change current block
-                        # Verify that this line has the right amount of parameters
-                            if len(assembly_line_parameters) != 2:
-                                fmt_string = """Invalid block declaration with an incorrect amount ({argument_amount}) of arguments on line {line_index_value}. There should be 2 arguements. Declaration was: {invalid_block_declaration} ."""
-                                error_string = fmt_string.format(argument_amount = len(assembly_line_parameters), line_index_value = line_index,     invalid_block_declaration = assembly_line)
-                                raise ValueError(error_string)
-                            else:
-                                # Extract the block ID
-                                block_ID = assembly_line_parameters[1]
-                                # Verify the block ID being in valid form and not colliding
-                                block_ID_allowed, reason = validate_block_ID(block_ID)
-                                if block_ID_allowed == False:
-                                    fmt_string = """Encountered invalid block ID in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                # Verify that this block ID is not already used
-                                if block_ID in declared_blocks:
-                                    fmt_string = """Encountered invalid block ID in line   {line_index_value}. Reason: block ID already declared. Block ID provided was {invalid_block_id} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, invalid_block_id = block_ID)
-                                    raise ValueError(error_string)
-                                else:
-                                    pass
-                                # Alright, this is a valid block ID, we can add it to the list and  configure the state of the parser to handle the new block of assembly
-                                current_block_ID = block_ID
-                                declared_blocks.append(block_ID)
-                                program_instructions[block_ID] = dict()
-                                block_assembly_number = 0
-                        elif prefix == "END":
-                            # FORM: END
-                            # Ensure there are no additional components to the instruction
-                            if len(assembly_line_parameters) != 1:
-                                fmt_string = """Invalid END instruction with an incorrect amount ({argument_amount}) of arguments on line {line_index_value}. There should be 1 arguement. The line was: {invalid_line} ."""
-                                error_string = fmt_string.format(argument_amount = len(assembly_line_parameters), line_index_value = line_index, invalid_line = assembly_line)
-                                raise ValueError(error_string)
-                            else:
-                                program_instructions[current_block_ID][str(block_assembly_number)] = ("END",())
-                                block_assembly_number = block_assembly_number + 1
-                        elif prefix == "JMP":
-                            # FORM: JMP NAME
-                            # Unconditional jump to the indicated block
-                            # Verify the fixed amount of arguments
-                            if len(assembly_line_parameters) != 2:
-                                fmt_string = """Invalid JMP instruction with an incorrect amount ({argument_amount}) of arguments on line {line_index_value}. There should be 2 arguements. The line was: {invalid_line}."""
-                                error_string = fmt_string.format(argument_amount = len(assembly_line_parameters), line_index_value = line_index, invalid_line = assembly_line)
-                                raise ValueError(error_string)
-                            else:
-                                # Verify the block ID format
-                                target_jump_block_ID = assembly_line_parameters[1]
-                                block_ID_allowed, reason = validate_block_ID(target_jump_block_ID)
-                                if block_ID_allowed == False:
-                                    fmt_string = """Encountered invalid block ID in line    {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                else:
-                                    # Append the block ID to the list of target block IDs if not    already stored
-                                    if target_jump_block_ID not in jump_blocks_declared.keys():
-                                        lines_that_use_implied_block = [line_index]
-                                        jump_blocks_declared[target_jump_block_ID] = lines_that_use_implied_block
-                                    else:
-                                        lines_that_use_implied_block = jump_blocks_declared[target_jump_block_ID] 
-                                        lines_that_use_implied_block.append(line_index)
-                                        jump_blocks_declared[target_jump_block_ID] = lines_that_use_implied_block
-                                    # Then add the instruction to the block
-                                    program_instructions[current_block_ID][str(block_assembly_number)] = ("JMP",(target_jump_block_ID))
-                                    block_assembly_number = block_assembly_number + 1
-                        elif prefix == "JNE":
-                            # FORM: JNE REG_1 REG_2 NAME
-                            # Jump to the indicated block if the contents of the two registers are  different
-                            if len(assembly_line_parameters) != 4:
-                                fmt_string = """Invalid JNE instruction with an incorrect amount ({argument_amount}) of arguments on line {line_index_value}. There should be 4 arguments. The line was: {invalid_line}."""
-                                error_string = fmt_string.format(argument_amount = len(assembly_line_parameters), line_index_value = line_index, invalid_line = assembly_line)
-                                raise ValueError(error_string)
-                            else:
-                                reg_1 = assembly_line_parameters[1]
-                                reg_2 = assembly_line_parameters[2]
-                                target_jump_block_ID = assembly_line_parameters[3]
-                                reg_1_allowed, reason = validate_register(reg_1)
-                                if reg_1_allowed == False:
-                                    fmt_string = """Encountered invalid REG_1 in line  {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                else:
-                                    pass
-                                reg_2_allowed, reason = validate_register(reg_2)
-                                if reg_2_allowed == False:
-                                    fmt_string = """Encountered invalid REG_2 in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                else:
-                                    pass
-                                block_ID_allowed, reason = validate_block_ID(target_jump_block_ID)
-                                if block_ID_allowed == False:
-                                    fmt_string = """Encountered invalid block ID in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                else:
-                                    if target_jump_block_ID not in jump_blocks_declared.keys():
-                                        lines_that_use_implied_block = [line_index]
-                                        jump_blocks_declared[target_jump_block_ID] = lines_that_use_implied_block
-                                    else:
-                                        lines_that_use_implied_block = jump_blocks_declared[target_jump_block_ID] 
-                                        lines_that_use_implied_block.append(line_index)
-                                        jump_blocks_declared[target_jump_block_ID] = lines_that_use_implied_block
-                                program_instructions[current_block_ID][str(block_assembly_number)] = ("JNE",(reg_1, reg_2, target_jump_block_ID))
-                                block_assembly_number = block_assembly_number + 1
-                        elif prefix == "JIE":
-                            # FORM: JIE REG_1 REG_2 NAME
-                            # Jump to the indicated block if the contents of the two registers are same
-                            if len(assembly_line_parameters) != 4:
-                                fmt_string = """Invalid JIE instruction with an incorrect amount ({argument_amount}) of arguments on line {line_index_value}. There should be 4 arguments. The line was: {invalid_line}."""
-                                error_string = fmt_string.format(argument_amount = len(assembly_line_parameters), line_index_value = line_index, invalid_line = assembly_line)
-                                raise ValueError(error_string)
-                            else:
-                                reg_1 = assembly_line_parameters[1]
-                                reg_2 = assembly_line_parameters[2]
-                                target_jump_block_ID = assembly_line_parameters[3]
-                                reg_1_allowed, reason = validate_register(reg_1)
-                                if reg_1_allowed == False:
-                                    fmt_string = """Encountered invalid REG_1 in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                else:
-                                    pass
-                                reg_2_allowed, reason = validate_register(reg_2)
-                                if reg_2_allowed == False:
-                                    fmt_string = """Encountered invalid REG_2 in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                else:
-                                    pass
-                                block_ID_allowed, reason = validate_block_ID(target_jump_block_ID)
-                                if block_ID_allowed == False:
-                                    fmt_string = """Encountered invalid block ID in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                else:
-                                    if target_jump_block_ID not in jump_blocks_declared.keys():
-                                        lines_that_use_implied_block = [line_index]
-                                        jump_blocks_declared[target_jump_block_ID] = lines_that_use_implied_block
-                                    else:
-                                        lines_that_use_implied_block = jump_blocks_declared[target_jump_block_ID] 
-                                        lines_that_use_implied_block.append(line_index)
-                                        jump_blocks_declared[target_jump_block_ID] = lines_that_use_implied_block
-                                program_instructions[current_block_ID][str(block_assembly_number)] = ("JIE",(reg_1, reg_2, target_jump_block_ID))
-                                block_assembly_number = block_assembly_number + 1
-                        elif prefix == "CMP":
-                            # FORM: CMP REG_1 REG_2 REG_3 REG_4 REG_5
-                            # Compare REG_1 and REG_2 contents
-                            # If the two match, REG_5 will be set to the contents of REG_3, else it will be set to the contents of REG_4
-                            if len(assembly_line_parameters) != 6:
-                                fmt_string = """Invalid CMP instruction with an incorrect amount ({argument_amount}) of arguments on line {line_index_value}. There should be 6 arguments. The line was: {invalid_line}."""
-                                error_string = fmt_string.format(argument_amount = len(assembly_line_parameters), line_index_value = line_index, invalid_line = assembly_line)
-                                raise ValueError(error_string)
-                            else:
-                                reg_1 = assembly_line_parameters[1]
-                                reg_2 = assembly_line_parameters[2]
-                                reg_3 = assembly_line_parameters[3]
-                                reg_4 = assembly_line_parameters[4]
-                                reg_5 = assembly_line_parameters[5]
-                                reg_1_allowed, reason = validate_register(reg_1)
-                                if reg_1_allowed == False:
-                                    fmt_string = """Encountered invalid REG_1 in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                else:
-                                    pass
-                                reg_2_allowed, reason = validate_register(reg_2)
-                                if reg_2_allowed == False:
-                                    fmt_string = """Encountered invalid REG_2 in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                else:
-                                    pass
-                                reg_3_allowed, reason = validate_register(reg_3)
-                                if reg_3_allowed == False:
-                                    fmt_string = """Encountered invalid REG_3 in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                else:
-                                    pass
-                                reg_4_allowed, reason = validate_register(reg_4)
-                                if reg_4_allowed == False:
-                                    fmt_string = """Encountered invalid REG_4 in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                else:
-                                    pass
-                                reg_5_allowed, reason = validate_register(reg_5)
-                                if reg_5_allowed == False:
-                                    fmt_string = """Encountered invalid REG_5 in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                else:
-                                    pass
-                                program_instructions[current_block_ID][str(block_assembly_number)] = ("CMP",(reg_1, reg_2, reg_3, reg_4, reg_5))
-                                block_assembly_number = block_assembly_number + 1
-                        elif prefix == "GT":
-                            # FORM: GT REG_1 REG_2 REG_3 REG_4 REG_5
-                            # Compare REG_1 and REG_2 contents as unsigned integers
-                            # If REG_1 is greater than REG_2, REG_5 will be set to the contents of REG_3, else it will be set to the contents of REG_4
-                            if len(assembly_line_parameters) != 6:
-                                fmt_string = """Invalid GT instruction with an incorrect amount ({argument_amount}) of arguments on line {line_index_value}. There should be 6 arguments. The line was: {invalid_line}."""
-                                error_string = fmt_string.format(argument_amount = len(assembly_line_parameters), line_index_value = line_index, invalid_line = assembly_line)
-                                raise ValueError(error_string)
-                            else:
-                                reg_1 = assembly_line_parameters[1]
-                                reg_2 = assembly_line_parameters[2]
-                                reg_3 = assembly_line_parameters[3]
-                                reg_4 = assembly_line_parameters[4]
-                                reg_5 = assembly_line_parameters[5]
-                                reg_1_allowed, reason = validate_register(reg_1)
-                                if reg_1_allowed == False:
-                                    fmt_string = """Encountered invalid REG_1 in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                else:
-                                    pass
-                                reg_2_allowed, reason = validate_register(reg_2)
-                                if reg_2_allowed == False:
-                                    fmt_string = """Encountered invalid REG_2 in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                else:
-                                    pass
-                                reg_3_allowed, reason = validate_register(reg_3)
-                                if reg_3_allowed == False:
-                                    fmt_string = """Encountered invalid REG_3 in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                else:
-                                    pass
-                                reg_4_allowed, reason = validate_register(reg_4)
-                                if reg_4_allowed == False:
-                                    fmt_string = """Encountered invalid REG_4 in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                else:
-                                    pass
-                                reg_5_allowed, reason = validate_register(reg_5)
-                                if reg_5_allowed == False:
-                                    fmt_string = """Encountered invalid REG_5 in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                else:
-                                    pass
-                                program_instructions[current_block_ID][str(block_assembly_number)] = ("GT",(reg_1, reg_2, reg_3, reg_4, reg_5))
-                                block_assembly_number = block_assembly_number + 1
-                        elif prefix == "LT":
-                            # FORM: LT REG_1 REG_2 REG_3 REG_4 REG_5
-                            # Compare REG_1 and REG_2 contents as unsigned integers
-                            # If REG_1 is less than REG_2, REG_5 will be set to the contents of REG_3, else it will be set to the contents of REG_4
-                            if len(assembly_line_parameters) != 6:
-                                fmt_string = """Invalid LT instruction with an incorrect amount ({argument_amount}) of arguments on line {line_index_value}. There should be 6 arguments. The line was: {invalid_line}."""
-                                error_string = fmt_string.format(argument_amount = len(assembly_line_parameters), line_index_value = line_index, invalid_line = assembly_line)
-                                raise ValueError(error_string)
-                            else:
-                                reg_1 = assembly_line_parameters[1]
-                                reg_2 = assembly_line_parameters[2]
-                                reg_3 = assembly_line_parameters[3]
-                                reg_4 = assembly_line_parameters[4]
-                                reg_5 = assembly_line_parameters[5]
-                                reg_1_allowed, reason = validate_register(reg_1)
-                                if reg_1_allowed == False:
-                                    fmt_string = """Encountered invalid REG_1 in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                else:
-                                    pass
-                                reg_2_allowed, reason = validate_register(reg_2)
-                                if reg_2_allowed == False:
-                                    fmt_string = """Encountered invalid REG_2 in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                else:
-                                    pass
-                                reg_3_allowed, reason = validate_register(reg_3)
-                                if reg_3_allowed == False:
-                                    fmt_string = """Encountered invalid REG_3 in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                else:
-                                    pass
-                                reg_4_allowed, reason = validate_register(reg_4)
-                                if reg_4_allowed == False:
-                                    fmt_string = """Encountered invalid REG_4 in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                else:
-                                    pass
-                                reg_5_allowed, reason = validate_register(reg_5)
-                                if reg_5_allowed == False:
-                                    fmt_string = """Encountered invalid REG_5 in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                else:
-                                    pass
-                                program_instructions[current_block_ID][str(block_assembly_number)] = ("LT",(reg_1, reg_2, reg_3, reg_4, reg_5))
-                                block_assembly_number = block_assembly_number + 1
-                        elif prefix == "ADD":
-                            # FORM: ADD REG_1 REG_2 REG_3
-                            # Perform an unsigned addition of REG_1 and REG_2
-                            # The results of the addition will be written to REG_3
-                            # Any overflow(or no overflow) will be written to the CARRY register
-                            if len(assembly_line_parameters) != 4:
-                                fmt_string = """Invalid ADD instruction with an incorrect amount ({argument_amount}) of arguments on line {line_index_value}. There should be 4 arguments. The line was: {invalid_line}."""
-                                error_string = fmt_string.format(argument_amount = len(assembly_line_parameters), line_index_value = line_index, invalid_line = assembly_line)
-                                raise ValueError(error_string)
-                            else:
-                                reg_1 = assembly_line_parameters[1]
-                                reg_2 = assembly_line_parameters[2]
-                                reg_3 = assembly_line_parameters[3]
-                                reg_1_allowed, reason = validate_register(reg_1)
-                                if reg_1_allowed == False:
-                                    fmt_string = """Encountered invalid REG_1 in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                else:
-                                    pass
-                                reg_2_allowed, reason = validate_register(reg_2)
-                                if reg_2_allowed == False:
-                                    fmt_string = """Encountered invalid REG_2 in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                else:
-                                    pass
-                                reg_3_allowed, reason = validate_register(reg_3)
-                                if reg_3_allowed == False:
-                                    fmt_string = """Encountered invalid REG_3 in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                else:
-                                    pass                         
-                                program_instructions[current_block_ID][str(block_assembly_number)] = ("ADD",(reg_1, reg_2, reg_3))
-                                block_assembly_number = block_assembly_number + 1
-                        elif prefix == "MUL":
-                            # FORM: MUL REG_1 REG_2 REG_3
-                            # Perform an unsigned multiplication of REG_1 and REG_2
-                            # The results of the multiplication will be written to REG_3
-                            # Any overflow will be discarded
-                            if len(assembly_line_parameters) != 4:
-                                fmt_string = """Invalid MUL instruction with an incorrect amount ({argument_amount}) of arguments on line {line_index_value}. There should be 4 arguments. The line was: {invalid_line}."""
-                                error_string = fmt_string.format(argument_amount = len(assembly_line_parameters), line_index_value = line_index, invalid_line = assembly_line)
-                                raise ValueError(error_string)
-                            else:
-                                reg_1 = assembly_line_parameters[1]
-                                reg_2 = assembly_line_parameters[2]
-                                reg_3 = assembly_line_parameters[3]
-                                reg_1_allowed, reason = validate_register(reg_1)
-                                if reg_1_allowed == False:
-                                    fmt_string = """Encountered invalid REG_1 in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                else:
-                                    pass
-                                reg_2_allowed, reason = validate_register(reg_2)
-                                if reg_2_allowed == False:
-                                    fmt_string = """Encountered invalid REG_2 in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                else:
-                                    pass
-                                reg_3_allowed, reason = validate_register(reg_3)
-                                if reg_3_allowed == False:
-                                    fmt_string = """Encountered invalid REG_3 in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                else:
-                                    pass                             
-                                program_instructions[current_block_ID][str(block_assembly_number)] = ("MUL",(reg_1, reg_2, reg_3))
-                                block_assembly_number = block_assembly_number + 1
-                        elif prefix == "SHUP":
-                            # FORM: SHUP REG_1 REG_2 REG_3
-                            # Perform a shift of REG_2 bits on REG_1 towards the most significant bit
-                            # The results of the shift will be written to REG_3
-                            # Any overflow will be discarded
-                            if len(assembly_line_parameters) != 4:
-                                fmt_string = """Invalid SHUP instruction with an incorrect amount ({argument_amount}) of arguments on line {line_index_value}. There should be 4 arguments. The line was: {invalid_line}."""
-                                error_string = fmt_string.format(argument_amount = len(assembly_line_parameters), line_index_value = line_index, invalid_line = assembly_line)
-                                raise ValueError(error_string)
-                            else:
-                                reg_1 = assembly_line_parameters[1]
-                                reg_2 = assembly_line_parameters[2]
-                                reg_3 = assembly_line_parameters[3]
-                                reg_1_allowed, reason = validate_register(reg_1)
-                                if reg_1_allowed == False:
-                                    fmt_string = """Encountered invalid REG_1 in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                else:
-                                    pass
-                                reg_2_allowed, reason = validate_register(reg_2)
-                                if reg_2_allowed == False:
-                                    fmt_string = """Encountered invalid REG_2 in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                else:
-                                    pass
-                                reg_3_allowed, reason = validate_register(reg_3)
-                                if reg_3_allowed == False:
-                                    fmt_string = """Encountered invalid REG_3 in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                else:
-                                    pass                
-                                program_instructions[current_block_ID][str(block_assembly_number)] = ("SHUP",(reg_1, reg_2, reg_3))
-                                block_assembly_number = block_assembly_number + 1
-                        elif prefix == "SHDO":
-                            # FORM: SHDO REG_1 REG_2 REG_3
-                            # Perform a shift of REG_2 bits on REG_1 towards the least significant bit
-                            # The results of the shift will be written to REG_3
-                            # Any underflow will be discarded
-                            if len(assembly_line_parameters) != 4:
-                                fmt_string = """Invalid SHDO instruction with an incorrect amount ({argument_amount}) of arguments on line {line_index_value}. There should be 4 arguments. The line was: {invalid_line}."""
-                                error_string = fmt_string.format(argument_amount = len(assembly_line_parameters), line_index_value = line_index, invalid_line = assembly_line)
-                                raise ValueError(error_string)
-                            else:
-                                reg_1 = assembly_line_parameters[1]
-                                reg_2 = assembly_line_parameters[2]
-                                reg_3 = assembly_line_parameters[3]
-                                reg_1_allowed, reason = validate_register(reg_1)
-                                if reg_1_allowed == False:
-                                    fmt_string = """Encountered invalid REG_1 in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                else:
-                                    pass
-                                reg_2_allowed, reason = validate_register(reg_2)
-                                if reg_2_allowed == False:
-                                    fmt_string = """Encountered invalid REG_2 in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                else:
-                                    pass
-                                reg_3_allowed, reason = validate_register(reg_3)
-                                if reg_3_allowed == False:
-                                    fmt_string = """Encountered invalid REG_3 in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                else:
-                                    pass                              
-                                program_instructions[current_block_ID][str(block_assembly_number)] = ("SHDO",(reg_1, reg_2, reg_3))
-                                block_assembly_number = block_assembly_number + 1
-                        elif prefix == "NOT":
-                            # FORM: NOT REG_1 REG_2
-                            # Perform a bitwise NOT (negation) of REG_1
-                            # The result will be written to REG_2
-                            if len(assembly_line_parameters) != 3:
-                                fmt_string = """Invalid MUL instruction with an incorrect amount ({argument_amount}) of arguments on line {line_index_value}. There should be 3 arguments. The line was: {invalid_line}."""
-                                error_string = fmt_string.format(argument_amount = len(assembly_line_parameters), line_index_value = line_index, invalid_line = assembly_line)
-                                raise ValueError(error_string)
-                            else:
-                                reg_1 = assembly_line_parameters[1]
-                                reg_2 = assembly_line_parameters[2]
-                                reg_1_allowed, reason = validate_register(reg_1)
-                                if reg_1_allowed == False:
-                                    fmt_string = """Encountered invalid REG_1 in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                else:
-                                    pass
-                                reg_2_allowed, reason = validate_register(reg_2)
-                                if reg_2_allowed == False:
-                                    fmt_string = """Encountered invalid REG_2 in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                else:
-                                    pass                             
-                                program_instructions[current_block_ID][str(block_assembly_number)] = ("NOT",(reg_1, reg_2))
-                                block_assembly_number = block_assembly_number + 1
-                        elif prefix == "AND":
-                            # FORM: AND REG_1 REG_2 REG_3
-                            # Perform a bitwise AND of REG_1 and REG_2
-                            # The result will be written to REG_3
-                            if len(assembly_line_parameters) != 4:
-                                fmt_string = """Invalid AND instruction with an incorrect amount of arguments on line {line_index_value}. There should be 4 arguments. The line was: {invalid_line}."""
-                                error_string = fmt_string.format(line_index_value = line_index, invalid_line = assembly_line)
-                                raise ValueError(error_string)
-                            else:
-                                reg_1 = assembly_line_parameters[1]
-                                reg_2 = assembly_line_parameters[2]
-                                reg_3 = assembly_line_parameters[3]
-                                reg_1_allowed, reason = validate_register(reg_1)
-                                if reg_1_allowed == False:
-                                    fmt_string = """Encountered invalid REG_1 in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                else:
-                                    pass
-                                reg_2_allowed, reason = validate_register(reg_2)
-                                if reg_2_allowed == False:
-                                    fmt_string = """Encountered invalid REG_2 in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                else:
-                                    pass
-                                reg_3_allowed, reason = validate_register(reg_3)
-                                if reg_3_allowed == False:
-                                    fmt_string = """Encountered invalid REG_3 in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                else:
-                                    pass
-                                program_instructions[current_block_ID][str(block_assembly_number)] = ("AND",(reg_1, reg_2, reg_3))
-                                block_assembly_number = block_assembly_number + 1
-                        elif prefix == "OR":
-                            # FORM: OR REG_1 REG_2 REG_3
-                            # Perform a bitwise OR of REG_1 and REG_2
-                            # The result will be written to REG_3
-                            if len(assembly_line_parameters) != 4:
-                                fmt_string = """Invalid OR instruction with an incorrect amount of arguments on line {line_index_value}. There should be 4 arguments. The line was: {invalid_line}."""
-                                error_string = fmt_string.format(line_index_value = line_index, invalid_line = assembly_line)
-                                raise ValueError(error_string)
-                            else:
-                                reg_1 = assembly_line_parameters[1]
-                                reg_2 = assembly_line_parameters[2]
-                                reg_3 = assembly_line_parameters[3]
-                                reg_1_allowed, reason = validate_register(reg_1)
-                                if reg_1_allowed == False:
-                                    fmt_string = """Encountered invalid REG_1 in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                else:
-                                    pass
-                                reg_2_allowed, reason = validate_register(reg_2)
-                                if reg_2_allowed == False:
-                                    fmt_string = """Encountered invalid REG_2 in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                else:
-                                    pass
-                                reg_3_allowed, reason = validate_register(reg_3)
-                                if reg_3_allowed == False:
-                                    fmt_string = """Encountered invalid REG_3 in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                else:
-                                    pass
-                                program_instructions[current_block_ID][str(block_assembly_number)] = ("OR",(reg_1, reg_2, reg_3))
-                                block_assembly_number = block_assembly_number + 1
-                        elif prefix == "XOR":
-                            # FORM: XOR REG_1 REG_2 REG_3
-                            # Perform a bitwise XOR of REG_1 and REG_2
-                            # The result will be written to REG_3
-                            if len(assembly_line_parameters) != 4:
-                                fmt_string = """Invalid XOR instruction with an incorrect amount of arguments on line {line_index_value}. There should be 4 arguments. The line was: {invalid_line}."""
-                                error_string = fmt_string.format(line_index_value = line_index, invalid_line = assembly_line)
-                                raise ValueError(error_string)
-                            else:
-                                reg_1 = assembly_line_parameters[1]
-                                reg_2 = assembly_line_parameters[2]
-                                reg_3 = assembly_line_parameters[3]
-                                reg_1_allowed, reason = validate_register(reg_1)
-                                if reg_1_allowed == False:
-                                    fmt_string = """Encountered invalid REG_1 in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                else:
-                                    pass
-                                reg_2_allowed, reason = validate_register(reg_2)
-                                if reg_2_allowed == False:
-                                    fmt_string = """Encountered invalid REG_2 in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                else:
-                                    pass
-                                reg_3_allowed, reason = validate_register(reg_3)
-                                if reg_3_allowed == False:
-                                    fmt_string = """Encountered invalid REG_3 in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                else:
-                                    pass
-                                program_instructions[current_block_ID][str(block_assembly_number)] = ("XOR",(reg_1, reg_2, reg_3))
-                                block_assembly_number = block_assembly_number + 1
-                        elif prefix == "LOAD":
-                            # FORM: LOAD REG_1
-                            # Takes the current memory address in the special register MEMAD and loads the contents of the memory at said address into REG_1
-                            if len(assembly_line_parameters) != 2:
-                                fmt_string = """Invalid LOAD instruction with an incorrect amount of arguments on line {line_index_value}. There should be 2 arguments. The line was: {invalid_line}."""
-                                error_string = fmt_string.format(line_index_value = line_index, invalid_line = assembly_line)
-                                raise ValueError(error_string)
-                            else:
-                                reg_1 = assembly_line_parameters[1]
-                                reg_1_allowed, reason = validate_register(reg_1)
-                                if reg_1_allowed == False:
-                                    fmt_string = """Encountered invalid REG_1 in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                else:
-                                    pass
-                                program_instructions[current_block_ID][str(block_assembly_number)] = ("LOAD",(reg_1))
-                                block_assembly_number = block_assembly_number + 1
-                        elif prefix == "STORE":
-                            # FORM: STORE REG_1
-                            # Stores the contents of REG_1 into the memory address in the special register MEMAD
-                            if len(assembly_line_parameters) != 2:
-                                fmt_string = """Invalid STORE instruction with an incorrect amount of arguments on line {line_index_value}. There should be 2 arguments. The line was: {invalid_line}."""
-                                error_string = fmt_string.format(line_index_value = line_index, invalid_line = assembly_line)
-                                raise ValueError(error_string)
-                            else:
-                                reg_1 = assembly_line_parameters[1]
-                                reg_1_allowed, reason = validate_register(reg_1)
-                                if reg_1_allowed == False:
-                                    fmt_string = """Encountered invalid REG_1 in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                else:
-                                    pass
-                                program_instructions[current_block_ID][str(block_assembly_number)] = ("STORE",(reg_1))
-                                block_assembly_number = block_assembly_number + 1
-                        elif prefix == "SET":
-                            # FORM: SET REG_1 DATA
-                            # Sets REG_1 to the specified data
-                            if len(assembly_line_parameters) != 3:
-                                fmt_string = """Invalid MUL instruction with an incorrect amount of arguments on line {line_index_value}. There should be 3 arguments. The line was: {invalid_line}."""
-                                error_string = fmt_string.format(line_index_value = line_index, invalid_line = assembly_line)
-                                raise ValueError(error_string)
-                            else:
-                                reg_1 = assembly_line_parameters[1]
-                                data = assembly_line_parameters[2]
-                                reg_1_allowed, reason = validate_register(reg_1)
-                                if reg_1_allowed == False:
-                                    fmt_string = """Encountered invalid REG_1 in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                else:
-                                    pass
-                                data_allowed, reason = validate_data(data)
-                                if data_allowed == False:
-                                    fmt_string = """Encountered invalid DATA in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                data = parse_data(data)
-                                program_instructions[current_block_ID][str(block_assembly_number)] = ("SET",(reg_1, data))
-                                block_assembly_number = block_assembly_number + 1
-                        elif prefix == "COPY":
-                            # FORM: COPY REG_1 REG_2
-                            # Copies the contents from REG_1 to REG_2
-                            if len(assembly_line_parameters) != 3:
-                                fmt_string = """Invalid MUL instruction with an incorrect amount of arguments on line {line_index_value}. There should be 3 arguments. The line was: {invalid_line}."""
-                                error_string = fmt_string.format(line_index_value = line_index, invalid_line = assembly_line)
-                                raise ValueError(error_string)
-                            else:
-                                reg_1 = assembly_line_parameters[1]
-                                reg_2 = assembly_line_parameters[2]
-                                reg_1_allowed, reason = validate_register(reg_1)
-                                if reg_1_allowed == False:
-                                    fmt_string = """Encountered invalid REG_1 in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                else:
-                                    pass
-                                reg_2_allowed, reason = validate_register(reg_2)
-                                if reg_2_allowed == False:
-                                    fmt_string = """Encountered invalid REG_2 in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                else:
-                                    pass
-                                program_instructions[current_block_ID][str(block_assembly_number)] = ("COPY",(reg_1, reg_2))
-                                block_assembly_number = block_assembly_number + 1
-                        elif prefix == "SETMEMAD":
-                            # FORM: SETMEMAD DATA
-                            # Sets the special register MEMAD to data
-                            if len(assembly_line_parameters) != 2:
-                                fmt_string = """Invalid SETMEMAD instruction with an incorrect amount of arguments on line {line_index_value}. There should be 2 arguments. The line was: {invalid_line}."""
-                                error_string = fmt_string.format(line_index_value = line_index, invalid_line = assembly_line)
-                                raise ValueError(error_string)
-                            else:
-                                data = assembly_line_parameters[1]
-                                data_allowed, reason = validate_data(data)
-                                if data_allowed == False:
-                                    fmt_string = """Encountered invalid DATA in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                else:
-                                    pass
-                                data = parse_data(data)
-                                program_instructions[current_block_ID][str(block_assembly_number)] = ("SETMEMAD",(data))
-                                block_assembly_number = block_assembly_number + 1
-                        elif prefix == "ADDMEMAD":
-                            # FORM: ADDMEMAD REG_1
-                            # Adds the contents of REG_1 to the special register MEMAD
-                            # NOTE: You can use the MEMAD register in this instruction unlike other instructions
-                            # This allows you to double the currently stored memory address
-                            if len(assembly_line_parameters) != 2:
-                                fmt_string = """Invalid ADDMEMAD instruction with an incorrect amount of arguments on line {line_index_value}. There should be 2 arguments. The line was: {invalid_line}."""
-                                error_string = fmt_string.format(line_index_value = line_index, invalid_line = assembly_line)
-                                raise ValueError(error_string)
-                            else:
-                                reg_1 = assembly_line_parameters[1]
-                                reg_1_allowed, reason = validate_register(reg_1, no_MEMAD = False)
-                                if reg_1_allowed == False:
-                                    fmt_string = """Encountered invalid REG_1 in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
-                                    error_string = fmt_string.format(line_index_value = line_index, reason = reason, invalid_line = assembly_line)
-                                    raise ValueError(error_string)
-                                else:
-                                    pass
-                                program_instructions[current_block_ID][str(block_assembly_number)] = ("ADDMEMAD",(reg_1))
-                                block_assembly_number = block_assembly_number + 1
-                        else:
-                            # Woops, we have an accepted assembly instruction that we have no idea how to parse
-                            # This should never happen but if it does, this case will catch it and allow correction of the problem(likely incomplete code).
-                            fmt_string = """Valid but unknown assembly prefix encountered on assembly line {line_index_value}. The unknown assembly prefix was: "{unknown_prefix}"."""
-                            error_string = fmt_string.format(line_index_value = line_index, unknown_prefix = prefix)
-        # First a quick check that we do have a START block ID
-        if "START" not in declared_blocks:
-            raise ValueError("""Missing "START" block ID, the program will not run""")
-        # Second we check to see if the reserved placeholder block ID is used. If it is used, assembly in that must be deleted
-        if "NO_BLOCK_ID" in program_instructions.keys():
-            del program_instructions["NO_BLOCK_ID"]
-        # Now we check that each block ID needed for the jumps are valid
-        implied_jump_block_ID_targets = jump_blocks_declared.keys()
-        for key in implied_jump_block_ID_targets:
-            if key not in declared_blocks:
-                fmt_string = """Encountered implied jump target block IDs that are undefined at lines: {invalid_lines} ."""
-                invalid_lines_string = ""
-                invalid_lines = jump_blocks_declared[key] 
-                # Nicely format all the line numbers up to the last one with a comma
-                for line_number in range(len(invalid_lines) - 1):
-                    invalid_lines_string = invalid_lines_string + str(line_number) + ", "
-                # Append the last line number
-                invalid_lines_string = invalid_lines_string + str(invalid_lines[len(invalid_lines)-1])
-                error_string = fmt_string.format(invalid_lines = invalid_lines_string)
-                raise ValueError(error_string)
+        # Used to map each instruction back to the line it came from
+        source_lines = dict()
+        for block_ID, block_instructions, block_source_lines in parser.blocks():
+            program_instructions[block_ID] = block_instructions
+            source_lines[block_ID] = block_source_lines
         # We managed to get through all the checks and stuff
         # YAY
-        self.block_ids = declared_blocks
+        self.block_ids = parser.block_ids
         self.program_instructions = program_instructions
+        self.source_lines = source_lines
+        # Amount of lines the program was parsed from
+        self.line_count = parser.line_count
+    def reparse(self, assembly_string_lines):
+        """
+        Returns a new incremental program parsed from the lines, which are usually an edited version of the lines of this program
+        Only requires this program to be incremental, any section whose text is the same as one of this program is reused without being parsed again(even if it moved)
+        Only the checks that span blocks(duplicate blocks, a START block and the jump targets) are redone for reused sections, so the result and any error raised are the same as those of a full parse
+        """
+        if self.sections == None:
+            raise ValueError("Only programs parsed with incremental enabled can be reparsed")
+        new_program = program.__new__(program)
+        new_program.parse_sections(assembly_string_lines, self.sections)
+        return(new_program)
+    def parse_sections(self, assembly_string_lines, previous_sections):
+        """
+        Parses the lines section by section, taking sections from previous_sections(text -> parsed_section) where the text matches
+        """
+        parser = block_parser()
+        sections = dict()
+        program_instructions = dict()
+        source_lines = dict()
+        # How many sections were taken from previous_sections and how many had to be parsed
+        reused_sections = 0
+        parsed_sections = 0
+        line_count = 0
+        for first_line_index, section_lines in split_sections(assembly_string_lines):
+            line_count = first_line_index + len(section_lines)
+            section_text = "\n".join(section_lines)
+            section = previous_sections.get(section_text)
+            if section == None:
+                section = parse_section(parser, section_lines, first_line_index)
+                parsed_sections = parsed_sections + 1
+            else:
+                section.move_to(first_line_index)
+                parser.add_block(section.block_ID, first_line_index, section.jumps)
+                reused_sections = reused_sections + 1
+            sections[section_text] = section
+            if section.block_ID != None:
+                program_instructions[section.block_ID] = section.instructions
+                source_lines[section.block_ID] = section.source_lines
+        parser.check_blocks()
+        self.block_ids = parser.block_ids
+        self.program_instructions = program_instructions
+        self.source_lines = source_lines
+        self.line_count = line_count
+        self.sections = sections
+        self.reused_sections = reused_sections
+        self.parsed_sections = parsed_sections
     def get_instruction(self, block_id, instruction_number, loop_on_block = False):
         """
         Returns the instruction found in the provided block and instruction number
@@ -801,7 +442,8 @@ class program():
         Instructions are of the format ("INST", (input1, input2))
         First part is the instruction and the second is a tuple of inputs for the instruction
         """
-        if block_id in self.block_ids:
+        # A dict lookup, the block_ids list would have to be scanned
+        if block_id in self.program_instructions:
             block = self.program_instructions[block_id]
             instructions_count = len(block)
             if instruction_number >= instructions_count:
@@ -815,29 +457,29 @@ class program():
         else:
             raise ValueError("The block ID does not exists")
 
+def raise_invalid_operand(operand_name, reason, line_index, assembly_line):
+    fmt_string = """Encountered invalid {operand_name} in line {line_index_value}. Reason: {reason}. Line was: {invalid_line} ."""
+    error_string = fmt_string.format(operand_name = operand_name, line_index_value = line_index, reason = reason, invalid_line = assembly_line)
+    raise ValueError(error_string)
+
 def validate_block_ID(block_ID):
     """
     Verifies that the given block ID is not colliding with register or data naming
-    It also ensures that the block ID does not collide with the reserved ID "NO_BLOCK_ID"
+    It also ensures that the block ID does not collide with the reserved IDs "NO_BLOCK_ID" and "END"
     Returns: (Bool, "reason"/None)
     """
+    prefix = block_ID[0:2]
     # Check to avoid collision with registers
-    if block_ID[0:2] == register_prefix_global:
+    if prefix == register_prefix_global:
         return(False, "arbitary register collision")
-    else:
-        pass
     if block_ID in special_named_registers_global:
         return(False, "special register collision")
-    else:
-        pass
     # Check to avoid collision with data prefixes
-    if block_ID[0:2] in data_prefixes_global:
+    if prefix in data_bases_global:
         return(False, "data collision")
-    else:
-        pass
-    if block_ID == "NO_BLOCK_ID":
-        return(False, "used reserved placeholder block ID")
-    elif block_ID == "END":
+    if block_ID in reserved_block_IDs_global:
+        if block_ID == "NO_BLOCK_ID":
+            return(False, "used reserved placeholder block ID")
         return(False, "used reserved end of execution block ID")
     return(True, None)
 
@@ -851,11 +493,9 @@ def validate_register(register_ID, no_MEMAD = True):
     if register_ID[0:2] == register_prefix_global:
         return(True, None)
     elif register_ID in special_named_registers_global:
-        if no_MEMAD == True:
-            if register_ID == "MEMAD":
-                return(False, "MEMAD is not allowed")
-            else:
-                return(True, None)
+        if no_MEMAD == True and register_ID == "MEMAD":
+            return(False, "MEMAD is not allowed")
+        return(True, None)
     else:
         return(False, "not found in special registers or named appropiately")
 
@@ -870,35 +510,12 @@ def validate_data(data_input):
     # Verify we at least have 2 characters in the prefix
     if len(prefix) != 2:
         return(False, "prefix missing")
-    else:
-        pass
     # Verify that the prefix is valid
-    if prefix not in data_prefixes_global:
+    if prefix not in data_patterns_global:
         return(False, "invalid prefix")
     # Now we validate the rest of the data according to the prefix
-    remainder = data_input[2:len(data_input)]
-    if prefix == "0b":
-        # This is a binary representation
-        for char in remainder:
-            if char not in ["0", "1"]:
-                return(False, "nonbinary character detected")
-            else:
-                pass
-    elif prefix == "0d":
-        for char in remainder:
-            if char not in list("0123456789"):
-                return(False, "nondecimal character detected")
-            else:
-                pass
-    elif prefix == "0x":
-        for char in remainder:
-            # Note, we tolerate both capital and lower case A-F for hexadecimal
-            if char not in list("0123456789abcdefABCDEF"):
-                return(False, "nonhexadecimal character detected")
-            else:
-                pass
-    else:
-        raise NotImplementedError("Missing handler for the prefix: "+str(prefix))
+    if data_patterns_global[prefix].match(data_input) == None:
+        return(False, data_character_reasons_global[prefix])
     return(True, None)
 
 def parse_data(data_input):
@@ -906,16 +523,7 @@ def parse_data(data_input):
     Takes a data string and returns the appropiate integer
     """
     prefix = data_input[0:2]
-    integers = data_input[2:len(data_input)]
+    if prefix not in data_bases_global:
+        raise ValueError("Missing handler for data prefix: "+str(prefix))
     # Add a padding zero to the front of the number because we may have an empty string like "0b" which will return a string of "" otherwise
-    integers = "0" + integers
-    if prefix == "0b":
-        data = int(integers, 2)
-    elif prefix == "0d":
-        data = int(integers)
-    elif prefix == "0x":
-        data = int(integers, 16)
-    else:
-        raise NotImplemented("Missing handler for data prefix: "+str(prefix))
-    return(data)
-    
+    return(int("0" + data_input[2:], data_bases_global[prefix]))
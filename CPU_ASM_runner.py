@@ -1,10 +1,20 @@
+import argparse
+import json
+import sys
+import time
+
 import CPU_core
 import CPU_ASM_parser
+import CPU_optimizer
+import CPU_parse_cache
+import CPU_sweep_runner
+import CPU_trace
 
 hardcode_file_path = False
 hardcode_iterations = False
 fallback_iterations = 100
 fallback_bit_width = 8
+fallback_progress_interval = 100000
 
 def main():
     exit_enable = False
@@ -22,10 +32,8 @@ def main():
                 file_path = input("File path to ASM? ")
             file_path_success = False
             try:
-                with open(file_path, "r") as asm_file:
-                    file_string = asm_file.read()
-                    split_asm_lines = file_string.splitlines()
-                    file_path_success = True
+                asm_file = open(file_path, "r")
+                file_path_success = True
             except Exception as e:
                 print("!!!Failed to get file contents!!!")
                 print("Error below")
@@ -40,7 +48,9 @@ def main():
             if file_path_success == True:
                 ASM_parse_sucess = False
                 try:
-                    asm_out = CPU_ASM_parser.program(split_asm_lines)
+                    # The file is streamed into the parser instead of being read into memory
+                    with asm_file:
+                        asm_out = CPU_ASM_parser.program(asm_file)
                     ASM_parse_sucess = True
                 except Exception as e:
                     print("!!!Failed parsing!!!")
@@ -93,12 +103,24 @@ def main():
                     except Exception:
                         bit_width = fallback_bit_width
                         print("Invalid iterations count, falling back to "+str(fallback_iterations))
-                    CPU_obj = CPU_core.CPU(bit_width, False)
+                    trace_path = input("Trace file path?(empty keeps the log in memory) ")
+                    detect_cycles = input("Stop early once the program is stuck in a cycle? ")
+                    detect_cycles = detect_cycles.upper() in ["Y", "YES"]
+                    if trace_path != "":
+                        trace = CPU_trace.trace_writer(trace_path)
+                        CPU_obj = CPU_core.CPU(bit_width, False, log_policy = "stream", log_stream = trace, detect_cycles = detect_cycles)
+                    else:
+                        trace = None
+                        CPU_obj = CPU_core.CPU(bit_width, False, detect_cycles = detect_cycles)
                     CPU_obj.load_program(asm_out)
                     execution_success = False
                     try:
                         print("Executing now...")
-                        CPU_obj.step_multiple_instruction(iterations)
+                        try:
+                            CPU_obj.step_multiple_instruction(iterations)
+                        finally:
+                            if trace != None:
+                                trace.close()
                         log = CPU_obj.get_execution_log()
                         memory = CPU_obj.get_memory()
                         registers = CPU_obj.get_registers()
@@ -117,7 +139,13 @@ def main():
                     if execution_success == True:
                         print("-----")
                         print("Output")
-                        print("LOG: "+str(log))
+                        cycle = CPU_obj.get_cycle()
+                        if cycle != None:
+                            print("Stopped early, the program never ends: non-terminating cycle of "+str(cycle[0])+" instructions entered at block "+str(cycle[1]))
+                        if trace != None:
+                            print("LOG: "+str(trace.record_count)+" entries written to "+trace_path)
+                        else:
+                            print("LOG: "+str(log))
                         input()
                         print("Memory: "+str(memory))
                         input()
@@ -142,5 +170,166 @@ def main():
         input()     
     exit()
 
+def write_record(output, record):
+    output.write(json.dumps(record)+"\n")
+    output.flush()
+
+def headless_main(arguments = None):
+    """
+    Runs a single ASM file without any prompts and streams the results as NDJSON(one JSON object per line)
+    Every record has a "type" key:
+    "parse": summary of the parsed program(with --parse-cache also whether it came from the cache)
+    "optimize": summary of the optimized program(only with --optimize)
+    "progress": executed instructions so far, written every progress interval
+    "log": one execution log entry(only with --log)
+    "final": halted reason, steps, timing, execution point, registers and memory once the run stops(with --detect-cycles the halted reason can be "cycle", which also gives the cycle length and block)
+    "error": the stage("read", "parse", "optimize" or "execution") that failed and the error(with the execution point for the execution stage), the exit code is then 1
+    With --optimize every execution point is given as the matching point of the ASM file(see CPU_optimizer.original_point)
+    """
+    parser = argparse.ArgumentParser(description = "Runs an ASM file without prompts and writes the results as NDJSON")
+    parser.add_argument("file", help = "ASM file to run")
+    parser.add_argument("--bit-width", type = int, default = fallback_bit_width, help = "bit width of the CPU(default: "+str(fallback_bit_width)+")")
+    parser.add_argument("--iterations", type = int, default = fallback_iterations, help = "instruction budget(default: "+str(fallback_iterations)+")")
+    parser.add_argument("--engine", default = "interpreter", choices = CPU_core.valid_engines_global, help = "execution engine(default: interpreter)")
+    parser.add_argument("--autoloop", action = "store_true", help = "loop back to the start of a block instead of erroring out at its end")
+    parser.add_argument("--progress-interval", type = int, default = fallback_progress_interval, help = "instructions between progress records(default: "+str(fallback_progress_interval)+")")
+    parser.add_argument("--log", action = "store_true", help = "write a log record for every executed instruction")
+    parser.add_argument("--memory", default = "full", choices = ["full", "digest", "none"], help = "how the final memory is written: every written word, a SHA-256 digest or not at all(default: full)")
+    parser.add_argument("--output", help = "file to write the records to instead of stdout")
+    parser.add_argument("--profile-report", help = "profile the run and write the text report of the profile to this file")
+    parser.add_argument("--profile-stacks", help = "profile the run and write the collapsed stacks of the profile(for flamegraph tools) to this file")
+    parser.add_argument("--coverage-report", help = "record the coverage of the run and write it as JSON to this file")
+    parser.add_argument("--coverage-listing", help = "record the coverage of the run and write the ASM annotated with it to this file")
+    parser.add_argument("--coverage-counts", action = "store_true", help = "count every execution of each instruction for the coverage instead of only whether it ran")
+    parser.add_argument("--parse-cache", help = "directory to cache parsed programs in across runs(see CPU_parse_cache.py)")
+    parser.add_argument("--detect-cycles", action = "store_true", help = "stop the run once the state of the CPU repeats, as it would then never end")
+    parser.add_argument("--optimize", action = "store_true", help = "fold known register contents, remove unreachable blocks and dead register writes and lay out the blocks for fewer jumps before running(see CPU_optimizer.py), the final registers and memory stay the same but the steps can differ")
+    arguments = parser.parse_args(arguments)
+    if arguments.bit_width < 1:
+        parser.error("Invalid bit width(<1): "+str(arguments.bit_width))
+    if arguments.iterations < 0:
+        parser.error("Invalid iterations(<0): "+str(arguments.iterations))
+    if arguments.progress_interval < 1:
+        parser.error("Invalid progress interval(<1): "+str(arguments.progress_interval))
+    if arguments.output != None:
+        output = open(arguments.output, "w")
+    else:
+        output = sys.stdout
+    try:
+        return(headless_run(arguments, output))
+    finally:
+        if output != sys.stdout:
+            output.close()
+
+def headless_run(arguments, output):
+    """
+    Does the work of headless_main once the arguments are parsed and returns the exit code
+    """
+    stage = "read"
+    CPU_obj = None
+    try:
+        # The file is streamed into the parser instead of being read into memory
+        asm_file = open(arguments.file, "r")
+        stage = "parse"
+        start_time = time.perf_counter()
+        with asm_file:
+            if arguments.parse_cache != None:
+                cache = CPU_parse_cache.parse_cache(arguments.parse_cache)
+                asm_out = cache.get_file_program(arguments.file)
+            else:
+                cache = None
+                asm_out = CPU_ASM_parser.program(asm_file)
+        parse_time = time.perf_counter() - start_time
+        instruction_count = 0
+        for block_id in asm_out.block_ids:
+            instruction_count = instruction_count + len(asm_out.program_instructions[block_id])
+        record = {"type": "parse", "file": arguments.file, "lines": asm_out.line_count, "blocks": len(asm_out.block_ids), "instructions": instruction_count, "parse_time": parse_time}
+        if cache != None:
+            record["cache_hit"] = cache.hits > 0
+        write_record(output, record)
+        if arguments.optimize == True:
+            stage = "optimize"
+            start_time = time.perf_counter()
+            asm_out = CPU_optimizer.optimize_program(asm_out, arguments.bit_width, arguments.autoloop)
+            optimize_time = time.perf_counter() - start_time
+            instruction_count = 0
+            for block_id in asm_out.block_ids:
+                instruction_count = instruction_count + len(asm_out.program_instructions[block_id])
+            write_record(output, {"type": "optimize", "blocks": len(asm_out.block_ids), "instructions": instruction_count, "optimize_time": optimize_time})
+        stage = "execution"
+        # The log records are written straight from each step's info so no log is kept in memory
+        profile = arguments.profile_report != None or arguments.profile_stacks != None
+        coverage = None
+        if arguments.coverage_report != None or arguments.coverage_listing != None:
+            if arguments.coverage_counts == True:
+                coverage = "counts"
+            else:
+                coverage = "bitmap"
+        CPU_obj = CPU_core.CPU(arguments.bit_width, arguments.autoloop, engine = arguments.engine, log_policy = "off", profile = profile, coverage = coverage, detect_cycles = arguments.detect_cycles)
+        CPU_obj.load_program(asm_out)
+        start_time = time.perf_counter()
+        steps = 0
+        halted_reason = None
+        while halted_reason == None:
+            batch = arguments.progress_interval
+            if arguments.iterations - steps < batch:
+                batch = arguments.iterations - steps
+            if arguments.log == True:
+                batch_steps = 0
+                while batch_steps < batch and CPU_obj.get_cycle() == None:
+                    info = CPU_obj.step_single_instruction(True)
+                    if info == False:
+                        break
+                    instruction, involved_parameters, changed_parameters, starting_execution_point, new_execution_point = info[1]
+                    starting_execution_point = CPU_optimizer.original_point(asm_out, starting_execution_point, arguments.autoloop)
+                    new_execution_point = CPU_optimizer.original_point(asm_out, new_execution_point, arguments.autoloop)
+                    write_record(output, {"type": "log", "step": steps + batch_steps, "instruction": instruction, "involved": involved_parameters, "changed": changed_parameters, "start": starting_execution_point, "end": new_execution_point})
+                    batch_steps = batch_steps + 1
+            else:
+                batch_steps = CPU_obj.run(max_instructions = batch).steps
+            steps = steps + batch_steps
+            if CPU_obj.get_execution_point() == ("END", 0):
+                halted_reason = "end"
+            elif CPU_obj.get_cycle() != None:
+                halted_reason = "cycle"
+            elif steps >= arguments.iterations:
+                halted_reason = "budget"
+            else:
+                write_record(output, {"type": "progress", "steps": steps, "elapsed": time.perf_counter() - start_time, "execution_point": CPU_optimizer.original_point(asm_out, CPU_obj.get_execution_point(), arguments.autoloop)})
+        elapsed = time.perf_counter() - start_time
+        summary = CPU_core.run_summary(halted_reason, steps, elapsed, CPU_obj.get_cycle())
+        record = {"type": "final"}
+        record.update(summary.as_dict())
+        record["execution_point"] = CPU_optimizer.original_point(asm_out, CPU_obj.get_execution_point(), arguments.autoloop)
+        record["registers"] = CPU_obj.get_registers()
+        if arguments.memory == "full":
+            record["memory"] = CPU_obj.get_memory()
+        elif arguments.memory == "digest":
+            record["memory_digest"] = CPU_sweep_runner.memory_digest(CPU_obj.get_memory())
+        write_record(output, record)
+        if arguments.profile_report != None:
+            with open(arguments.profile_report, "w") as report_file:
+                report_file.write(CPU_obj.get_profiler().report())
+        if arguments.profile_stacks != None:
+            CPU_obj.get_profiler().write_collapsed_stacks(arguments.profile_stacks)
+        if arguments.coverage_report != None:
+            CPU_obj.get_coverage().write_report(arguments.coverage_report)
+        if arguments.coverage_listing != None:
+            with open(arguments.file, "r") as asm_file:
+                split_asm_lines = asm_file.read().splitlines()
+            with open(arguments.coverage_listing, "w") as listing_file:
+                listing_file.write(CPU_obj.get_coverage().annotated_listing(split_asm_lines))
+    except Exception as e:
+        record = {"type": "error", "stage": stage, "error": str(type(e).__name__)+": "+str(e)}
+        if stage == "execution" and CPU_obj != None:
+            record["execution_point"] = CPU_optimizer.original_point(asm_out, CPU_obj.get_execution_point(), arguments.autoloop)
+        write_record(output, record)
+        return(1)
+    return(0)
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # Any command line arguments select the headless mode, without any the interactive prompts are used
+    if len(sys.argv) > 1:
+        sys.exit(headless_main())
+    else:
+        main()
\ No newline at end of file
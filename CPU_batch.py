@@ -0,0 +1,323 @@
+import CPU_engine
+
+# NumPy is only needed for the batch executor, the rest of the simulator runs without it
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Memory words per lane that a batch executor starts with, the RAM grows when a lane stores past the end
+initial_memory_words_global = 1024
+# Memory words per lane that the RAM may grow to
+max_memory_words_global = 1 << 20
+
+class batch_executor():
+    def __init__(self, program, bit_width, lanes, autoloop_block = True, max_memory_words = max_memory_words_global):
+        """
+        Runs one parsed program(see CPU_ASM_parser.program) over many independent CPU states(lanes) at once
+        Every register is kept as a NumPy vector with one entry per lane and every instruction is evaluated for all lanes at the same execution point in one go
+        Lanes that diverge at JIE/JNE are grouped by pc, each step executes the lowest pc any running lane is at(with only the lanes at that pc active) so lanes that fell behind catch up and run together again
+        Every lane has its own RAM, kept as a words x lanes array that grows as lanes store to higher addresses(up to max_memory_words)
+        Only bit widths up to 64 are supported, MEMAD is kept modulo 2**64
+        The results of each lane are identical to running the program on its own CPU(see CPU_core.CPU)
+        """
+        if numpy == None:
+            raise ImportError("The batch executor needs NumPy to be installed")
+        if bit_width < 1 or bit_width > 64:
+            raise ValueError("The batch executor only supports bit widths from 1 to 64, got: "+str(bit_width))
+        if lanes < 1:
+            raise ValueError("Invalid amount of lanes: "+str(lanes))
+        self.bit_width = bit_width
+        self.lanes = lanes
+        self.mask = numpy.uint64((1 << bit_width) - 1)
+        self.max_memory_words = max_memory_words
+        # The block layout, register slots and execution points are the same as for the predecoded engine
+        self.layout = CPU_engine.decoded_program(program, bit_width, autoloop_block)
+        self.register_names = self.layout.register_names
+        self.register_slots = self.layout.register_slots
+        self.halt_pc = self.layout.halt_pc
+        self.registers = numpy.zeros((len(self.register_names), lanes), dtype = numpy.uint64)
+        self.memory = numpy.zeros((initial_memory_words_global, lanes), dtype = numpy.uint64)
+        self.lane_numbers = numpy.arange(lanes)
+        self.pcs = numpy.full(lanes, self.layout.point_to_pc(("START", 0)), dtype = numpy.int64)
+        self.executed_steps = numpy.zeros(lanes, dtype = numpy.int64)
+        self.handlers = list()
+        for block_id in program.block_ids:
+            block = program.program_instructions[block_id]
+            start = self.layout.block_starts[block_id]
+            for instruction_number in range(len(block)):
+                instruction, parameters = block[str(instruction_number)]
+                next_pc = start + instruction_number + 1
+                if next_pc == start + len(block) and autoloop_block == True:
+                    next_pc = start
+                self.handlers.append(self.decode_instruction(instruction, parameters, next_pc))
+            if autoloop_block == False or len(block) == 0:
+                self.handlers.append(make_fall_off_handler(self.layout.handlers[len(self.handlers)]))
+        self.handlers.append(None)
+    def decode_instruction(self, instruction, parameters, next_pc):
+        """
+        Returns the vector handler for a single instruction
+        Handlers are called as handler(registers, lanes) where lanes selects the active lanes(a slice or an index array) and return the next pc(for all active lanes or per lane)
+        """
+        bit_width = numpy.uint64(self.bit_width)
+        mask = self.mask
+        slots = self.register_slots
+        carry = slots["CARRY"]
+        memad = slots["MEMAD"]
+        zero = numpy.uint64(0)
+        if instruction == "END":
+            halt_pc = self.halt_pc
+            def handler(registers, lanes):
+                return(halt_pc)
+        elif instruction == "JMP":
+            target_pc = self.layout.block_starts[parameters]
+            def handler(registers, lanes):
+                return(target_pc)
+        elif instruction in ["JNE", "JIE"]:
+            reg_1, reg_2, jump_block_ID = parameters
+            reg_1 = slots[reg_1]
+            reg_2 = slots[reg_2]
+            target_pc = self.layout.block_starts[jump_block_ID]
+            if instruction == "JIE":
+                def handler(registers, lanes):
+                    return(numpy.where(registers[reg_1, lanes] == registers[reg_2, lanes], target_pc, next_pc))
+            else:
+                def handler(registers, lanes):
+                    return(numpy.where(registers[reg_1, lanes] != registers[reg_2, lanes], target_pc, next_pc))
+        elif instruction in ["CMP", "GT", "LT"]:
+            reg_1, reg_2, reg_3, reg_4, reg_5 = CPU_engine.map_slots(slots, parameters)
+            if instruction == "CMP":
+                compare = numpy.equal
+            elif instruction == "GT":
+                compare = numpy.greater
+            else:
+                compare = numpy.less
+            def handler(registers, lanes):
+                condition = compare(registers[reg_1, lanes], registers[reg_2, lanes])
+                registers[reg_5, lanes] = numpy.where(condition, registers[reg_3, lanes], registers[reg_4, lanes])
+                return(next_pc)
+        elif instruction == "ADD":
+            reg_1, reg_2, reg_3 = CPU_engine.map_slots(slots, parameters)
+            if self.bit_width == 64:
+                # The sum wraps around modulo 2**64, so the carry is whether it wrapped
+                def handler(registers, lanes):
+                    number_1 = registers[reg_1, lanes]
+                    result = number_1 + registers[reg_2, lanes]
+                    if reg_3 != carry:
+                        registers[reg_3, lanes] = result
+                    registers[carry, lanes] = (result < number_1).astype(numpy.uint64)
+                    return(next_pc)
+            else:
+                def handler(registers, lanes):
+                    result = registers[reg_1, lanes] + registers[reg_2, lanes]
+                    # The overflow overrides any attempt to use REG_3 to overwrite CARRY
+                    if reg_3 != carry:
+                        registers[reg_3, lanes] = result & mask
+                    registers[carry, lanes] = result >> bit_width
+                    return(next_pc)
+        elif instruction == "MUL":
+            reg_1, reg_2, reg_3 = CPU_engine.map_slots(slots, parameters)
+            def handler(registers, lanes):
+                registers[reg_3, lanes] = (registers[reg_1, lanes] * registers[reg_2, lanes]) & mask
+                return(next_pc)
+        elif instruction == "SHUP":
+            reg_1, reg_2, reg_3 = CPU_engine.map_slots(slots, parameters)
+            def handler(registers, lanes):
+                shift = registers[reg_2, lanes]
+                # NumPy shifts of 64 or more are undefined, any shift of the bit width or more leaves nothing inside the word anyway
+                shifted = registers[reg_1, lanes] << numpy.minimum(shift, numpy.uint64(63))
+                registers[reg_3, lanes] = numpy.where(shift >= bit_width, zero, shifted & mask)
+                return(next_pc)
+        elif instruction == "SHDO":
+            reg_1, reg_2, reg_3 = CPU_engine.map_slots(slots, parameters)
+            def handler(registers, lanes):
+                shift = registers[reg_2, lanes]
+                shifted = registers[reg_1, lanes] >> numpy.minimum(shift, numpy.uint64(63))
+                registers[reg_3, lanes] = numpy.where(shift >= numpy.uint64(64), zero, shifted & mask)
+                return(next_pc)
+        elif instruction == "NOT":
+            reg_1, reg_2 = CPU_engine.map_slots(slots, parameters)
+            if reg_1 == memad and self.bit_width < 64:
+                # Only MEMAD can be wider than the bit width
+                def handler(registers, lanes):
+                    registers[reg_2, lanes] = negate_words(registers[reg_1, lanes], mask)
+                    return(next_pc)
+            else:
+                def handler(registers, lanes):
+                    registers[reg_2, lanes] = registers[reg_1, lanes] ^ mask
+                    return(next_pc)
+        elif instruction == "AND":
+            reg_1, reg_2, reg_3 = CPU_engine.map_slots(slots, parameters)
+            def handler(registers, lanes):
+                registers[reg_3, lanes] = registers[reg_1, lanes] & registers[reg_2, lanes]
+                return(next_pc)
+        elif instruction == "OR":
+            reg_1, reg_2, reg_3 = CPU_engine.map_slots(slots, parameters)
+            def handler(registers, lanes):
+                registers[reg_3, lanes] = registers[reg_1, lanes] | registers[reg_2, lanes]
+                return(next_pc)
+        elif instruction == "XOR":
+            reg_1, reg_2, reg_3 = CPU_engine.map_slots(slots, parameters)
+            if memad in [reg_1, reg_2] and self.bit_width < 64:
+                # Same (X & ~Y) | (~X & Y) form as CPU_engine.xor_word for numbers wider than the bit width
+                def handler(registers, lanes):
+                    number_1 = registers[reg_1, lanes]
+                    number_2 = registers[reg_2, lanes]
+                    registers[reg_3, lanes] = (number_1 & negate_words(number_2, mask)) | (negate_words(number_1, mask) & number_2)
+                    return(next_pc)
+            else:
+                def handler(registers, lanes):
+                    registers[reg_3, lanes] = registers[reg_1, lanes] ^ registers[reg_2, lanes]
+                    return(next_pc)
+        elif instruction == "LOAD":
+            reg_1 = slots[parameters]
+            def handler(registers, lanes):
+                addresses = registers[memad, lanes]
+                memory = self.memory
+                words = memory.shape[0]
+                # Addresses past the end of the RAM have never been written and read as 0
+                inside = addresses < numpy.uint64(words)
+                values = memory[numpy.where(inside, addresses, zero).astype(numpy.int64), self.lane_numbers[lanes]]
+                registers[reg_1, lanes] = numpy.where(inside, values, zero)
+                return(next_pc)
+        elif instruction == "STORE":
+            reg_1 = slots[parameters]
+            def handler(registers, lanes):
+                addresses = registers[memad, lanes]
+                highest_address = int(addresses.max())
+                if highest_address >= self.memory.shape[0]:
+                    self.grow_memory(highest_address + 1)
+                self.memory[addresses.astype(numpy.int64), self.lane_numbers[lanes]] = registers[reg_1, lanes]
+                return(next_pc)
+        elif instruction == "SET":
+            reg_1 = slots[parameters[0]]
+            value = numpy.uint64(parameters[1] % (2**self.bit_width))
+            def handler(registers, lanes):
+                registers[reg_1, lanes] = value
+                return(next_pc)
+        elif instruction == "COPY":
+            reg_1, reg_2 = CPU_engine.map_slots(slots, parameters)
+            def handler(registers, lanes):
+                registers[reg_2, lanes] = registers[reg_1, lanes]
+                return(next_pc)
+        elif instruction == "SETMEMAD":
+            data = numpy.uint64(parameters % (2**64))
+            def handler(registers, lanes):
+                registers[memad, lanes] = data
+                return(next_pc)
+        elif instruction == "ADDMEMAD":
+            reg_1 = slots[parameters]
+            def handler(registers, lanes):
+                registers[memad, lanes] = registers[memad, lanes] + registers[reg_1, lanes]
+                return(next_pc)
+        else:
+            fmt_string = "The instruction {instruction} has not been implemented yet."
+            error_string = fmt_string.format(instruction = instruction)
+            raise NotImplementedError(error_string)
+        return(handler)
+    def grow_memory(self, words):
+        """
+        Grows the RAM of every lane to hold at least the given amount of words
+        """
+        if words > self.max_memory_words:
+            raise ValueError("Memory address "+str(words - 1)+" is past the batch executor's limit of "+str(self.max_memory_words)+" words per lane")
+        new_words = self.memory.shape[0]
+        while new_words < words:
+            new_words = new_words * 2
+        if new_words > self.max_memory_words:
+            new_words = self.max_memory_words
+        memory = numpy.zeros((new_words, self.lanes), dtype = numpy.uint64)
+        memory[0:self.memory.shape[0]] = self.memory
+        self.memory = memory
+    def set_register(self, register, values):
+        """
+        Sets a register of every lane, values is a single value for all lanes or a sequence with one value per lane
+        Values of registers other than MEMAD are truncated to the bit width
+        """
+        if register not in self.register_slots:
+            raise ValueError("The register "+str(register)+" is not used by the program")
+        values = numpy.asarray(values, dtype = numpy.uint64)
+        if register != "MEMAD":
+            values = values & self.mask
+        self.registers[self.register_slots[register]] = values
+    def get_register(self, register):
+        """
+        Returns a copy of the contents of a register for every lane
+        """
+        if register not in self.register_slots:
+            raise ValueError("The register "+str(register)+" is not used by the program")
+        return(self.registers[self.register_slots[register]].copy())
+    def set_memory(self, address, values):
+        """
+        Sets a memory address of every lane, values is a single value for all lanes or a sequence with one value per lane
+        """
+        if address >= self.memory.shape[0]:
+            self.grow_memory(address + 1)
+        self.memory[address] = numpy.asarray(values, dtype = numpy.uint64)
+    def get_memory(self, address):
+        """
+        Returns the contents of a memory address for every lane
+        """
+        if address >= self.memory.shape[0]:
+            return(numpy.zeros(self.lanes, dtype = numpy.uint64))
+        return(self.memory[address].copy())
+    def get_execution_points(self):
+        """
+        Returns the current execution point (block_id, num) of every lane
+        """
+        points = list()
+        for pc in self.pcs.tolist():
+            points.append(self.layout.points[pc])
+        return(points)
+    def halted(self):
+        """
+        Returns a boolean array of which lanes have executed the END instruction
+        """
+        return(self.pcs == self.halt_pc)
+    def run(self, max_steps = None):
+        """
+        Executes until every lane has executed the END instruction or, if max_steps is given, executed max_steps more instructions
+        Returns an array with the amount of instructions each lane executed
+        """
+        handlers = self.handlers
+        registers = self.registers
+        pcs = self.pcs
+        halt_pc = self.halt_pc
+        lanes = self.lanes
+        executed = numpy.zeros(lanes, dtype = numpy.int64)
+        while True:
+            running = pcs != halt_pc
+            if max_steps != None:
+                running = running & (executed < max_steps)
+            running_pcs = pcs[running]
+            if running_pcs.size == 0:
+                break
+            pc = int(running_pcs.min())
+            active = running & (pcs == pc)
+            if running_pcs.size == lanes and int(running_pcs.max()) == pc:
+                # Every lane is at this pc, a slice avoids copying through an index array
+                active_lanes = slice(None)
+            else:
+                active_lanes = numpy.nonzero(active)[0]
+            pcs[active_lanes] = handlers[pc](registers, active_lanes)
+            executed[active_lanes] += 1
+        self.executed_steps = self.executed_steps + executed
+        return(executed)
+
+def negate_words(numbers, mask):
+    """
+    Bitwise NOT of every number over the bit width(given as its mask)
+    Gives the same result as CPU_engine.negate_word for numbers wider than the bit width by spreading the highest set bit down to get the width
+    """
+    width_mask = numbers | mask
+    for shift in [1, 2, 4, 8, 16, 32]:
+        width_mask = width_mask | (width_mask >> numpy.uint64(shift))
+    return(width_mask ^ numbers)
+
+def make_fall_off_handler(scalar_handler):
+    """
+    Returns a vector handler that errors out like the given fall off handler of the predecoded engine
+    """
+    def handler(registers, lanes):
+        scalar_handler(None, None)
+    return(handler)
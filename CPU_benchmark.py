@@ -0,0 +1,349 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import CPU_core
+import CPU_ASM_parser
+import CPU_parse_cache
+
+fallback_steps = 200000
+fallback_repeat = 3
+fallback_threshold = 0.1
+fallback_parse_blocks = 2000
+# Bit widths every stepping workload is run with, the ALU workload is additionally run very wide
+workload_bit_widths_global = [8, 32]
+wide_bit_widths_global = [1024, 4096]
+
+def alu_loop_source():
+    """
+    ASM of an endless loop of arithmetic and logic instructions
+    """
+    lines = ["BLOCK START",
+             "SET R_ONE 0d1",
+             "SET R_A 0d12345",
+             "SET R_B 0d678",
+             "JMP LOOP",
+             "BLOCK LOOP",
+             "ADD R_A R_ONE R_A",
+             "MUL R_A R_B R_C",
+             "AND R_C R_A R_D",
+             "OR R_D R_B R_E",
+             "SHUP R_E R_ONE R_F",
+             "SHDO R_F R_ONE R_G",
+             "ADD R_G R_C R_B",
+             "CMP CARRY R_ONE R_A R_B R_H",
+             "GT R_H R_B R_A R_C R_B",
+             "JMP LOOP"]
+    return(lines)
+
+def memory_sweep_source():
+    """
+    ASM of an endless loop storing a counter to ascending memory addresses and loading it back
+    """
+    lines = ["BLOCK START",
+             "SET R_ONE 0d1",
+             "JMP LOOP",
+             "BLOCK LOOP",
+             "STORE R_V",
+             "LOAD R_W",
+             "ADD R_V R_ONE R_V",
+             "ADDMEMAD R_ONE",
+             "JMP LOOP"]
+    return(lines)
+
+def branch_heavy_source(levels = 8):
+    """
+    ASM of an endless loop that branches on every bit of a counter, going through levels blocks for every count
+    """
+    lines = ["BLOCK START",
+             "SET R_ONE 0d1",
+             "SET R_ZERO 0d0"]
+    for level in range(levels):
+        lines.append("SET R_M"+str(level)+" 0d"+str(1 << level))
+    lines.append("JMP LOOP")
+    lines.append("BLOCK LOOP")
+    lines.append("ADD R_I R_ONE R_I")
+    lines.append("JMP L0_0")
+    for level in range(levels):
+        if level + 1 < levels:
+            next_0 = "L"+str(level + 1)+"_0"
+            next_1 = "L"+str(level + 1)+"_1"
+        else:
+            next_0 = "LOOP"
+            next_1 = "LOOP"
+        for side in range(2):
+            lines.append("BLOCK L"+str(level)+"_"+str(side))
+            lines.append("AND R_I R_M"+str(level)+" R_T")
+            lines.append("JIE R_T R_ZERO "+next_0)
+            lines.append("JNE R_T R_ONE "+next_1)
+            lines.append("JMP "+next_0)
+    return(lines)
+
+def many_registers_source(registers = 512):
+    """
+    ASM of an endless loop that goes through the given amount of different registers
+    """
+    lines = ["BLOCK START",
+             "SET R_ONE 0d1",
+             "JMP LOOP",
+             "BLOCK LOOP"]
+    for register in range(registers):
+        lines.append("ADD R_"+str(register)+" R_ONE R_"+str((register + 1) % registers))
+    lines.append("JMP LOOP")
+    return(lines)
+
+def large_source(blocks):
+    """
+    ASM of the given amount of blocks of mixed instructions for timing the parser
+    """
+    lines = ["# Generated source for timing the ASM parser"]
+    for block in range(blocks):
+        if block == 0:
+            lines.append("BLOCK START")
+        else:
+            lines.append("BLOCK B"+str(block))
+        lines.append("SET R_A 0d"+str(block))
+        lines.append("SET R_B 0x"+format(block * 7, "X"))
+        lines.append("ADD R_A R_B R_C")
+        lines.append("  MUL R_C R_A R_D   ")
+        lines.append("SHUP R_D R_B R_E")
+        lines.append("SHDO R_E R_B R_F")
+        lines.append("AND R_F R_A R_G")
+        lines.append("OR R_G R_B R_H")
+        lines.append("COPY R_H R_A")
+        lines.append("CMP R_A R_B R_C R_D R_E")
+        lines.append("GT R_A R_B R_C R_D R_E")
+        lines.append("LT R_A R_B R_C R_D R_E")
+        lines.append("SETMEMAD 0d"+str(block))
+        lines.append("ADDMEMAD R_A")
+        lines.append("STORE R_A")
+        lines.append("# comment")
+        lines.append("")
+        lines.append("JIE R_A R_B B"+str((block * 13 + 1) % blocks + 1))
+        lines.append("JNE R_A R_C B"+str((block * 7 + 3) % blocks + 1))
+        lines.append("JMP B"+str(block + 1))
+    lines.append("BLOCK B"+str(blocks))
+    lines.append("END")
+    return(lines)
+
+# Stepping workloads: name -> (function returning the ASM lines, bit widths to run with)
+workloads_global = {"alu_loop": (alu_loop_source, workload_bit_widths_global + wide_bit_widths_global),
+                    "memory_sweep": (memory_sweep_source, workload_bit_widths_global),
+                    "branch_heavy": (branch_heavy_source, workload_bit_widths_global),
+                    "many_registers": (many_registers_source, workload_bit_widths_global)}
+
+# Whether a higher value of a metric is better, used to decide what counts as a regression
+metrics_global = {"lines_per_second": True, "instructions_per_second": True, "seconds": False}
+
+def best_time(function, repeat, setup = None):
+    """
+    Calls function repeat times and returns the fastest wall clock time and the result of the last call
+    If setup is given, it is called(untimed) before every call and its result is passed to function
+    """
+    best = None
+    for i in range(repeat):
+        if setup != None:
+            argument = setup()
+            start_time = time.perf_counter()
+            result = function(argument)
+        else:
+            start_time = time.perf_counter()
+            result = function()
+        elapsed = time.perf_counter() - start_time
+        if best == None or elapsed < best:
+            best = elapsed
+    return(best, result)
+
+def peak_memory(function, setup = None):
+    """
+    Calls function once with tracemalloc running and returns the peak amount of bytes allocated during the call(and setup if given)
+    This is done in a separate call from the timed ones as tracemalloc slows everything down
+    """
+    tracemalloc.start()
+    try:
+        if setup != None:
+            function(setup())
+        else:
+            function()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return(peak)
+
+def benchmark_parse(blocks, repeat, measure_memory):
+    lines = large_source(blocks)
+    def parse():
+        return(CPU_ASM_parser.program(lines))
+    seconds, parsed_program = best_time(parse, repeat)
+    result = {"lines": len(lines), "seconds": seconds, "lines_per_second": len(lines) / seconds}
+    if measure_memory == True:
+        result["peak_memory_bytes"] = peak_memory(parse)
+    return(result)
+
+def benchmark_stream_parse(blocks, repeat, measure_memory):
+    # Times parsing straight from a file object, the source is never held in memory as a whole
+    lines = large_source(blocks)
+    with tempfile.TemporaryDirectory() as source_directory:
+        file_path = os.path.join(source_directory, "large_source.txt")
+        with open(file_path, "w") as source_file:
+            source_file.write("\n".join(lines)+"\n")
+        def parse():
+            with open(file_path, "r") as source_file:
+                return(CPU_ASM_parser.program(source_file))
+        seconds, parsed_program = best_time(parse, repeat)
+        result = {"lines": len(lines), "seconds": seconds, "lines_per_second": len(lines) / seconds}
+        if measure_memory == True:
+            result["peak_memory_bytes"] = peak_memory(parse)
+    return(result)
+
+def benchmark_cached_parse(blocks, repeat):
+    # Times the hits of a parse cache that already holds the program
+    lines = large_source(blocks)
+    with tempfile.TemporaryDirectory() as cache_directory:
+        cache = CPU_parse_cache.parse_cache(cache_directory)
+        cache.get_program(lines)
+        def parse():
+            return(cache.get_program(lines))
+        seconds, parsed_program = best_time(parse, repeat)
+    return({"lines": len(lines), "seconds": seconds, "lines_per_second": len(lines) / seconds})
+
+def benchmark_load(lines, bit_width, engine, repeat):
+    # Every load gets a freshly parsed program so the compiled engines cannot reuse an earlier compilation
+    def parse():
+        return(CPU_ASM_parser.program(lines))
+    def load(parsed_program):
+        CPU_obj = CPU_core.CPU(bit_width, engine = engine, log_policy = "off")
+        CPU_obj.load_program(parsed_program)
+        return(CPU_obj)
+    seconds, CPU_obj = best_time(load, repeat, parse)
+    return({"seconds": seconds})
+
+def benchmark_steps(parsed_program, bit_width, engine, steps, repeat, measure_memory):
+    # Loading(and compiling for the compiled engines) is timed by benchmark_load, so it is left out here
+    def load():
+        CPU_obj = CPU_core.CPU(bit_width, engine = engine, log_policy = "off")
+        CPU_obj.load_program(parsed_program)
+        return(CPU_obj)
+    def run(CPU_obj):
+        return(CPU_obj.run(max_instructions = steps))
+    seconds, summary = best_time(run, repeat, load)
+    result = {"steps": summary.steps, "seconds": seconds, "instructions_per_second": summary.steps / seconds}
+    if measure_memory == True:
+        result["peak_memory_bytes"] = peak_memory(run, load)
+    return(result)
+
+def run_benchmarks(engines, steps, repeat, parse_blocks, measure_memory, progress = None):
+    """
+    Runs every benchmark and returns a dict of benchmark name -> measurements
+    Names are "parse/large_source", "parse_stream/large_source", "parse_cached/large_source", "load/<workload>/<engine>" and "step/<workload>/<bit width>/<engine>"
+    """
+    results = dict()
+    results["parse/large_source"] = benchmark_parse(parse_blocks, repeat, measure_memory)
+    if progress != None:
+        progress("parse/large_source", results["parse/large_source"])
+    results["parse_stream/large_source"] = benchmark_stream_parse(parse_blocks, repeat, measure_memory)
+    if progress != None:
+        progress("parse_stream/large_source", results["parse_stream/large_source"])
+    results["parse_cached/large_source"] = benchmark_cached_parse(parse_blocks, repeat)
+    if progress != None:
+        progress("parse_cached/large_source", results["parse_cached/large_source"])
+    for workload in workloads_global:
+        source_function, bit_widths = workloads_global[workload]
+        lines = source_function()
+        parsed_program = CPU_ASM_parser.program(lines)
+        for engine in engines:
+            name = "load/"+workload+"/"+engine
+            results[name] = benchmark_load(lines, bit_widths[0], engine, repeat)
+            if progress != None:
+                progress(name, results[name])
+        for bit_width in bit_widths:
+            for engine in engines:
+                name = "step/"+workload+"/"+str(bit_width)+"/"+engine
+                results[name] = benchmark_steps(parsed_program, bit_width, engine, steps, repeat, measure_memory)
+                if progress != None:
+                    progress(name, results[name])
+    return(results)
+
+def compare_results(results, baseline, threshold):
+    """
+    Compares the results against a baseline(both dicts of benchmark name -> measurements) and returns a list of (name, metric, baseline value, value, change)
+    for every metric that got worse by more than threshold(as a fraction, 0.1 is 10%)
+    """
+    regressions = list()
+    for name in results:
+        if name not in baseline:
+            continue
+        for metric in metrics_global:
+            if metric not in results[name] or metric not in baseline[name]:
+                continue
+            # Load timings are the only ones where seconds is the main metric, the others are judged on their rate
+            if metric == "seconds" and not name.startswith("load/"):
+                continue
+            value = results[name][metric]
+            baseline_value = baseline[name][metric]
+            if baseline_value == 0:
+                continue
+            change = (value - baseline_value) / baseline_value
+            if metrics_global[metric] == True:
+                worse = change < -threshold
+            else:
+                worse = change > threshold
+            if worse == True:
+                regressions.append((name, metric, baseline_value, value, change))
+    return(regressions)
+
+def format_result(name, result):
+    if "instructions_per_second" in result:
+        text = str(int(result["instructions_per_second"]))+" instructions/s"
+    elif "lines_per_second" in result:
+        text = str(int(result["lines_per_second"]))+" lines/s"
+    else:
+        text = str(round(result["seconds"] * 1000, 3))+" ms"
+    if "peak_memory_bytes" in result:
+        text = text+", peak "+str(round(result["peak_memory_bytes"] / 1048576, 2))+" MiB"
+    return(name+": "+text)
+
+def main(arguments = None):
+    parser = argparse.ArgumentParser(description = "Times parsing, loading and stepping of canonical workloads and compares them against a baseline")
+    parser.add_argument("--engines", default = ",".join(CPU_core.valid_engines_global), help = "comma separated engines to benchmark(default: all)")
+    parser.add_argument("--steps", type = int, default = fallback_steps, help = "instructions executed per stepping benchmark(default: "+str(fallback_steps)+")")
+    parser.add_argument("--repeat", type = int, default = fallback_repeat, help = "times every benchmark is repeated, the fastest is kept(default: "+str(fallback_repeat)+")")
+    parser.add_argument("--parse-blocks", type = int, default = fallback_parse_blocks, help = "blocks in the generated parser source(default: "+str(fallback_parse_blocks)+")")
+    parser.add_argument("--no-memory", action = "store_true", help = "skip measuring the peak memory")
+    parser.add_argument("--output", help = "JSON file to write the results to")
+    parser.add_argument("--baseline", help = "JSON file of earlier results to compare against")
+    parser.add_argument("--threshold", type = float, default = fallback_threshold, help = "fraction a metric may get worse by before it counts as a regression(default: "+str(fallback_threshold)+")")
+    arguments = parser.parse_args(arguments)
+    engines = arguments.engines.split(",")
+    for engine in engines:
+        if engine not in CPU_core.valid_engines_global:
+            parser.error("Unknown execution engine: "+str(engine))
+    def progress(name, result):
+        print(format_result(name, result))
+        sys.stdout.flush()
+    results = run_benchmarks(engines, arguments.steps, arguments.repeat, arguments.parse_blocks, arguments.no_memory == False, progress)
+    if arguments.output != None:
+        report = {"python": platform.python_version(), "platform": platform.platform(), "time": time.time(), "results": results}
+        with open(arguments.output, "w") as output_file:
+            json.dump(report, output_file, indent = 1)
+    if arguments.baseline != None:
+        with open(arguments.baseline, "r") as baseline_file:
+            baseline = json.load(baseline_file)["results"]
+        regressions = compare_results(results, baseline, arguments.threshold)
+        print("-----")
+        if len(regressions) == 0:
+            print("No regressions against "+arguments.baseline)
+        else:
+            print("Regressions against "+arguments.baseline)
+            for name, metric, baseline_value, value, change in regressions:
+                print(name+" "+metric+": "+str(round(baseline_value, 3))+" -> "+str(round(value, 3))+"("+str(round(change * 100, 1))+"%)")
+            return(1)
+    return(0)
+
+if __name__ == "__main__":
+    sys.exit(main())
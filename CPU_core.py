@@ -1,28 +1,173 @@
+import array
+import collections
+import itertools
+import sys
+import time
+
+import CPU_coverage
+import CPU_cycles
+import CPU_engine
+import CPU_jit
+import CPU_loops
+import CPU_profiler
+
+# Execution engines that can be selected when creating a CPU
+# "interpreter" decodes every instruction as it is stepped and logs it
+# "predecoded" decodes the whole program once at load time(see CPU_engine.decoded_program), fusing common pairs of instructions into superinstructions, and does not log the instructions it runs
+# "compiled" additionally compiles every block into a Python function(see CPU_jit.compiled_program) and does not log the instructions it runs either
+# "tracing" is the compiled engine plus traces of hot paths that span several blocks(see CPU_jit.tracing_program)
+# "fastforward" is the compiled engine plus skipping over the passes of simple counted loops in one go(see CPU_loops.fast_forward_program)
+valid_engines_global = ["interpreter", "predecoded", "compiled", "tracing", "fastforward"]
+# RAM models that can be selected when creating a CPU
+# "paged" keeps words in fixed size pages that are allocated as they are first written(see paged_memory)
+# "dict" keeps every written word as its own dict entry(see dict_memory)
+valid_memory_backends_global = ["paged", "dict"]
+# Execution log policies that can be selected when creating a CPU
+# "full" keeps an entry for every executed instruction
+# "ring" only keeps the entries of the last log_length executed instructions
+# "sampled" keeps the entry of every log_interval-th executed instruction(the 1st, the log_interval+1-th...)
+# "counters" keeps no entries, only the count of executed instructions
+# "stream" keeps no entries in memory but writes every entry into the log stream(a CPU_trace.trace_writer)
+# "off" keeps nothing
+valid_log_policies_global = ["full", "ring", "sampled", "counters", "stream", "off"]
+# Amount of instructions CPU.run executes between checks of its stop conditions
+run_batch_size_global = 10000
+
 class CPU():
-    def __init__(self, bit_width, autoloop_block = True):
+    def __init__(self, bit_width, autoloop_block = True, engine = "interpreter", memory_backend = "paged", log_policy = None, log_length = 1000, log_interval = 1000, log_stream = None, profile = False, profile_timing = True, coverage = None, detect_cycles = False):
+        """
+        Creates a CPU of the given bit width
+        The log policy defaults to "full" for the interpreter engine and to "off" for the other engines
+        The "stream" log policy needs log_stream to be a CPU_trace.trace_writer, which the caller closes once done
+        If profile is True, every loaded program gets a CPU_profiler.profiler(see get_profiler) that records the instructions executed
+        Instructions that do not get logged are then run through the profiler with the predecoded handlers(whatever the engine), profile_timing switches the host time measurement on or off
+        coverage can be "bitmap" or "counts" to give every loaded program a CPU_coverage.coverage_map(see get_coverage) instead, which also runs the predecoded handlers
+        If detect_cycles is True, every loaded program gets a CPU_cycles.cycle_detector(see get_cycle) and execution stops once the full state of the CPU repeats, run() then returns the "cycle" halted reason
+        The memory then keeps a hash of its contents up to date on every write, which makes writes somewhat slower
+        """
+        if log_policy == None:
+            if engine == "interpreter":
+                log_policy = "full"
+            else:
+                log_policy = "off"
+        if log_policy not in valid_log_policies_global:
+            raise ValueError("Unknown log policy: "+str(log_policy))
+        if log_policy == "stream" and log_stream == None:
+            raise ValueError("The stream log policy needs a log stream")
+        if engine not in valid_engines_global:
+            raise ValueError("Unknown execution engine: "+str(engine))
+        if memory_backend not in valid_memory_backends_global:
+            raise ValueError("Unknown memory backend: "+str(memory_backend))
+        if coverage not in [None, "bitmap", "counts"]:
+            raise ValueError("Unknown coverage mode: "+str(coverage))
+        if coverage != None and profile == True:
+            raise ValueError("Profiling and coverage can not be enabled at the same time, the profile already holds the execution counts")
         self.bit_width = bit_width
-        self.registers = memory()
-        self.registers.update("CARRY", 0)
-        self.registers.update("MEMAD", 0)
+        self.engine = engine
+        self.registers = register_file(["CARRY", "MEMAD"])
         if autoloop_block == True:
             self.autoloop_block = True
         else:
             self.autoloop_block = False
-        self.memory = memory()
+        if memory_backend == "paged" and detect_cycles == True:
+            self.memory = hashed_paged_memory(bit_width)
+        elif memory_backend == "paged":
+            self.memory = paged_memory(bit_width)
+        elif detect_cycles == True:
+            self.memory = hashed_dict_memory()
+        else:
+            self.memory = dict_memory()
         self.program = None
         self.execution_point = None
+        self.log_policy = log_policy
+        self.log_length = log_length
+        self.log_interval = log_interval
+        self.log_stream = log_stream
         self.execution_log = None
+        self.executed_steps = 0
+        self.decoded_program = None
+        self.profile = profile
+        self.profile_timing = profile_timing
+        self.profiler = None
+        self.coverage = coverage
+        self.coverage_map = None
+        self.detect_cycles = detect_cycles
+        self.cycle_detector = None
+        # Runs instructions that do not get logged, the decoded program of the engine, the profiler or the coverage map(or the cycle detector wrapping one of those)
+        self.runner = None
     def load_program(self, program):
         self.program = program
-        self.execution_log = []
+        if self.log_policy == "ring":
+            self.execution_log = collections.deque(maxlen = self.log_length)
+        else:
+            self.execution_log = []
+        self.executed_steps = 0
         self.execution_point = ("START", 0)
+        if self.engine == "predecoded":
+            self.decoded_program = CPU_engine.decoded_program(program, self.bit_width, self.autoloop_block, fuse = True)
+        elif self.engine == "compiled":
+            self.decoded_program = CPU_jit.get_compiled_program(program, self.bit_width, self.autoloop_block)
+        elif self.engine == "tracing":
+            self.decoded_program = CPU_jit.get_compiled_program(program, self.bit_width, self.autoloop_block, tracing = True)
+        elif self.engine == "fastforward":
+            self.decoded_program = CPU_loops.get_fast_forward_program(program, self.bit_width, self.autoloop_block)
+        else:
+            self.decoded_program = None
+        self.profiler = None
+        self.coverage_map = None
+        self.cycle_detector = None
+        self.runner = self.decoded_program
+        layout = self.decoded_program
+        if layout == None and (self.profile == True or self.coverage != None or self.detect_cycles == True):
+            layout = CPU_engine.decoded_program(program, self.bit_width, self.autoloop_block)
+        if self.profile == True or self.coverage != None:
+            if self.profile == True:
+                self.profiler = CPU_profiler.profiler(layout, program, self.profile_timing)
+                self.runner = self.profiler
+            else:
+                self.coverage_map = CPU_coverage.coverage_map(layout, program, self.coverage == "counts")
+                self.runner = self.coverage_map
+        if self.detect_cycles == True:
+            self.cycle_detector = CPU_cycles.cycle_detector(layout, program, self.runner)
+            if self.runner != None:
+                self.runner = self.cycle_detector
+        # Give every register used by the program its slot up front, keeping the contents of any registers that were already set
+        if self.decoded_program != None:
+            register_names = self.decoded_program.register_names
+        else:
+            register_names = CPU_engine.program_register_names(program)
+        previous_registers = self.registers.dump()
+        self.registers = register_file(register_names)
+        for register in previous_registers:
+            self.registers.update(register, previous_registers[register])
     def get_execution_log(self):
         """
-        Returns the full execution log as a list
-        The execution log looks like:
-        ((True/False(Did instructions get executed), (instruction(prefix), involved_parameters(dict), changed_parameters(dict), starting_execution_point(block_id, num), new_execution_point(block_id, num)))
+        Returns the execution log kept by the log policy
+        For "full" this is a list of every entry, for "ring" a deque of the last entries and for "sampled" a list of every log_interval-th entry
+        Each entry looks like:
+        (instruction(prefix), involved_parameters(dict), changed_parameters(dict), starting_execution_point(block_id, num), new_execution_point(block_id, num))
+        For "counters" a dict of {"steps": amount of executed instructions} is returned and for "stream" and "off" an empty list(the "stream" entries are read back with CPU_trace.trace_reader)
         """
+        if self.log_policy == "counters":
+            return({"steps": self.executed_steps})
         return(self.execution_log)
+    def get_profiler(self):
+        """
+        Returns the CPU_profiler.profiler of the loaded program, None if profiling is not enabled
+        """
+        return(self.profiler)
+    def get_coverage(self):
+        """
+        Returns the CPU_coverage.coverage_map of the loaded program, None if coverage is not enabled
+        """
+        return(self.coverage_map)
+    def get_cycle(self):
+        """
+        Returns the cycle found by the cycle detector as (length in instructions, block ID the cycle was measured from), None if no cycle was found or detection is not enabled
+        """
+        if self.cycle_detector == None:
+            return(None)
+        return(self.cycle_detector.cycle)
     def get_execution_point(self):
         """
         Returns the current execution point(will be used upon next execution step)
@@ -37,6 +182,11 @@ class CPU():
         if self.execution_point == ("END", 0):
             return(False)
         else:
+            # Only build the involved/changed parameters if the log policy keeps this step or the caller wants the info back
+            record_log = self.log_policy in ["full", "ring", "stream"] or (self.log_policy == "sampled" and self.executed_steps % self.log_interval == 0)
+            record = record_log or return_info == True
+            if self.profiler != None:
+                profile_start_time = time.perf_counter()
             starting_execution_point = self.execution_point
             block_id = starting_execution_point[0]
             instruction_number = starting_execution_point[1]
@@ -45,48 +195,55 @@ class CPU():
             except ValueError as e:
                 raise ValueError("Unable to get instruction at execution point "+str(self.execution_point)+" because of reason: "+str(e))
             if instruction == "END":
-                involved_parameters = ()
-                changed_parameters = {}
+                if record == True:
+                    involved_parameters = ()
+                    changed_parameters = {}
                 # Reserved block ID for halting execution
                 new_execution_point = ("END", 0)
             elif instruction == "JMP":
                 # Note that for single parameter instructions the ASM parser will only output the relevant string and NOT a tuple!!!
                 jump_block_ID = parameters
-                involved_parameters = {}
-                involved_parameters["Jump target"] = ("Block ID", jump_block_ID)
+                if record == True:
+                    involved_parameters = {}
+                    involved_parameters["Jump target"] = ("Block ID", jump_block_ID)
                 new_execution_point = (jump_block_ID, 0)
                 self.execution_point = new_execution_point
-                changed_parameters = {}
+                if record == True:
+                    changed_parameters = {}
             elif instruction == "JNE":
                 reg_1 = parameters[0]
                 reg_2 = parameters[1]
                 jump_block_ID = parameters[2]
                 reg_1_content = self.registers.get(reg_1)
                 reg_2_content = self.registers.get(reg_2)
-                involved_parameters = {}
-                involved_parameters["Reg_1"] = (reg_1, reg_1_content)
-                involved_parameters["Reg_2"] = (reg_2, reg_2_content)
-                involved_parameters["Jump target"] = ("Block ID", jump_block_ID)
+                if record == True:
+                    involved_parameters = {}
+                    involved_parameters["Reg_1"] = (reg_1, reg_1_content)
+                    involved_parameters["Reg_2"] = (reg_2, reg_2_content)
+                    involved_parameters["Jump target"] = ("Block ID", jump_block_ID)
                 if reg_1_content != reg_2_content:
                     new_execution_point = (jump_block_ID, 0)
                 else:
                     new_execution_point = (starting_execution_point[0], starting_execution_point[1]+1)
-                changed_parameters = {}
+                if record == True:
+                    changed_parameters = {}
             elif instruction == "JIE":
                 reg_1 = parameters[0]
                 reg_2 = parameters[1]
                 jump_block_ID = parameters[2]
                 reg_1_content = self.registers.get(reg_1)
                 reg_2_content = self.registers.get(reg_2)
-                involved_parameters = {}
-                involved_parameters["Reg_1"] = (reg_1, reg_1_content)
-                involved_parameters["Reg_2"] = (reg_2, reg_2_content)
-                involved_parameters["Jump target"] = ("Block ID", jump_block_ID)
+                if record == True:
+                    involved_parameters = {}
+                    involved_parameters["Reg_1"] = (reg_1, reg_1_content)
+                    involved_parameters["Reg_2"] = (reg_2, reg_2_content)
+                    involved_parameters["Jump target"] = ("Block ID", jump_block_ID)
                 if reg_1_content == reg_2_content:
                     new_execution_point = (jump_block_ID, 0)
                 else:
                     new_execution_point = (starting_execution_point[0], starting_execution_point[1]+1)
-                changed_parameters = {}
+                if record == True:
+                    changed_parameters = {}
             elif instruction == "CMP":
                 reg_1 = parameters[0]
                 reg_2 = parameters[1]
@@ -98,19 +255,21 @@ class CPU():
                 reg_3_content = self.registers.get(reg_3)
                 reg_4_content = self.registers.get(reg_4)
                 reg_5_content = self.registers.get(reg_5)
-                involved_parameters = {}
-                involved_parameters["Reg_1"] = (reg_1, reg_1_content)
-                involved_parameters["Reg_2"] = (reg_2, reg_2_content)
-                involved_parameters["Reg_3"] = (reg_3, reg_3_content)
-                involved_parameters["Reg_4"] = (reg_4, reg_4_content)
-                involved_parameters["Reg_5"] = (reg_5, reg_5_content)
+                if record == True:
+                    involved_parameters = {}
+                    involved_parameters["Reg_1"] = (reg_1, reg_1_content)
+                    involved_parameters["Reg_2"] = (reg_2, reg_2_content)
+                    involved_parameters["Reg_3"] = (reg_3, reg_3_content)
+                    involved_parameters["Reg_4"] = (reg_4, reg_4_content)
+                    involved_parameters["Reg_5"] = (reg_5, reg_5_content)
                 if reg_1_content == reg_2_content:
                     reg_5_content = reg_3_content
                 else:
                     reg_5_content = reg_4_content
                 self.registers.update(reg_5, reg_5_content)
-                changed_parameters = {}
-                changed_parameters["Reg_5"] = (reg_5, reg_5_content)
+                if record == True:
+                    changed_parameters = {}
+                    changed_parameters["Reg_5"] = (reg_5, reg_5_content)
                 new_execution_point = (starting_execution_point[0], starting_execution_point[1]+1)
             elif instruction == "GT":
                 reg_1 = parameters[0]
@@ -123,19 +282,21 @@ class CPU():
                 reg_3_content = self.registers.get(reg_3)
                 reg_4_content = self.registers.get(reg_4)
                 reg_5_content = self.registers.get(reg_5)
-                involved_parameters = {}
-                involved_parameters["Reg_1"] = (reg_1, reg_1_content)
-                involved_parameters["Reg_2"] = (reg_2, reg_2_content)
-                involved_parameters["Reg_3"] = (reg_3, reg_3_content)
-                involved_parameters["Reg_4"] = (reg_4, reg_4_content)
-                involved_parameters["Reg_5"] = (reg_5, reg_5_content)
+                if record == True:
+                    involved_parameters = {}
+                    involved_parameters["Reg_1"] = (reg_1, reg_1_content)
+                    involved_parameters["Reg_2"] = (reg_2, reg_2_content)
+                    involved_parameters["Reg_3"] = (reg_3, reg_3_content)
+                    involved_parameters["Reg_4"] = (reg_4, reg_4_content)
+                    involved_parameters["Reg_5"] = (reg_5, reg_5_content)
                 if reg_1_content > reg_2_content:
                     reg_5_content = reg_3_content
                 else:
                     reg_5_content = reg_4_content
                 self.registers.update(reg_5, reg_5_content)
-                changed_parameters = {}
-                changed_parameters["Reg_5"] = (reg_5, reg_5_content)
+                if record == True:
+                    changed_parameters = {}
+                    changed_parameters["Reg_5"] = (reg_5, reg_5_content)
                 new_execution_point = (starting_execution_point[0], starting_execution_point[1]+1)
             elif instruction == "LT":
                 reg_1 = parameters[0]
@@ -148,19 +309,21 @@ class CPU():
                 reg_3_content = self.registers.get(reg_3)
                 reg_4_content = self.registers.get(reg_4)
                 reg_5_content = self.registers.get(reg_5)
-                involved_parameters = {}
-                involved_parameters["Reg_1"] = (reg_1, reg_1_content)
-                involved_parameters["Reg_2"] = (reg_2, reg_2_content)
-                involved_parameters["Reg_3"] = (reg_3, reg_3_content)
-                involved_parameters["Reg_4"] = (reg_4, reg_4_content)
-                involved_parameters["Reg_5"] = (reg_5, reg_5_content)
+                if record == True:
+                    involved_parameters = {}
+                    involved_parameters["Reg_1"] = (reg_1, reg_1_content)
+                    involved_parameters["Reg_2"] = (reg_2, reg_2_content)
+                    involved_parameters["Reg_3"] = (reg_3, reg_3_content)
+                    involved_parameters["Reg_4"] = (reg_4, reg_4_content)
+                    involved_parameters["Reg_5"] = (reg_5, reg_5_content)
                 if reg_1_content < reg_2_content:
                     reg_5_content = reg_3_content
                 else:
                     reg_5_content = reg_4_content
                 self.registers.update(reg_5, reg_5_content)
-                changed_parameters = {}
-                changed_parameters["Reg_5"] = (reg_5, reg_5_content)
+                if record == True:
+                    changed_parameters = {}
+                    changed_parameters["Reg_5"] = (reg_5, reg_5_content)
                 new_execution_point = (starting_execution_point[0], starting_execution_point[1]+1)
             elif instruction == "ADD":
                 reg_1 = parameters[0]
@@ -170,11 +333,12 @@ class CPU():
                 reg_2_content = self.registers.get(reg_2)
                 reg_3_content = self.registers.get(reg_3)
                 carry = self.registers.get("CARRY")
-                involved_parameters = {}
-                involved_parameters["Reg_1"] = (reg_1, reg_1_content)
-                involved_parameters["Reg_2"] = (reg_2, reg_2_content)
-                involved_parameters["Reg_3"] = (reg_3, reg_3_content)
-                involved_parameters["CARRY"] = ("CARRY", carry)
+                if record == True:
+                    involved_parameters = {}
+                    involved_parameters["Reg_1"] = (reg_1, reg_1_content)
+                    involved_parameters["Reg_2"] = (reg_2, reg_2_content)
+                    involved_parameters["Reg_3"] = (reg_3, reg_3_content)
+                    involved_parameters["CARRY"] = ("CARRY", carry)
                 result = reg_1_content + reg_2_content
                 # Remember to extract the overflow first before truncating the result
                 carry = result//(2**self.bit_width)
@@ -187,9 +351,10 @@ class CPU():
                     pass
                 self.registers.update(reg_3, reg_3_content)
                 self.registers.update("CARRY", carry)
-                changed_parameters = {}
-                changed_parameters["Reg_3"] = (reg_3, reg_3_content)
-                changed_parameters["CARRY"] = ("CARRY", carry)
+                if record == True:
+                    changed_parameters = {}
+                    changed_parameters["Reg_3"] = (reg_3, reg_3_content)
+                    changed_parameters["CARRY"] = ("CARRY", carry)
                 new_execution_point = (starting_execution_point[0], starting_execution_point[1]+1)
             elif instruction == "MUL":
                 reg_1 = parameters[0]
@@ -198,16 +363,18 @@ class CPU():
                 reg_1_content = self.registers.get(reg_1)
                 reg_2_content = self.registers.get(reg_2)
                 reg_3_content = self.registers.get(reg_3)
-                involved_parameters = {}
-                involved_parameters["Reg_1"] = (reg_1, reg_1_content)
-                involved_parameters["Reg_2"] = (reg_2, reg_2_content)
-                involved_parameters["Reg_3"] = (reg_3, reg_3_content)
+                if record == True:
+                    involved_parameters = {}
+                    involved_parameters["Reg_1"] = (reg_1, reg_1_content)
+                    involved_parameters["Reg_2"] = (reg_2, reg_2_content)
+                    involved_parameters["Reg_3"] = (reg_3, reg_3_content)
                 result = reg_1_content * reg_2_content
                 result = result % (2**self.bit_width)
                 reg_3_content = result
                 self.registers.update(reg_3, reg_3_content)
-                changed_parameters = {}
-                changed_parameters["Reg_3"] = (reg_3, reg_3_content)
+                if record == True:
+                    changed_parameters = {}
+                    changed_parameters["Reg_3"] = (reg_3, reg_3_content)
                 new_execution_point = (starting_execution_point[0], starting_execution_point[1]+1)
             elif instruction == "SHUP":
                 reg_1 = parameters[0]
@@ -216,16 +383,18 @@ class CPU():
                 reg_1_content = self.registers.get(reg_1)
                 reg_2_content = self.registers.get(reg_2)
                 reg_3_content = self.registers.get(reg_3)
-                involved_parameters = {}
-                involved_parameters["Reg_1"] = (reg_1, reg_1_content)
-                involved_parameters["Reg_2"] = (reg_2, reg_2_content)
-                involved_parameters["Reg_3"] = (reg_3, reg_3_content)
+                if record == True:
+                    involved_parameters = {}
+                    involved_parameters["Reg_1"] = (reg_1, reg_1_content)
+                    involved_parameters["Reg_2"] = (reg_2, reg_2_content)
+                    involved_parameters["Reg_3"] = (reg_3, reg_3_content)
                 result = reg_1_content << reg_2_content
                 result = result % (2**self.bit_width)
                 reg_3_content = result
                 self.registers.update(reg_3, reg_3_content)
-                changed_parameters = {}
-                changed_parameters["Reg_3"] = (reg_3, reg_3_content)
+                if record == True:
+                    changed_parameters = {}
+                    changed_parameters["Reg_3"] = (reg_3, reg_3_content)
                 new_execution_point = (starting_execution_point[0], starting_execution_point[1]+1)
             elif instruction == "SHDO":
                 reg_1 = parameters[0]
@@ -234,30 +403,34 @@ class CPU():
                 reg_1_content = self.registers.get(reg_1)
                 reg_2_content = self.registers.get(reg_2)
                 reg_3_content = self.registers.get(reg_3)
-                involved_parameters = {}
-                involved_parameters["Reg_1"] = (reg_1, reg_1_content)
-                involved_parameters["Reg_2"] = (reg_2, reg_2_content)
-                involved_parameters["Reg_3"] = (reg_3, reg_3_content)
+                if record == True:
+                    involved_parameters = {}
+                    involved_parameters["Reg_1"] = (reg_1, reg_1_content)
+                    involved_parameters["Reg_2"] = (reg_2, reg_2_content)
+                    involved_parameters["Reg_3"] = (reg_3, reg_3_content)
                 result = reg_1_content >> reg_2_content
                 result = result % (2**self.bit_width)
                 reg_3_content = result
                 self.registers.update(reg_3, reg_3_content)
-                changed_parameters = {}
-                changed_parameters["Reg_3"] = (reg_3, reg_3_content)
+                if record == True:
+                    changed_parameters = {}
+                    changed_parameters["Reg_3"] = (reg_3, reg_3_content)
                 new_execution_point = (starting_execution_point[0], starting_execution_point[1]+1)
             elif instruction == "NOT":
                 reg_1 = parameters[0]
                 reg_2 = parameters[1]
                 reg_1_content = self.registers.get(reg_1)
                 reg_2_content = self.registers.get(reg_2)
-                involved_parameters = {}
-                involved_parameters["Reg_1"] = (reg_1, reg_1_content)
-                involved_parameters["Reg_2"] = (reg_2, reg_2_content)
+                if record == True:
+                    involved_parameters = {}
+                    involved_parameters["Reg_1"] = (reg_1, reg_1_content)
+                    involved_parameters["Reg_2"] = (reg_2, reg_2_content)
                 result = bitwise_negate(reg_1_content, self.bit_width)
                 reg_2_content = result
                 self.registers.update(reg_2, reg_2_content)
-                changed_parameters = {}
-                changed_parameters["Reg_2"] =(reg_2,  reg_2_content)
+                if record == True:
+                    changed_parameters = {}
+                    changed_parameters["Reg_2"] =(reg_2,  reg_2_content)
                 new_execution_point = (starting_execution_point[0], starting_execution_point[1]+1)
             elif instruction == "AND":
                 reg_1 = parameters[0]
@@ -266,15 +439,17 @@ class CPU():
                 reg_1_content = self.registers.get(reg_1)
                 reg_2_content = self.registers.get(reg_2)
                 reg_3_content = self.registers.get(reg_3)
-                involved_parameters = {}
-                involved_parameters["Reg_1"] = (reg_1, reg_1_content)
-                involved_parameters["Reg_2"] = (reg_2, reg_2_content)
-                involved_parameters["Reg_3"] = (reg_3, reg_3_content)
+                if record == True:
+                    involved_parameters = {}
+                    involved_parameters["Reg_1"] = (reg_1, reg_1_content)
+                    involved_parameters["Reg_2"] = (reg_2, reg_2_content)
+                    involved_parameters["Reg_3"] = (reg_3, reg_3_content)
                 result = reg_1_content & reg_2_content
                 reg_3_content = result
                 self.registers.update(reg_3, reg_3_content)
-                changed_parameters = {}
-                changed_parameters["Reg_3"] = (reg_3, reg_3_content)
+                if record == True:
+                    changed_parameters = {}
+                    changed_parameters["Reg_3"] = (reg_3, reg_3_content)
                 new_execution_point = (starting_execution_point[0], starting_execution_point[1]+1)
             elif instruction == "OR":
                 reg_1 = parameters[0]
@@ -283,15 +458,17 @@ class CPU():
                 reg_1_content = self.registers.get(reg_1)
                 reg_2_content = self.registers.get(reg_2)
                 reg_3_content = self.registers.get(reg_3)
-                involved_parameters = {}
-                involved_parameters["Reg_1"] = (reg_1, reg_1_content)
-                involved_parameters["Reg_2"] = (reg_2, reg_2_content)
-                involved_parameters["Reg_3"] = (reg_3, reg_3_content)
+                if record == True:
+                    involved_parameters = {}
+                    involved_parameters["Reg_1"] = (reg_1, reg_1_content)
+                    involved_parameters["Reg_2"] = (reg_2, reg_2_content)
+                    involved_parameters["Reg_3"] = (reg_3, reg_3_content)
                 result = reg_1_content | reg_2_content
                 reg_3_content = result
                 self.registers.update(reg_3, reg_3_content)
-                changed_parameters = {}
-                changed_parameters["Reg_3"] = (reg_3, reg_3_content)
+                if record == True:
+                    changed_parameters = {}
+                    changed_parameters["Reg_3"] = (reg_3, reg_3_content)
                 new_execution_point = (starting_execution_point[0], starting_execution_point[1]+1)
             elif instruction == "XOR":
                 reg_1 = parameters[0]
@@ -300,94 +477,108 @@ class CPU():
                 reg_1_content = self.registers.get(reg_1)
                 reg_2_content = self.registers.get(reg_2)
                 reg_3_content = self.registers.get(reg_3)
-                involved_parameters = {}
-                involved_parameters["Reg_1"] = (reg_1, reg_1_content)
-                involved_parameters["Reg_2"] = (reg_2, reg_2_content)
-                involved_parameters["Reg_3"] = (reg_3, reg_3_content)
+                if record == True:
+                    involved_parameters = {}
+                    involved_parameters["Reg_1"] = (reg_1, reg_1_content)
+                    involved_parameters["Reg_2"] = (reg_2, reg_2_content)
+                    involved_parameters["Reg_3"] = (reg_3, reg_3_content)
                 # A XOR is equal to (X & ~Y) | (~X & Y)
                 first_term = reg_1_content & bitwise_negate(reg_2_content, self.bit_width)
                 second_term = bitwise_negate(reg_1_content, self.bit_width) & reg_2_content
                 result = first_term | second_term
                 reg_3_content = result
                 self.registers.update(reg_3, reg_3_content)
-                changed_parameters = {}
-                changed_parameters["Reg_3"] = (reg_3, reg_3_content)
+                if record == True:
+                    changed_parameters = {}
+                    changed_parameters["Reg_3"] = (reg_3, reg_3_content)
                 new_execution_point = (starting_execution_point[0], starting_execution_point[1]+1)
             elif instruction == "LOAD":
                 reg_1 = parameters
                 memory_address = self.registers.get("MEMAD")
-                memory_content = self.memory.get(str(memory_address))
+                memory_content = self.memory.get(memory_address)
                 reg_1_content = self.registers.get(reg_1)
-                involved_parameters = {}
-                involved_parameters["MEMAD"] = ("MEMAD", memory_address)
-                involved_parameters["Memory"] = memory_content
-                involved_parameters["Reg_1"] = (reg_1, reg_1_content)
+                if record == True:
+                    involved_parameters = {}
+                    involved_parameters["MEMAD"] = ("MEMAD", memory_address)
+                    involved_parameters["Memory"] = memory_content
+                    involved_parameters["Reg_1"] = (reg_1, reg_1_content)
                 reg_1_content = memory_content
                 self.registers.update(reg_1, reg_1_content)
-                changed_parameters = {}
-                changed_parameters["Reg_1"] = (reg_1, reg_1_content)
+                if record == True:
+                    changed_parameters = {}
+                    changed_parameters["Reg_1"] = (reg_1, reg_1_content)
                 new_execution_point = (starting_execution_point[0], starting_execution_point[1]+1)
             elif instruction == "STORE":
                 reg_1 = parameters
                 memory_address = self.registers.get("MEMAD")
                 memory_content = self.memory.get(memory_address)
                 reg_1_content = self.registers.get(reg_1)
-                involved_parameters = {}
-                involved_parameters["MEMAD"] = ("MEMAD", memory_address)
-                involved_parameters["Memory"] = memory_content
-                involved_parameters["Reg_1"] = (reg_1, reg_1_content)
-                self.memory.update(str(memory_address), reg_1_content)
-                changed_parameters = {}
+                if record == True:
+                    involved_parameters = {}
+                    involved_parameters["MEMAD"] = ("MEMAD", memory_address)
+                    involved_parameters["Memory"] = memory_content
+                    involved_parameters["Reg_1"] = (reg_1, reg_1_content)
+                self.memory.update(memory_address, reg_1_content)
+                if record == True:
+                    changed_parameters = {}
                 new_execution_point = (starting_execution_point[0], starting_execution_point[1]+1)
             elif instruction == "SET":
                 reg_1 = parameters[0]
                 data = parameters[1]
                 reg_1_content = self.registers.get(reg_1)
-                involved_parameters = {}
-                involved_parameters["Reg_1"] = (reg_1, reg_1_content)
-                involved_parameters["Data"] = data
+                if record == True:
+                    involved_parameters = {}
+                    involved_parameters["Reg_1"] = (reg_1, reg_1_content)
+                    involved_parameters["Data"] = data
                 result = data % (2**self.bit_width)
                 reg_1_content = result
                 self.registers.update(reg_1, reg_1_content)
-                changed_parameters = {}
-                changed_parameters["Reg_1"] = (reg_1, reg_1_content)
+                if record == True:
+                    changed_parameters = {}
+                    changed_parameters["Reg_1"] = (reg_1, reg_1_content)
                 new_execution_point = (starting_execution_point[0], starting_execution_point[1]+1)
             elif instruction == "COPY":
                 reg_1 = parameters[0]
                 reg_2 = parameters[1]
                 reg_1_content = self.registers.get(reg_1)
                 reg_2_content = self.registers.get(reg_2)
-                involved_parameters = {}
-                involved_parameters["Reg_1"] = (reg_1, reg_1_content)
-                involved_parameters["Reg_2"] = (reg_2, reg_2_content)
+                if record == True:
+                    involved_parameters = {}
+                    involved_parameters["Reg_1"] = (reg_1, reg_1_content)
+                    involved_parameters["Reg_2"] = (reg_2, reg_2_content)
                 reg_2_content = reg_1_content
                 self.registers.update(reg_2, reg_2_content)
-                changed_parameters = {}
-                changed_parameters["Reg_2"] =(reg_2,  reg_2_content)
+                if record == True:
+                    changed_parameters = {}
+                    changed_parameters["Reg_2"] =(reg_2,  reg_2_content)
                 new_execution_point = (starting_execution_point[0], starting_execution_point[1]+1)
             elif instruction == "SETMEMAD":
                 data = parameters
                 memory_address = self.registers.get("MEMAD")
-                involved_parameters = {}
-                involved_parameters["Data"] = data
-                involved_parameters["MEMAD"] = ("MEMAD", memory_address)
+                if record == True:
+                    involved_parameters = {}
+                    involved_parameters["Data"] = data
+                    involved_parameters["MEMAD"] = ("MEMAD", memory_address)
                 memory_address = data
                 self.registers.update("MEMAD", memory_address)
-                changed_parameters = {}
-                changed_parameters["MEMAD"] = ("MEMAD", memory_address)
+                if record == True:
+                    changed_parameters = {}
+                    changed_parameters["MEMAD"] = ("MEMAD", memory_address)
                 new_execution_point = (starting_execution_point[0], starting_execution_point[1]+1)
             elif instruction == "ADDMEMAD":
                 reg_1 = parameters
                 memory_address = self.registers.get("MEMAD")
                 reg_1_content = self.registers.get(reg_1)
-                involved_parameters = {}
-                involved_parameters["MEMAD"] = ("MEMAD", memory_address)
-                involved_parameters["Reg_1"] = (reg_1, reg_1_content)
+                if record == True:
+                    involved_parameters = {}
+                    involved_parameters["MEMAD"] = ("MEMAD", memory_address)
+                    involved_parameters["Reg_1"] = (reg_1, reg_1_content)
                 result = memory_address + reg_1_content
                 memory_address = result
                 self.registers.update("MEMAD", memory_address)
-                changed_parameters = {}
-                changed_parameters["MEMAD"] = ("MEMAD", memory_address)
+                if record == True:
+                    changed_parameters = {}
+                    changed_parameters["MEMAD"] = ("MEMAD", memory_address)
                 new_execution_point = (starting_execution_point[0], starting_execution_point[1]+1)
             else:
                 #TODO
@@ -397,20 +588,187 @@ class CPU():
                 fmt_string = "The instruction "+instruction+" has not been implemented yet."
                 error_string = fmt_string.format(instruction = instruction)
                 raise NotImplementedError(error_string)
+            if self.autoloop_block == True and new_execution_point[1] > 0:
+                # Loop back around to the start of the block right away, so that the execution point matches the one the decoded engines report
+                block_length = len(self.program.program_instructions[new_execution_point[0]])
+                if new_execution_point[1] >= block_length:
+                    new_execution_point = (new_execution_point[0], new_execution_point[1] % block_length)
             self.execution_point = new_execution_point
+            self.executed_steps = self.executed_steps + 1
+            if self.profiler != None:
+                self.profiler.record(starting_execution_point, new_execution_point, time.perf_counter() - profile_start_time)
+            elif self.coverage_map != None:
+                self.coverage_map.record(starting_execution_point)
+            if self.cycle_detector != None:
+                self.cycle_detector.record(self)
+            if record == False:
+                return(True)
             execution_info = (instruction, involved_parameters, changed_parameters, starting_execution_point, new_execution_point)
-            self.execution_log.append(execution_info)
+            if record_log == True:
+                if self.log_policy == "stream":
+                    self.log_stream.write_entry(self.executed_steps - 1, execution_info)
+                else:
+                    self.execution_log.append(execution_info)
             if return_info == True:
                 result = (True, execution_info)
                 return(result)
             else:
                 return(True)
     def step_multiple_instruction(self, instructions, return_info = True):
+        """
+        Executes the given amount of instructions and returns a list with the result of each step
+        With the interpreter engine each result is what step_single_instruction returns
+        With the predecoded, compiled, tracing and fastforward engines no per instruction info is built, each result is True if an instruction was executed and False otherwise
+        The "full", "ring" and "stream" log policies need an entry for every instruction, so with those the other engines step through the interpreter as well
+        """
+        if self.runner != None and self.log_policy in ["sampled", "counters", "off"]:
+            executed = self.run_decoded(instructions)
+            returned_info = [True] * executed + [False] * (instructions - executed)
+            return(returned_info)
         returned_info = []
         for i in range(instructions):
+            if self.get_cycle() != None:
+                returned_info.extend([False] * (instructions - i))
+                break
             info = self.step_single_instruction(return_info)
             returned_info.append(info)
+            if info == False:
+                # Every further step would also just return False
+                returned_info.extend([False] * (instructions - i - 1))
+                break
         return(returned_info)
+    def execute_batch(self, instructions):
+        """
+        Executes up to the given amount of instructions without building any per instruction results and returns the amount executed
+        """
+        if self.runner != None and self.log_policy in ["sampled", "counters", "off"]:
+            return(self.run_decoded(instructions))
+        step_single_instruction = self.step_single_instruction
+        executed = 0
+        while executed < instructions:
+            if self.cycle_detector != None and self.cycle_detector.cycle != None:
+                break
+            if step_single_instruction(False) == False:
+                break
+            executed = executed + 1
+        return(executed)
+    def run(self, max_instructions = None, time_limit = None, predicate = None, batch_size = run_batch_size_global):
+        """
+        Executes until the END instruction has been executed or one of the optional stop conditions is met and returns a run_summary
+        max_instructions is the budget of instructions to execute, time_limit the wall clock time in seconds the run may take
+        predicate is called with the CPU and stops the run once it returns True(e.g. lambda cpu: cpu.registers.get("R_1") > 100)
+        The time limit and predicate are only checked every batch_size instructions, so the run can overshoot them by up to a batch(without either of them the run is not split into batches)
+        With cycle detection enabled the run also stops once the state of the CPU repeats(see get_cycle)
+        """
+        if self.program == None:
+            raise AttributeError("Program has not been loaded")
+        if batch_size < 1:
+            raise ValueError("Invalid batch size: "+str(batch_size))
+        start_time = time.perf_counter()
+        steps = 0
+        halted_reason = None
+        while halted_reason == None:
+            if self.execution_point == ("END", 0):
+                halted_reason = "end"
+                break
+            if self.get_cycle() != None:
+                halted_reason = "cycle"
+                break
+            batch = batch_size
+            if predicate == None and time_limit == None:
+                # Nothing has to be checked between batches, so the whole budget can go to a single batch(which lets the fastforward engine skip whole loops)
+                batch = sys.maxsize
+            if max_instructions != None:
+                if steps >= max_instructions:
+                    halted_reason = "budget"
+                    break
+                if max_instructions - steps < batch:
+                    batch = max_instructions - steps
+            steps = steps + self.execute_batch(batch)
+            if self.execution_point == ("END", 0):
+                halted_reason = "end"
+            elif self.get_cycle() != None:
+                halted_reason = "cycle"
+            elif predicate != None and predicate(self) == True:
+                halted_reason = "predicate"
+            elif time_limit != None and time.perf_counter() - start_time >= time_limit:
+                halted_reason = "deadline"
+        elapsed = time.perf_counter() - start_time
+        return(run_summary(halted_reason, steps, elapsed, self.get_cycle()))
+    def run_decoded(self, instructions):
+        """
+        Executes up to the given amount of instructions with the decoded program of the engine(or the profiler) and returns the amount executed
+        With the "sampled" log policy the sampled instructions are stepped through the interpreter so that their entry gets logged
+        If the decoded program raises an error, the instructions it executed before the error are still counted
+        """
+        try:
+            return(self.run_decoded_counted(instructions))
+        except Exception as e:
+            self.executed_steps = self.executed_steps + getattr(e, "executed_steps", 0)
+            raise
+    def run_decoded_counted(self, instructions):
+        """
+        Does the work of run_decoded, the instructions executed before an error are added to executed_steps by run_decoded
+        """
+        if self.log_policy != "sampled":
+            executed = self.runner.run(self, instructions)
+            self.executed_steps = self.executed_steps + executed
+            return(executed)
+        executed = 0
+        while executed < instructions:
+            # Run up to the next sampled instruction with the decoded program
+            until_sample = (-self.executed_steps) % self.log_interval
+            if until_sample > instructions - executed:
+                until_sample = instructions - executed
+            if until_sample > 0:
+                run_steps = self.runner.run(self, until_sample)
+                self.executed_steps = self.executed_steps + run_steps
+                executed = executed + run_steps
+                if run_steps < until_sample:
+                    break
+            elif self.get_cycle() != None:
+                break
+            elif self.step_single_instruction(False) == True:
+                executed = executed + 1
+            else:
+                break
+        return(executed)
+    def snapshot(self):
+        """
+        Returns a cpu_snapshot of the current state(registers, memory, execution point, executed steps and execution log) that restore() can go back to
+        Not everything is shared, the costs are:
+        The paged memory is shared with the snapshot and only the pages written afterwards get copied, the dict memory is shared until the first write afterwards copies the whole dict
+        The registers are copied(one list of their contents)
+        With the "full" and "sampled" log policies the log is shared and only its length is recorded, but restoring copies the entries up to that length
+        With the "ring" log policy every snapshot copies the ring(up to log_length entries), as the ring drops its oldest entries when appended to
+        Profiles, coverage, cycle detection and log streams are not part of the snapshot
+        """
+        if self.program == None:
+            raise AttributeError("Program has not been loaded")
+        return(cpu_snapshot(self))
+    def restore(self, snapshot):
+        """
+        Sets the CPU back to the state of a cpu_snapshot taken of this CPU with the same loaded program
+        A snapshot can be restored any amount of times
+        The cycle detector is reset, as the states it has seen no longer lead to the current one
+        """
+        if snapshot.cpu is not self or snapshot.program is not self.program:
+            raise ValueError("The snapshot was taken of a different CPU or program")
+        # The engines keep references to the slot list, so it is changed in place
+        self.registers.slots[:] = snapshot.register_slots
+        self.registers.slot_names[:] = snapshot.register_names
+        self.registers.name_slots.clear()
+        for slot in range(len(snapshot.register_names)):
+            self.registers.name_slots[snapshot.register_names[slot]] = slot
+        self.memory.restore(snapshot.memory_state)
+        self.execution_point = snapshot.execution_point
+        self.executed_steps = snapshot.executed_steps
+        if self.log_policy == "ring":
+            self.execution_log = collections.deque(snapshot.execution_log, maxlen = self.log_length)
+        else:
+            self.execution_log = snapshot.execution_log[0:snapshot.log_length]
+        if self.cycle_detector != None:
+            self.cycle_detector.reset()
     def get_registers(self):
         """
         Returns the current state of the registers as a dictionary
@@ -420,6 +778,7 @@ class CPU():
     def get_memory(self):
         """
         Returns the current state of the memory as a dictionary
+        The dictionary is built on demand and is keyed by the memory address as a string(ie "0", "1", "2"...) for every address that has been written
         """
         mem = self.memory.dump()
         return(mem)
@@ -437,6 +796,97 @@ def bitwise_negate(number, bit_width):
     result = int(negated_bit_string, 2)
     return(result)
 
+class cpu_snapshot():
+    def __init__(self, cpu):
+        """
+        State of a CPU as taken by CPU.snapshot()
+        """
+        self.cpu = cpu
+        self.program = cpu.program
+        self.register_slots = list(cpu.registers.slots)
+        self.register_names = list(cpu.registers.slot_names)
+        self.memory_state = cpu.memory.snapshot()
+        self.execution_point = cpu.execution_point
+        self.executed_steps = cpu.executed_steps
+        if cpu.log_policy == "ring":
+            # The ring drops its oldest entries as it is appended to, so its entries have to be copied
+            self.execution_log = tuple(cpu.execution_log)
+        else:
+            # Entries are only ever appended to the list, so the entries up to the current length stay the same
+            self.execution_log = cpu.execution_log
+        self.log_length = len(cpu.execution_log)
+
+class run_summary():
+    def __init__(self, halted_reason, steps, elapsed, cycle = None):
+        """
+        Summary of a CPU.run call
+        halted_reason is one of "end"(the END instruction was executed), "budget", "deadline", "predicate" or "cycle"(the state of the CPU repeated, so the run would never end)
+        cycle is the cycle found(see CPU.get_cycle) or None
+        """
+        self.halted_reason = halted_reason
+        self.steps = steps
+        self.elapsed = elapsed
+        self.cycle = cycle
+        if elapsed > 0:
+            self.instructions_per_second = steps / elapsed
+        else:
+            self.instructions_per_second = 0.0
+    def as_dict(self):
+        result = {"halted_reason": self.halted_reason, "steps": self.steps, "elapsed": self.elapsed, "instructions_per_second": self.instructions_per_second}
+        if self.cycle != None:
+            result["cycle_length"] = self.cycle[0]
+            result["cycle_block"] = self.cycle[1]
+        return(result)
+    def __str__(self):
+        summary_string = "Halted by "+self.halted_reason+" after "+str(self.steps)+" instructions in "+str(round(self.elapsed, 3))+"s("+str(int(self.instructions_per_second))+" instructions/s)"
+        if self.cycle != None:
+            summary_string = summary_string+", non-terminating cycle of "+str(self.cycle[0])+" instructions entered at block "+str(self.cycle[1])
+        return(summary_string)
+
+class register_file():
+    def __init__(self, register_names):
+        """
+        Creates a register file where every register lives in an integer slot of a flat list
+        The given register names are interned into slots 0, 1, 2... in order and start out as 0
+        The predecoded engines read and write the slots list directly by index, the get/update/dump functions keep the same interface as the memory class
+        """
+        self.slots = [0] * len(register_names)
+        self.slot_names = list(register_names)
+        self.name_slots = dict()
+        for slot in range(len(register_names)):
+            self.name_slots[register_names[slot]] = slot
+    def intern(self, target):
+        """
+        Returns the slot of the target register, giving it a new slot if it does not have one yet
+        """
+        slot = self.name_slots.get(target)
+        if slot == None:
+            slot = len(self.slots)
+            self.name_slots[target] = slot
+            self.slot_names.append(target)
+            # Note that the slots list is appended to in place as the engines keep a reference to it
+            self.slots.append(0)
+        return(slot)
+    def update(self, target, content):
+        """
+        Updates the target's content, creating a new slot if needed
+        """
+        self.slots[self.intern(target)] = content
+    def get(self, target):
+        """
+        Attempts to retrieve the given target's contents
+        If the target is not present, a 0 is returned
+        """
+        slot = self.name_slots.get(target)
+        if slot == None:
+            return(0)
+        return(self.slots[slot])
+    def dump(self):
+        """
+        Returns a dict of register name to contents, built on demand
+        """
+        return(dict(zip(self.slot_names, self.slots)))
+
 class memory():
     def __init__(self) -> None:
         self.data = {}
@@ -461,4 +911,311 @@ class memory():
         Returns a raw dict of the contents
         """
         return(self.data)
-    
+
+class dict_memory():
+    def __init__(self):
+        """
+        RAM model that keeps every written word as an entry in a dict keyed by the integer memory address
+        """
+        self.data = {}
+        # Whether data is shared with a snapshot and has to be copied before it is written
+        self.shared = False
+    def update(self, address, content):
+        """
+        Writes the content to the given memory address
+        """
+        if self.shared == True:
+            self.data = dict(self.data)
+            self.shared = False
+        self.data[address] = content
+    def get(self, address):
+        """
+        Retrieves the content of the given memory address
+        If the address has never been written, a 0 is returned
+        """
+        return(self.data.get(address, 0))
+    def store_sequence(self, address, address_step, content, content_step, count):
+        """
+        Writes count words like count updates would, the k-th one writing content + k * content_step to address + k * address_step
+        """
+        if count < 1:
+            return
+        if address_step == 0:
+            # Every write goes to the same address, so only the last one is left
+            self.update(address, content + (count - 1) * content_step)
+            return
+        if self.shared == True:
+            self.data = dict(self.data)
+            self.shared = False
+        if content_step == 0:
+            contents = itertools.repeat(content, count)
+        else:
+            contents = range(content, content + count * content_step, content_step)
+        self.data.update(zip(range(address, address + count * address_step, address_step), contents))
+    def dump(self):
+        """
+        Returns a dict of the written memory addresses(as strings) and their contents
+        """
+        result = {}
+        for address in self.data:
+            result[str(address)] = self.data[address]
+        return(result)
+    def snapshot(self):
+        """
+        Returns the state of the memory for restore(), the dict is shared until the next write copies it
+        Unlike paged_memory this copies every written address on the first write after each snapshot
+        """
+        self.shared = True
+        return(self.data)
+    def restore(self, state):
+        """
+        Sets the memory back to a state returned by snapshot()
+        """
+        self.data = state
+        self.shared = True
+
+class hashed_dict_memory(dict_memory):
+    def __init__(self):
+        """
+        dict_memory that keeps a hash of its contents for the cycle detector(see state_hash)
+        Every write only records the previous content of the address, the hash is brought up to date from those when it is asked for
+        """
+        dict_memory.__init__(self)
+        self.hash_value = 0
+        # Address -> content before the first write since the hash was last brought up to date
+        self.changed = {}
+    def update(self, address, content):
+        if address not in self.changed:
+            self.changed[address] = self.data.get(address, 0)
+        dict_memory.update(self, address, content)
+    def store_sequence(self, address, address_step, content, content_step, count):
+        # Every address has to have its previous content recorded, so the words are written one by one
+        for k in range(count):
+            self.update(address + k * address_step, content + k * content_step)
+    def state_hash(self):
+        """
+        Returns the XOR of CPU_cycles.word_hash over every word of the memory
+        """
+        for address in self.changed:
+            self.hash_value = self.hash_value ^ CPU_cycles.word_hash(address, self.changed[address]) ^ CPU_cycles.word_hash(address, self.data.get(address, 0))
+        self.changed = {}
+        return(self.hash_value)
+    def same_contents(self, state):
+        """
+        Returns whether every word of the memory holds the same content as in a state returned by snapshot(), unwritten words count as 0 like in the hash
+        """
+        data = state[0]
+        if data is self.data:
+            return(True)
+        for address in self.data.keys() | data.keys():
+            if self.data.get(address, 0) != data.get(address, 0):
+                return(False)
+        return(True)
+    def snapshot(self):
+        return((dict_memory.snapshot(self), self.state_hash()))
+    def restore(self, state):
+        dict_memory.restore(self, state[0])
+        self.hash_value = state[1]
+        self.changed = {}
+
+# Amount of address bits covered by a single page of paged_memory(4096 words per page)
+page_bits_global = 12
+
+class paged_memory():
+    def __init__(self, bit_width):
+        """
+        RAM model that keeps words in fixed size pages of 2**page_bits_global words
+        Pages are only allocated when a word in them is first written and are kept in a sparse page table keyed by the page number
+        For bit widths of up to 64 bits a page is an array('Q') of machine words, wider words are kept in a plain list
+        Every page also has a bytearray marking which of its words have been written so that dump() can show exactly the written addresses
+        snapshot() shares the page table and every page with the snapshot, a page is only copied when it is first written afterwards(copy on write)
+        """
+        self.page_size = 2**page_bits_global
+        self.offset_mask = self.page_size - 1
+        if bit_width <= 64:
+            self.typecode = "Q"
+        else:
+            self.typecode = None
+        # Page number -> words of the page
+        self.pages = {}
+        # Page number -> written flags of the page
+        self.written = {}
+        # Page number -> words of the pages that are not shared with a snapshot and can be written directly
+        self.writable = {}
+        # Whether the page tables(pages and written) are shared with a snapshot and have to be copied before they are changed
+        self.shared = False
+    def new_page(self, page_number):
+        """
+        Allocates the page with the given page number and returns it
+        """
+        if self.typecode != None:
+            page = array.array(self.typecode, bytes(8 * self.page_size))
+        else:
+            page = [0] * self.page_size
+        self.pages[page_number] = page
+        self.written[page_number] = bytearray(self.page_size)
+        self.writable[page_number] = page
+        return(page)
+    def writable_page(self, page_number):
+        """
+        Returns the page with the given page number for writing, allocating it or copying it if it is shared with a snapshot
+        """
+        if self.shared == True:
+            self.pages = dict(self.pages)
+            self.written = dict(self.written)
+            self.shared = False
+        shared_page = self.pages.get(page_number)
+        if shared_page == None:
+            return(self.new_page(page_number))
+        if self.typecode != None:
+            page = array.array(self.typecode, shared_page)
+        else:
+            page = list(shared_page)
+        self.pages[page_number] = page
+        self.written[page_number] = bytearray(self.written[page_number])
+        self.writable[page_number] = page
+        return(page)
+    def update(self, address, content):
+        """
+        Writes the content to the given memory address, allocating its page if needed
+        """
+        page_number = address >> page_bits_global
+        page = self.writable.get(page_number)
+        if page == None:
+            page = self.writable_page(page_number)
+        offset = address & self.offset_mask
+        page[offset] = content
+        self.written[page_number][offset] = 1
+    def get(self, address):
+        """
+        Retrieves the content of the given memory address
+        If the address has never been written, a 0 is returned
+        """
+        page = self.pages.get(address >> page_bits_global)
+        if page == None:
+            return(0)
+        return(page[address & self.offset_mask])
+    def store_sequence(self, address, address_step, content, content_step, count):
+        """
+        Writes count words like count updates would, the k-th one writing content + k * content_step to address + k * address_step
+        The words are written page by page with slice assignments
+        """
+        if count < 1:
+            return
+        if address_step == 0:
+            # Every write goes to the same address, so only the last one is left
+            self.update(address, content + (count - 1) * content_step)
+            return
+        written_words = 0
+        while written_words < count:
+            word_address = address + written_words * address_step
+            page_number = word_address >> page_bits_global
+            offset = word_address & self.offset_mask
+            in_page = (self.page_size - 1 - offset) // address_step + 1
+            if in_page > count - written_words:
+                in_page = count - written_words
+            page = self.writable.get(page_number)
+            if page == None:
+                page = self.writable_page(page_number)
+            first_content = content + written_words * content_step
+            if content_step == 0:
+                contents = [first_content] * in_page
+            else:
+                contents = range(first_content, first_content + in_page * content_step, content_step)
+            end = offset + (in_page - 1) * address_step + 1
+            if self.typecode != None:
+                page[offset:end:address_step] = array.array(self.typecode, contents)
+            else:
+                page[offset:end:address_step] = list(contents)
+            self.written[page_number][offset:end:address_step] = bytes([1]) * in_page
+            written_words = written_words + in_page
+    def dump(self):
+        """
+        Returns a dict of the written memory addresses(as strings) and their contents
+        """
+        result = {}
+        for page_number in sorted(self.pages):
+            page = self.pages[page_number]
+            written = self.written[page_number]
+            base = page_number << page_bits_global
+            offset = written.find(1)
+            while offset != -1:
+                result[str(base + offset)] = page[offset]
+                offset = written.find(1, offset + 1)
+        return(result)
+    def snapshot(self):
+        """
+        Returns the state of the memory for restore() without copying anything, the pages are copied as they are written afterwards
+        """
+        self.shared = True
+        self.writable = {}
+        return((self.pages, self.written))
+    def restore(self, state):
+        """
+        Sets the memory back to a state returned by snapshot()
+        """
+        self.pages, self.written = state
+        self.shared = True
+        self.writable = {}
+
+class hashed_paged_memory(paged_memory):
+    def __init__(self, bit_width):
+        """
+        paged_memory that keeps a hash of its contents for the cycle detector(see state_hash)
+        Every write only records the previous content of the address, the hash is brought up to date from those when it is asked for
+        """
+        paged_memory.__init__(self, bit_width)
+        self.hash_value = 0
+        # Address -> content before the first write since the hash was last brought up to date
+        self.changed = {}
+    def update(self, address, content):
+        """
+        Writes the content to the given memory address like paged_memory.update(kept inline as this runs for every STORE)
+        """
+        page_number = address >> page_bits_global
+        page = self.writable.get(page_number)
+        if page == None:
+            page = self.writable_page(page_number)
+        offset = address & self.offset_mask
+        if address not in self.changed:
+            self.changed[address] = page[offset]
+        page[offset] = content
+        self.written[page_number][offset] = 1
+    def store_sequence(self, address, address_step, content, content_step, count):
+        # Every address has to have its previous content recorded, so the words are written one by one
+        for k in range(count):
+            self.update(address + k * address_step, content + k * content_step)
+    def state_hash(self):
+        """
+        Returns the XOR of CPU_cycles.word_hash over every word of the memory
+        """
+        for address in self.changed:
+            self.hash_value = self.hash_value ^ CPU_cycles.word_hash(address, self.changed[address]) ^ CPU_cycles.word_hash(address, self.get(address))
+        self.changed = {}
+        return(self.hash_value)
+    def same_contents(self, state):
+        """
+        Returns whether every word of the memory holds the same content as in a state returned by snapshot(), unwritten words count as 0 like in the hash
+        Pages still shared with the snapshot are skipped without comparing them
+        """
+        pages = state[0][0]
+        for page_number in self.pages.keys() | pages.keys():
+            page = self.pages.get(page_number)
+            saved_page = pages.get(page_number)
+            if page is saved_page:
+                continue
+            if page == None:
+                if any(saved_page):
+                    return(False)
+            elif saved_page == None:
+                if any(page):
+                    return(False)
+            elif page != saved_page:
+                return(False)
+        return(True)
+    def snapshot(self):
+        return((paged_memory.snapshot(self), self.state_hash()))
+    def restore(self, state):
+        paged_memory.restore(self, state[0])
+        self.hash_value = state[1]
+        self.changed = {}
@@ -0,0 +1,137 @@
+import array
+import json
+
+import CPU_engine
+
+class coverage_map():
+    def __init__(self, layout, program, counts = False):
+        """
+        Records which instructions of a program were executed, indexed by the pc of the instruction in layout(see CPU_engine.decoded_program)
+        By default a bitmap(one byte per instruction) is kept and every instruction is only instrumented until its first execution, after which it runs at the speed of the predecoded engine
+        If counts is True a counter array is kept instead and every execution is counted
+        The instructions are mapped back to their source lines with program.source_lines(see CPU_ASM_parser.program)
+        """
+        self.layout = layout
+        self.program = program
+        self.counts = counts
+        pcs = len(layout.handlers)
+        if counts == True:
+            self.hits = array.array("Q", bytes(8 * pcs))
+        else:
+            self.hits = bytearray(pcs)
+        # The handlers run by this map, which start out as instrumented copies of the layout's handlers
+        self.handlers = list(layout.handlers)
+        for pc in range(pcs):
+            self.handlers[pc] = self.make_instrumented_handler(pc, layout.handlers[pc])
+    def make_instrumented_handler(self, pc, handler):
+        hits = self.hits
+        handlers = self.handlers
+        if self.counts == True:
+            def instrumented_handler(registers, memory):
+                hits[pc] = hits[pc] + 1
+                return(handler(registers, memory))
+        else:
+            def instrumented_handler(registers, memory):
+                hits[pc] = 1
+                # Once covered the instruction does not need to be recorded again, so the plain handler takes its place
+                handlers[pc] = handler
+                return(handler(registers, memory))
+        return(instrumented_handler)
+    def record(self, execution_point):
+        """
+        Records a single instruction that was stepped through the interpreter
+        """
+        pc = self.layout.point_to_pc(execution_point)
+        if self.counts == True:
+            self.hits[pc] = self.hits[pc] + 1
+        else:
+            self.hits[pc] = 1
+    def run(self, cpu, steps):
+        """
+        Executes up to the given amount of instructions with the handlers of this map
+        Works like CPU_engine.decoded_program.run and returns the amount of instructions that were executed
+        """
+        handlers = self.handlers
+        registers = cpu.registers.slots
+        memory = cpu.memory
+        pc = self.layout.point_to_pc(cpu.execution_point)
+        executed = steps
+        step = 0
+        try:
+            for step in range(steps):
+                pc = handlers[pc](registers, memory)
+        except CPU_engine.execution_halted:
+            executed = step
+        except Exception as e:
+            CPU_engine.record_executed_steps(e, step)
+            raise
+        finally:
+            cpu.execution_point = self.layout.points[pc]
+        return(executed)
+    def instruction_coverage(self):
+        """
+        Returns a list of (block_id, num, source line index, hits) for every instruction of the program, hits is 0/1 unless counts is enabled
+        """
+        result = list()
+        for block_id in self.program.block_ids:
+            start = self.layout.block_starts[block_id]
+            block_source_lines = self.program.source_lines.get(block_id, {})
+            for instruction_number in range(self.layout.block_lengths[block_id]):
+                result.append((block_id, instruction_number, block_source_lines.get(str(instruction_number)), self.hits[start + instruction_number]))
+        return(result)
+    def line_coverage(self):
+        """
+        Returns a dict of source line index -> hits for every line that holds an instruction
+        """
+        result = dict()
+        for block_id, instruction_number, line_index, hits in self.instruction_coverage():
+            if line_index != None:
+                result[line_index] = hits
+        return(result)
+    def report(self):
+        """
+        Returns a machine readable(JSON serializable) dict of the coverage
+        Line numbers start at 1 like in a text editor
+        """
+        instructions = self.instruction_coverage()
+        covered = 0
+        blocks = dict()
+        instruction_records = list()
+        for block_id, instruction_number, line_index, hits in instructions:
+            if hits > 0:
+                covered = covered + 1
+            block_total, block_covered = blocks.get(block_id, (0, 0))
+            if hits > 0:
+                block_covered = block_covered + 1
+            blocks[block_id] = (block_total + 1, block_covered)
+            line = None
+            if line_index != None:
+                line = line_index + 1
+            instruction_records.append({"block": block_id, "index": instruction_number, "line": line, "hits": hits})
+        block_records = dict()
+        for block_id in blocks:
+            block_records[block_id] = {"instructions": blocks[block_id][0], "covered": blocks[block_id][1]}
+        if len(instructions) > 0:
+            percent = 100 * covered / len(instructions)
+        else:
+            percent = 100.0
+        return({"instructions": len(instructions), "covered": covered, "percent": percent, "counts": self.counts, "blocks": block_records, "lines": instruction_records})
+    def write_report(self, file_path):
+        with open(file_path, "w") as report_file:
+            json.dump(self.report(), report_file)
+    def annotated_listing(self, assembly_string_lines):
+        """
+        Returns the source lines the program was parsed from annotated with their coverage
+        Each line is prefixed with its hit count(or "1" if only the bitmap is kept), "#####" for instructions that never ran and "-" for lines without an instruction
+        """
+        line_coverage_lines = self.line_coverage()
+        listing = list()
+        for line_index in range(len(assembly_string_lines)):
+            if line_index not in line_coverage_lines:
+                marker = "-"
+            elif line_coverage_lines[line_index] == 0:
+                marker = "#####"
+            else:
+                marker = str(line_coverage_lines[line_index])
+            listing.append(marker.rjust(9)+":"+str(line_index + 1).rjust(6)+": "+assembly_string_lines[line_index])
+        return("\n".join(listing)+"\n")
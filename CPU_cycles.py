@@ -0,0 +1,133 @@
+import CPU_engine
+
+# Amount of instructions the cycle detector lets the wrapped runner execute between two checks of the state
+cycle_check_interval_global = 4096
+
+def word_hash(address, content):
+    """
+    Hash of a single memory word for the state hash of the memory, words holding 0 hash to 0 so that unwritten and zeroed words look the same
+    """
+    if content == 0:
+        return(0)
+    return(hash((address, content)))
+
+class cycle_detector():
+    def __init__(self, layout, program, runner = None, check_interval = cycle_check_interval_global):
+        """
+        Detects runs that can never end because the full state of the CPU(execution point, registers and memory) repeats
+        The state is compared as (pc, contents of every register, state hash of the memory), the memory records every write to keep its hash up to date(see CPU_core.hashed_paged_memory)
+        A matching state is only taken as a repeat once measure_cycle saw the registers and the actual memory contents repeat, so a collision of the memory hashes is never reported as a cycle
+        Brent's algorithm is used so only a single earlier state is kept, which is checked against the state at every block entry stepped through the interpreter(see record) and every check_interval instructions run through runner(see run)
+        runner is the runner of the CPU that gets wrapped(the decoded program of the engine, the profiler or the coverage map), layout is the decoded program(see CPU_engine.decoded_program) of the program
+        Once a repeat is found the exact cycle is measured from a block entry and kept in cycle as (length in instructions, block ID of the block entry), after which the detector executes nothing until reset
+        """
+        self.layout = layout
+        self.runner = runner
+        self.check_interval = check_interval
+        self.block_start_pcs = set()
+        for block_id in program.block_ids:
+            self.block_start_pcs.add(layout.block_starts[block_id])
+        self.reset()
+    def reset(self):
+        """
+        Forgets the states seen so far and any cycle found, needed whenever the state of the CPU is changed by something other than executing instructions
+        """
+        self.cycle = None
+        # Amount of instructions executed since the reset
+        self.steps = 0
+        self.until_check = self.check_interval
+        self.saved_state = None
+        self.saved_step = 0
+        self.power = 1
+        self.checks_since_save = 1
+    def state_key(self, pc, registers, memory):
+        return((pc, tuple(registers), memory.state_hash()))
+    def check(self, cpu, pc):
+        """
+        Compares the current state with the saved one, returns True if a cycle was found
+        """
+        registers = cpu.registers.slots
+        state = self.state_key(pc, registers, cpu.memory)
+        if state == self.saved_state:
+            self.cycle = self.measure_cycle(cpu, pc, 2 * (self.steps - self.saved_step))
+            if self.cycle != None:
+                return(True)
+            # The memory hashes collided without the state actually repeating, start over from here
+            self.power = 1
+            self.checks_since_save = 1
+        if self.checks_since_save == self.power:
+            self.saved_state = state
+            self.saved_step = self.steps
+            self.power = self.power * 2
+            self.checks_since_save = 0
+        self.checks_since_save = self.checks_since_save + 1
+        return(False)
+    def measure_cycle(self, cpu, pc, max_steps):
+        """
+        Runs the cycle once from its next block entry with the handlers of the layout to get its exact length, then puts the registers and memory back
+        Returns (length in instructions, block ID of the block entry) or None if the state(including the memory contents, not just their hash) does not repeat within max_steps instructions
+        """
+        handlers = self.layout.handlers
+        block_start_pcs = self.block_start_pcs
+        registers = cpu.registers.slots
+        memory = cpu.memory
+        saved_registers = list(registers)
+        memory_state = memory.snapshot()
+        result = None
+        try:
+            steps = 0
+            while pc not in block_start_pcs and steps < max_steps:
+                pc = handlers[pc](registers, memory)
+                steps = steps + 1
+            entry_state = self.state_key(pc, registers, memory)
+            entry_memory = memory.snapshot()
+            length = 0
+            while steps < max_steps:
+                pc = handlers[pc](registers, memory)
+                steps = steps + 1
+                length = length + 1
+                # The hash only rules out different memory, equal hashes still need the contents compared
+                if pc in block_start_pcs and self.state_key(pc, registers, memory) == entry_state and memory.same_contents(entry_memory) == True:
+                    result = (length, self.layout.points[entry_state[0]][0])
+                    break
+        except CPU_engine.execution_halted:
+            pass
+        finally:
+            registers[:] = saved_registers
+            memory.restore(memory_state)
+        return(result)
+    def record(self, cpu):
+        """
+        Records a single instruction that was stepped through the interpreter, checking the state if the instruction entered a block
+        Returns True if a cycle was found
+        """
+        self.steps = self.steps + 1
+        pc = self.layout.point_to_pc(cpu.execution_point)
+        if pc in self.block_start_pcs:
+            return(self.check(cpu, pc))
+        return(False)
+    def run(self, cpu, steps):
+        """
+        Executes up to the given amount of instructions with the wrapped runner, checking the state every check_interval instructions
+        Works like CPU_engine.decoded_program.run and returns the amount of instructions that were executed, which is less than steps once a cycle was found
+        """
+        executed = 0
+        while executed < steps and self.cycle == None:
+            chunk = self.until_check
+            if chunk > steps - executed:
+                chunk = steps - executed
+            try:
+                run_steps = self.runner.run(cpu, chunk)
+            except Exception as e:
+                self.steps = self.steps + getattr(e, "executed_steps", 0)
+                CPU_engine.record_executed_steps(e, executed)
+                raise
+            executed = executed + run_steps
+            self.steps = self.steps + run_steps
+            self.until_check = self.until_check - run_steps
+            if run_steps < chunk:
+                break
+            if self.until_check == 0:
+                self.until_check = self.check_interval
+                self.check(cpu, self.layout.point_to_pc(cpu.execution_point))
+        return(executed)
@@ -0,0 +1,556 @@
+class execution_halted(Exception):
+    """
+    Raised by the halt handler of a decoded program once the END instruction has been executed
+    Using an exception for this means the dispatch loop does not need to check for halting on every instruction
+    """
+    pass
+
+class decoded_program():
+    def __init__(self, program, bit_width, autoloop_block = True, fuse = False):
+        """
+        This function pre-decodes a parsed program(see CPU_ASM_parser.program) into a flat list of handler functions.
+        Every handler has its operands bound at decode time and returns the index(pc) of the next handler to execute.
+        Blocks are laid out one after the other and each jump/fall-through is linked directly to the pc of its successor.
+        This avoids the instruction lookup, the opcode string comparisons and the log building that CPU.step_single_instruction performs for every instruction.
+        Every register used by the program is given a slot(see program_register_names) and handlers read and write the registers by slot index.
+        Handlers are called as handler(registers, memory) where registers is the slot list of the CPU's register file and memory is the RAM model of the CPU.
+        The architectural results(registers, RAM, halting) are identical to the interpreter in CPU_core.
+        Execution points are the actual instruction position once the block loops back around(autoloop_block), the same as the interpreter reports.
+        With fuse enabled common pairs of instructions(see find_superinstructions) are additionally decoded into superinstructions that run both in one dispatch, which run uses while the budget allows.
+        handlers always holds one handler per instruction, so anything that maps handlers to instructions(the profiler, coverage, cycle detection) is unaffected by the fusion.
+        """
+        self.bit_width = bit_width
+        self.autoloop_block = autoloop_block
+        # Slot layout of the registers, the CPU's register file is set up with this layout when the program is loaded
+        self.register_names = program_register_names(program)
+        self.register_slots = dict()
+        for slot in range(len(self.register_names)):
+            self.register_slots[self.register_names[slot]] = slot
+        # Flat list of handlers, indexed by pc
+        self.handlers = list()
+        # Maps each pc back to its execution point (block_id, num)
+        self.points = list()
+        # Maps each block ID to the pc of its first instruction
+        self.block_starts = dict()
+        # Maps each block ID to the amount of instructions in it
+        self.block_lengths = dict()
+        # First pass: lay out the blocks so that every jump target is known before the handlers are built
+        pc = 0
+        for block_id in program.block_ids:
+            block = program.program_instructions[block_id]
+            self.block_starts[block_id] = pc
+            self.block_lengths[block_id] = len(block)
+            pc = pc + len(block)
+            # Blocks that do not loop back around(and empty blocks) get an extra slot that errors out like the interpreter does when falling off the end of the block
+            if autoloop_block == False or len(block) == 0:
+                pc = pc + 1
+        self.halt_pc = pc
+        # Second pass: build the handlers
+        for block_id in program.block_ids:
+            block = program.program_instructions[block_id]
+            start = self.block_starts[block_id]
+            for instruction_number in range(len(block)):
+                instruction, parameters = block[str(instruction_number)]
+                next_pc = start + instruction_number + 1
+                if next_pc == start + len(block) and autoloop_block == True:
+                    next_pc = start
+                handler = self.decode_instruction(instruction, parameters, next_pc)
+                self.handlers.append(handler)
+                self.points.append((block_id, instruction_number))
+            if autoloop_block == False or len(block) == 0:
+                execution_point = (block_id, len(block))
+                self.handlers.append(make_fall_off_handler(execution_point, len(block)))
+                self.points.append(execution_point)
+        self.handlers.append(halt_handler)
+        self.points.append(("END", 0))
+        # Same as handlers except that the pc of the first instruction of every fused pair holds the superinstruction
+        self.fused_handlers = None
+        # Amount of superinstructions dispatched so far, run uses it to count the instructions executed
+        self.fused_dispatches = [0]
+        if fuse == True:
+            self.fused_handlers = list(self.handlers)
+            for block_id in program.block_ids:
+                block = program.program_instructions[block_id]
+                start = self.block_starts[block_id]
+                superinstructions = find_superinstructions(block)
+                for instruction_number in superinstructions:
+                    next_pc = start + instruction_number + 2
+                    if next_pc == start + len(block) and autoloop_block == True:
+                        next_pc = start
+                    first = block[str(instruction_number)]
+                    second = block[str(instruction_number + 1)]
+                    self.fused_handlers[start + instruction_number] = self.decode_superinstruction(superinstructions[instruction_number], first, second, next_pc)
+    def decode_instruction(self, instruction, parameters, next_pc):
+        """
+        Returns the handler for a single instruction with its operands and successor bound
+        """
+        bit_width = self.bit_width
+        mask = (1 << bit_width) - 1
+        halt_pc = self.halt_pc
+        slots = self.register_slots
+        carry = slots["CARRY"]
+        memad = slots["MEMAD"]
+        if instruction == "END":
+            def handler(registers, memory):
+                return(halt_pc)
+        elif instruction == "JMP":
+            # Note that for single parameter instructions the ASM parser will only output the relevant string and NOT a tuple!!!
+            target_pc = self.block_starts[parameters]
+            def handler(registers, memory):
+                return(target_pc)
+        elif instruction == "JNE":
+            reg_1, reg_2, jump_block_ID = parameters
+            reg_1 = slots[reg_1]
+            reg_2 = slots[reg_2]
+            target_pc = self.block_starts[jump_block_ID]
+            def handler(registers, memory):
+                if registers[reg_1] != registers[reg_2]:
+                    return(target_pc)
+                return(next_pc)
+        elif instruction == "JIE":
+            reg_1, reg_2, jump_block_ID = parameters
+            reg_1 = slots[reg_1]
+            reg_2 = slots[reg_2]
+            target_pc = self.block_starts[jump_block_ID]
+            def handler(registers, memory):
+                if registers[reg_1] == registers[reg_2]:
+                    return(target_pc)
+                return(next_pc)
+        elif instruction == "CMP":
+            reg_1, reg_2, reg_3, reg_4, reg_5 = map_slots(slots, parameters)
+            def handler(registers, memory):
+                if registers[reg_1] == registers[reg_2]:
+                    registers[reg_5] = registers[reg_3]
+                else:
+                    registers[reg_5] = registers[reg_4]
+                return(next_pc)
+        elif instruction == "GT":
+            reg_1, reg_2, reg_3, reg_4, reg_5 = map_slots(slots, parameters)
+            def handler(registers, memory):
+                if registers[reg_1] > registers[reg_2]:
+                    registers[reg_5] = registers[reg_3]
+                else:
+                    registers[reg_5] = registers[reg_4]
+                return(next_pc)
+        elif instruction == "LT":
+            reg_1, reg_2, reg_3, reg_4, reg_5 = map_slots(slots, parameters)
+            def handler(registers, memory):
+                if registers[reg_1] < registers[reg_2]:
+                    registers[reg_5] = registers[reg_3]
+                else:
+                    registers[reg_5] = registers[reg_4]
+                return(next_pc)
+        elif instruction == "ADD":
+            reg_1, reg_2, reg_3 = map_slots(slots, parameters)
+            if reg_3 == carry:
+                # The overflow overrides any attempt to use REG_3 to overwrite CARRY
+                def handler(registers, memory):
+                    registers[carry] = (registers[reg_1] + registers[reg_2]) >> bit_width
+                    return(next_pc)
+            else:
+                def handler(registers, memory):
+                    result = registers[reg_1] + registers[reg_2]
+                    registers[reg_3] = result & mask
+                    registers[carry] = result >> bit_width
+                    return(next_pc)
+        elif instruction == "MUL":
+            reg_1, reg_2, reg_3 = map_slots(slots, parameters)
+            def handler(registers, memory):
+                registers[reg_3] = (registers[reg_1] * registers[reg_2]) & mask
+                return(next_pc)
+        elif instruction == "SHUP":
+            reg_1, reg_2, reg_3 = map_slots(slots, parameters)
+            def handler(registers, memory):
+                shift = registers[reg_2]
+                # Any shift of the bit width or more leaves nothing inside the word, so skip building a huge intermediate integer
+                if shift >= bit_width:
+                    registers[reg_3] = 0
+                else:
+                    registers[reg_3] = (registers[reg_1] << shift) & mask
+                return(next_pc)
+        elif instruction == "SHDO":
+            reg_1, reg_2, reg_3 = map_slots(slots, parameters)
+            def handler(registers, memory):
+                registers[reg_3] = (registers[reg_1] >> registers[reg_2]) & mask
+                return(next_pc)
+        elif instruction == "NOT":
+            reg_1, reg_2 = map_slots(slots, parameters)
+            def handler(registers, memory):
+                registers[reg_2] = negate_word(registers[reg_1], bit_width)
+                return(next_pc)
+        elif instruction == "AND":
+            reg_1, reg_2, reg_3 = map_slots(slots, parameters)
+            def handler(registers, memory):
+                registers[reg_3] = registers[reg_1] & registers[reg_2]
+                return(next_pc)
+        elif instruction == "OR":
+            reg_1, reg_2, reg_3 = map_slots(slots, parameters)
+            def handler(registers, memory):
+                registers[reg_3] = registers[reg_1] | registers[reg_2]
+                return(next_pc)
+        elif instruction == "XOR":
+            reg_1, reg_2, reg_3 = map_slots(slots, parameters)
+            def handler(registers, memory):
+                registers[reg_3] = xor_word(registers[reg_1], registers[reg_2], bit_width)
+                return(next_pc)
+        elif instruction == "LOAD":
+            reg_1 = slots[parameters]
+            def handler(registers, memory):
+                registers[reg_1] = memory.get(registers[memad])
+                return(next_pc)
+        elif instruction == "STORE":
+            reg_1 = slots[parameters]
+            def handler(registers, memory):
+                memory.update(registers[memad], registers[reg_1])
+                return(next_pc)
+        elif instruction == "SET":
+            reg_1 = slots[parameters[0]]
+            data = parameters[1]
+            # The truncation to the bit width can be done once at decode time
+            value = data % (2**bit_width)
+            def handler(registers, memory):
+                registers[reg_1] = value
+                return(next_pc)
+        elif instruction == "COPY":
+            reg_1, reg_2 = map_slots(slots, parameters)
+            def handler(registers, memory):
+                registers[reg_2] = registers[reg_1]
+                return(next_pc)
+        elif instruction == "SETMEMAD":
+            data = parameters
+            def handler(registers, memory):
+                registers[memad] = data
+                return(next_pc)
+        elif instruction == "ADDMEMAD":
+            reg_1 = slots[parameters]
+            def handler(registers, memory):
+                registers[memad] = registers[memad] + registers[reg_1]
+                return(next_pc)
+        else:
+            fmt_string = "The instruction {instruction} has not been implemented yet."
+            error_string = fmt_string.format(instruction = instruction)
+            raise NotImplementedError(error_string)
+        return(handler)
+    def decode_superinstruction(self, superinstruction, first, second, next_pc):
+        """
+        Returns the handler for a superinstruction(see find_superinstructions) that runs both of its instructions, first and second are (instruction, parameters)
+        Only the first instruction can raise(STORE), so an error leaves the state as if the superinstruction had not been dispatched
+        """
+        bit_width = self.bit_width
+        mask = (1 << bit_width) - 1
+        slots = self.register_slots
+        carry = slots["CARRY"]
+        memad = slots["MEMAD"]
+        fused_dispatches = self.fused_dispatches
+        instruction_1, parameters_1 = first
+        instruction_2, parameters_2 = second
+        # Note that writing the sum before the carry out gives the right result even when REG_3 of the ADD is CARRY
+        if superinstruction == "COPY_ADD":
+            reg_1, reg_2 = map_slots(slots, parameters_1)
+            reg_3, reg_4, reg_5 = map_slots(slots, parameters_2)
+            def handler(registers, memory):
+                fused_dispatches[0] = fused_dispatches[0] + 1
+                registers[reg_2] = registers[reg_1]
+                result = registers[reg_3] + registers[reg_4]
+                registers[reg_5] = result & mask
+                registers[carry] = result >> bit_width
+                return(next_pc)
+        elif superinstruction == "CMP_JUMP":
+            reg_1, reg_2, reg_3, reg_4, reg_5 = map_slots(slots, parameters_1)
+            reg_6 = slots[parameters_2[0]]
+            reg_7 = slots[parameters_2[1]]
+            target_pc = self.block_starts[parameters_2[2]]
+            if instruction_2 == "JIE":
+                def handler(registers, memory):
+                    fused_dispatches[0] = fused_dispatches[0] + 1
+                    if registers[reg_1] == registers[reg_2]:
+                        registers[reg_5] = registers[reg_3]
+                    else:
+                        registers[reg_5] = registers[reg_4]
+                    if registers[reg_6] == registers[reg_7]:
+                        return(target_pc)
+                    return(next_pc)
+            else:
+                def handler(registers, memory):
+                    fused_dispatches[0] = fused_dispatches[0] + 1
+                    if registers[reg_1] == registers[reg_2]:
+                        registers[reg_5] = registers[reg_3]
+                    else:
+                        registers[reg_5] = registers[reg_4]
+                    if registers[reg_6] != registers[reg_7]:
+                        return(target_pc)
+                    return(next_pc)
+        elif superinstruction == "STORE_ADDMEMAD":
+            reg_1 = slots[parameters_1]
+            reg_2 = slots[parameters_2]
+            def handler(registers, memory):
+                memory.update(registers[memad], registers[reg_1])
+                fused_dispatches[0] = fused_dispatches[0] + 1
+                registers[memad] = registers[memad] + registers[reg_2]
+                return(next_pc)
+        elif superinstruction == "ADD_JUMP":
+            reg_1, reg_2, reg_3 = map_slots(slots, parameters_1)
+            reg_4 = slots[parameters_2[0]]
+            reg_5 = slots[parameters_2[1]]
+            target_pc = self.block_starts[parameters_2[2]]
+            if instruction_2 == "JIE":
+                def handler(registers, memory):
+                    fused_dispatches[0] = fused_dispatches[0] + 1
+                    result = registers[reg_1] + registers[reg_2]
+                    registers[reg_3] = result & mask
+                    registers[carry] = result >> bit_width
+                    if registers[reg_4] == registers[reg_5]:
+                        return(target_pc)
+                    return(next_pc)
+            else:
+                def handler(registers, memory):
+                    fused_dispatches[0] = fused_dispatches[0] + 1
+                    result = registers[reg_1] + registers[reg_2]
+                    registers[reg_3] = result & mask
+                    registers[carry] = result >> bit_width
+                    if registers[reg_4] != registers[reg_5]:
+                        return(target_pc)
+                    return(next_pc)
+        else:
+            fmt_string = "The superinstruction {superinstruction} has not been implemented yet."
+            error_string = fmt_string.format(superinstruction = superinstruction)
+            raise NotImplementedError(error_string)
+        return(handler)
+    def point_to_pc(self, execution_point):
+        """
+        Converts an execution point (block_id, num) into the pc of the matching handler
+        """
+        block_id = execution_point[0]
+        instruction_number = execution_point[1]
+        if execution_point == ("END", 0):
+            return(self.halt_pc)
+        if block_id not in self.block_starts:
+            raise ValueError("Unable to get instruction at execution point "+str(execution_point)+" because of reason: The block ID does not exists")
+        block_length = self.block_lengths[block_id]
+        if instruction_number >= block_length:
+            if self.autoloop_block == True and block_length != 0:
+                instruction_number = instruction_number % block_length
+            else:
+                # Points at the fall off slot which will raise once executed
+                instruction_number = block_length
+        return(self.block_starts[block_id] + instruction_number)
+    def run(self, cpu, steps):
+        """
+        Executes up to the given amount of instructions on the state of the provided CPU
+        Execution starts at the CPU's current execution point and the execution point is updated afterwards(even if an error is raised)
+        Returns the amount of instructions that were executed
+        """
+        handlers = self.handlers
+        registers = cpu.registers.slots
+        memory = cpu.memory
+        pc = self.point_to_pc(cpu.execution_point)
+        executed = 0
+        step = 0
+        fused_before = None
+        try:
+            if self.fused_handlers != None:
+                fused_handlers = self.fused_handlers
+                fused_dispatches = self.fused_dispatches
+                # A dispatch runs one or two instructions, so dispatching half of the remaining budget can never run past it
+                while steps - executed > 1:
+                    dispatches = (steps - executed) // 2
+                    fused_before = fused_dispatches[0]
+                    step = 0
+                    for step in range(dispatches):
+                        pc = fused_handlers[pc](registers, memory)
+                    executed = executed + dispatches + fused_dispatches[0] - fused_before
+                    fused_before = None
+            step = 0
+            for step in range(steps - executed):
+                pc = handlers[pc](registers, memory)
+            executed = steps
+        except execution_halted:
+            executed = executed + step
+            if fused_before != None:
+                executed = executed + self.fused_dispatches[0] - fused_before
+        except Exception as e:
+            executed = executed + step
+            if fused_before != None:
+                executed = executed + self.fused_dispatches[0] - fused_before
+            record_executed_steps(e, executed)
+            raise
+        finally:
+            cpu.execution_point = self.points[pc]
+        return(executed)
+
+def find_superinstructions(block):
+    """
+    Returns a dict of instruction number -> superinstruction for the pairs of instructions of a block that are fused(see decoded_program.decode_superinstruction)
+    "COPY_ADD": COPY followed by ADD
+    "CMP_JUMP": CMP followed by JIE or JNE
+    "STORE_ADDMEMAD": STORE followed by ADDMEMAD
+    "ADD_JUMP": ADD followed by a JIE or JNE that tests CARRY
+    Pairs are matched from the start of the block and never overlap, the last and first instruction of a looping block are not paired
+    """
+    result = dict()
+    instruction_number = 0
+    while instruction_number + 1 < len(block):
+        instruction_1 = block[str(instruction_number)][0]
+        instruction_2, parameters_2 = block[str(instruction_number + 1)]
+        superinstruction = None
+        if instruction_1 == "COPY" and instruction_2 == "ADD":
+            superinstruction = "COPY_ADD"
+        elif instruction_1 == "CMP" and instruction_2 in ["JIE", "JNE"]:
+            superinstruction = "CMP_JUMP"
+        elif instruction_1 == "STORE" and instruction_2 == "ADDMEMAD":
+            superinstruction = "STORE_ADDMEMAD"
+        elif instruction_1 == "ADD" and instruction_2 in ["JIE", "JNE"] and "CARRY" in parameters_2[:2]:
+            superinstruction = "ADD_JUMP"
+        if superinstruction != None:
+            result[instruction_number] = superinstruction
+            instruction_number = instruction_number + 2
+        else:
+            instruction_number = instruction_number + 1
+    return(result)
+
+def program_register_names(program):
+    """
+    Returns the names of every register used by the program in the order their slots are assigned
+    CARRY and MEMAD always get slot 0 and 1, the other registers follow in the order they first appear in the program
+    Programs made by CPU_optimizer start from the registers of the program they were made from, so registers whose every use was optimized away still show up
+    """
+    register_names = getattr(program, "register_names", None)
+    if register_names == None:
+        register_names = ["CARRY", "MEMAD"]
+    else:
+        register_names = list(register_names)
+    seen_registers = set(register_names)
+    for block_id in program.block_ids:
+        block = program.program_instructions[block_id]
+        for instruction_number in range(len(block)):
+            instruction, parameters = block[str(instruction_number)]
+            for register in instruction_registers(instruction, parameters):
+                if register not in seen_registers:
+                    seen_registers.add(register)
+                    register_names.append(register)
+    return(register_names)
+
+def map_slots(slots, registers):
+    """
+    Returns the tuple of slots for the given tuple of register names
+    """
+    result = list()
+    for register in registers:
+        result.append(slots[register])
+    return(tuple(result))
+
+def record_executed_steps(error, executed):
+    """
+    Adds the amount of instructions a runner executed before an error was raised to the error(as executed_steps), so that the CPU still counts them
+    Runners that wrap another runner add the instructions they ran before the wrapped one raised
+    """
+    error.executed_steps = getattr(error, "executed_steps", 0) + executed
+
+def halt_handler(registers, memory):
+    raise execution_halted()
+
+def make_fall_off_handler(execution_point, block_length):
+    """
+    Returns a handler that errors out the same way the interpreter does when execution runs past the end of a block
+    """
+    if block_length == 0:
+        reason = "The block does not contain any instructions"
+    else:
+        reason = "The provided instruction number does not exist and looping is not enabled"
+    error_string = "Unable to get instruction at execution point "+str(execution_point)+" because of reason: "+reason
+    def handler(registers, memory):
+        raise ValueError(error_string)
+    return(handler)
+
+def negate_word(number, bit_width):
+    """
+    Bitwise NOT of number over the bit width
+    Gives the same result as CPU_core.bitwise_negate (including for numbers wider than the bit width) without building bit strings
+    """
+    width = number.bit_length()
+    if width < bit_width:
+        width = bit_width
+    return(((1 << width) - 1) ^ number)
+
+def xor_word(number_1, number_2, bit_width):
+    """
+    Bitwise XOR of the two numbers
+    Gives the same result as the (X & ~Y) | (~X & Y) form used by CPU_core for numbers wider than the bit width
+    """
+    if number_1.bit_length() <= bit_width and number_2.bit_length() <= bit_width:
+        return(number_1 ^ number_2)
+    return((number_1 & negate_word(number_2, bit_width)) | (negate_word(number_1, bit_width) & number_2))
+
+def instruction_registers(instruction, parameters):
+    """
+    Returns the list of registers(including the implicit CARRY and MEMAD) that an instruction reads or writes
+    """
+    if instruction in ["END", "JMP"]:
+        return([])
+    elif instruction in ["JIE", "JNE"]:
+        return([parameters[0], parameters[1]])
+    elif instruction in ["CMP", "GT", "LT"]:
+        return(list(parameters))
+    elif instruction == "ADD":
+        return([parameters[0], parameters[1], parameters[2], "CARRY"])
+    elif instruction in ["MUL", "SHUP", "SHDO", "AND", "OR", "XOR", "NOT", "COPY"]:
+        return(list(parameters))
+    elif instruction in ["LOAD", "STORE"]:
+        return([parameters, "MEMAD"])
+    elif instruction == "SET":
+        return([parameters[0]])
+    elif instruction == "SETMEMAD":
+        return(["MEMAD"])
+    elif instruction == "ADDMEMAD":
+        return([parameters, "MEMAD"])
+    else:
+        fmt_string = "The instruction {instruction} has not been implemented yet."
+        error_string = fmt_string.format(instruction = instruction)
+        raise NotImplementedError(error_string)
+
+def instruction_read_registers(instruction, parameters):
+    """
+    Returns the list of registers(including the implicit MEMAD) that an instruction reads
+    The register a comparison writes its result to is not read even though the interpreter logs its old content
+    """
+    if instruction in ["END", "JMP", "SET", "SETMEMAD"]:
+        return([])
+    elif instruction in ["JIE", "JNE", "ADD", "MUL", "SHUP", "SHDO", "AND", "OR", "XOR"]:
+        return([parameters[0], parameters[1]])
+    elif instruction in ["CMP", "GT", "LT"]:
+        return([parameters[0], parameters[1], parameters[2], parameters[3]])
+    elif instruction in ["NOT", "COPY"]:
+        return([parameters[0]])
+    elif instruction == "LOAD":
+        return(["MEMAD"])
+    elif instruction in ["STORE", "ADDMEMAD"]:
+        return([parameters, "MEMAD"])
+    else:
+        fmt_string = "The instruction {instruction} has not been implemented yet."
+        error_string = fmt_string.format(instruction = instruction)
+        raise NotImplementedError(error_string)
+
+def instruction_written_registers(instruction, parameters):
+    """
+    Returns the list of registers(including the implicit CARRY and MEMAD) that an instruction writes
+    """
+    if instruction in ["END", "JMP", "JIE", "JNE", "STORE"]:
+        return([])
+    elif instruction in ["CMP", "GT", "LT"]:
+        return([parameters[4]])
+    elif instruction == "ADD":
+        return([parameters[2], "CARRY"])
+    elif instruction in ["MUL", "SHUP", "SHDO", "AND", "OR", "XOR"]:
+        return([parameters[2]])
+    elif instruction in ["NOT", "COPY"]:
+        return([parameters[1]])
+    elif instruction == "LOAD":
+        return([parameters])
+    elif instruction == "SET":
+        return([parameters[0]])
+    elif instruction in ["SETMEMAD", "ADDMEMAD"]:
+        return(["MEMAD"])
+    else:
+        fmt_string = "The instruction {instruction} has not been implemented yet."
+        error_string = fmt_string.format(instruction = instruction)
+        raise NotImplementedError(error_string)
@@ -0,0 +1,455 @@
+import weakref
+
+import CPU_engine
+
+# Compiled programs are cached per parsed program object(and per bit width/autoloop setting) so that loading the same program into several CPUs only compiles it once
+compiled_program_cache = weakref.WeakKeyDictionary()
+# Amount of times a block has to be entered before the tracing engine records the path taken from it
+hot_block_threshold = 50
+# Longest path(in blocks) that the tracing engine will record before giving up on tracing it
+max_trace_blocks = 32
+
+class compiled_program(CPU_engine.decoded_program):
+    def __init__(self, program, bit_width, autoloop_block = True):
+        """
+        This function translates each block of a parsed program(see CPU_ASM_parser.program) into the source of a Python function and compiles all of them once.
+        Inside a compiled block the registers used by the block are local variables, they are loaded from their register slots when the block is entered and written back whenever the block is left.
+        A compiled block is called as block_function(registers, memory, budget) and returns (next pc, amount of instructions executed).
+        Blocks whose last instruction leads back to their own start keep looping inside the function for as long as the budget allows another full pass.
+        Compiled blocks are only used when execution is at the start of a block and the remaining budget covers at least one full pass of the block.
+        Everything else(starting in the middle of a block, the tail of a budget, empty blocks, halting) is handled by the predecoded handlers this class inherits.
+        """
+        CPU_engine.decoded_program.__init__(self, program, bit_width, autoloop_block)
+        # Indexed by pc, only the pc of the first instruction of a non empty block has a function
+        self.block_functions = [None] * len(self.handlers)
+        self.block_function_lengths = [0] * len(self.handlers)
+        # Whether the block function keeps looping on its own block
+        self.block_function_loops = [False] * len(self.handlers)
+        source_lines = list()
+        function_names = dict()
+        function_lengths = dict()
+        function_loops = dict()
+        for block_index in range(len(program.block_ids)):
+            block_id = program.block_ids[block_index]
+            block = program.program_instructions[block_id]
+            if len(block) == 0:
+                continue
+            function_name = "block_"+str(block_index)
+            function_names[block_id] = function_name
+            block_source_lines, function_lengths[block_id], function_loops[block_id] = self.generate_block_source(function_name, block_id, block)
+            source_lines.extend(block_source_lines)
+        self.source = "\n".join(source_lines) + "\n"
+        namespace = {"negate_word": CPU_engine.negate_word, "xor_word": CPU_engine.xor_word}
+        code = compile(self.source, "<CPU_jit compiled program>", "exec")
+        exec(code, namespace)
+        for block_id in function_names:
+            start = self.block_starts[block_id]
+            self.block_functions[start] = namespace[function_names[block_id]]
+            self.block_function_lengths[start] = function_lengths[block_id]
+            self.block_function_loops[start] = function_loops[block_id]
+    def generate_block_source(self, function_name, block_id, block):
+        """
+        Returns the lines of Python source for a single block, the amount of instructions in one full pass of it and whether it loops on itself
+        Code generation stops at the first JMP or END since nothing after it can be reached by running the block from its start
+        """
+        bit_width = self.bit_width
+        start = self.block_starts[block_id]
+        instructions = list()
+        for instruction_number in range(len(block)):
+            instruction, parameters = block[str(instruction_number)]
+            instructions.append((instruction, parameters))
+            if instruction in ["JMP", "END"]:
+                break
+        # Work out where execution goes when the straight line code of the block runs out
+        last_instruction = instructions[len(instructions) - 1][0]
+        if last_instruction == "END":
+            final_pc = self.halt_pc
+        elif last_instruction == "JMP":
+            final_pc = self.block_starts[instructions[len(instructions) - 1][1]]
+        else:
+            # Falls off the end, the decoded handler of the last instruction already knows where that goes
+            final_pc = self.block_starts[block_id] + len(block)
+            if self.autoloop_block == True:
+                final_pc = start
+        loops = final_pc == start
+        # Give every register used by the block a local variable
+        local_names = dict()
+        written_registers = list()
+        for instruction, parameters in instructions:
+            for register in CPU_engine.instruction_registers(instruction, parameters):
+                if register not in local_names:
+                    local_names[register] = "r"+str(len(local_names))
+            for register in CPU_engine.instruction_written_registers(instruction, parameters):
+                if register not in written_registers:
+                    written_registers.append(register)
+        def writeback_lines(indent, registers_to_write):
+            lines = list()
+            for register in registers_to_write:
+                lines.append(indent + "registers["+str(self.register_slots[register])+"] = "+local_names[register])
+            return(lines)
+        lines = list()
+        lines.append("def "+function_name+"(registers, memory, budget):")
+        lines.append("    # Block ID: "+repr(block_id))
+        for register in local_names:
+            lines.append("    "+local_names[register]+" = registers["+str(self.register_slots[register])+"]")
+        lines.extend(memory_access_lines(instructions))
+        lines.append("    executed = 0")
+        indent = "    "
+        if loops == True:
+            lines.append("    while True:")
+            indent = "        "
+        written_so_far = list()
+        for instruction_number in range(len(instructions)):
+            instruction, parameters = instructions[instruction_number]
+            count = "executed + "+str(instruction_number + 1)
+            # On later passes of a looping block every written register may have changed
+            if loops == True:
+                exit_registers = written_registers
+            else:
+                exit_registers = written_so_far
+            if instruction == "END":
+                lines.extend(writeback_lines(indent, exit_registers))
+                lines.append(indent + "return("+str(self.halt_pc)+", "+count+")")
+                continue
+            elif instruction == "JMP":
+                if loops == True:
+                    # The loop back is handled after the last instruction
+                    continue
+                lines.extend(writeback_lines(indent, exit_registers))
+                lines.append(indent + "return("+str(final_pc)+", "+count+")")
+                continue
+            elif instruction in ["JIE", "JNE"]:
+                reg_1, reg_2, jump_block_ID = parameters
+                if instruction == "JIE":
+                    comparison = " == "
+                else:
+                    comparison = " != "
+                lines.append(indent + "if "+local_names[reg_1]+comparison+local_names[reg_2]+":")
+                lines.extend(writeback_lines(indent + "    ", exit_registers))
+                lines.append(indent + "    return("+str(self.block_starts[jump_block_ID])+", "+count+")")
+                continue
+            for line in generate_operation_lines(instruction, parameters, local_names, bit_width):
+                lines.append(indent + line)
+            for register in CPU_engine.instruction_written_registers(instruction, parameters):
+                if register not in written_so_far:
+                    written_so_far.append(register)
+        last_instruction_number = len(instructions) - 1
+        if last_instruction in ["END", "JMP"] and loops == False:
+            pass
+        elif loops == True:
+            # Only go around again if the budget covers another full pass
+            lines.append(indent + "executed = executed + "+str(len(instructions)))
+            lines.append(indent + "if budget - executed < "+str(len(instructions))+":")
+            lines.extend(writeback_lines(indent + "    ", written_registers))
+            lines.append(indent + "    return("+str(start)+", executed)")
+        else:
+            lines.extend(writeback_lines(indent, written_so_far))
+            lines.append(indent + "return("+str(final_pc)+", executed + "+str(last_instruction_number + 1)+")")
+        lines.append("")
+        return(lines, len(instructions), loops)
+    def run(self, cpu, steps):
+        """
+        Executes up to the given amount of instructions on the state of the provided CPU
+        Compiled blocks are used whenever possible, the predecoded handlers cover the rest
+        Returns the amount of instructions that were executed
+        """
+        handlers = self.handlers
+        block_functions = self.block_functions
+        block_function_lengths = self.block_function_lengths
+        registers = cpu.registers.slots
+        memory = cpu.memory
+        pc = self.point_to_pc(cpu.execution_point)
+        remaining = steps
+        try:
+            while remaining > 0:
+                block_function = block_functions[pc]
+                if block_function != None and remaining >= block_function_lengths[pc]:
+                    pc, executed = block_function(registers, memory, remaining)
+                    remaining = remaining - executed
+                else:
+                    pc = handlers[pc](registers, memory)
+                    remaining = remaining - 1
+        except CPU_engine.execution_halted:
+            pass
+        except Exception as e:
+            CPU_engine.record_executed_steps(e, steps - remaining)
+            raise
+        finally:
+            cpu.execution_point = self.points[pc]
+        return(steps - remaining)
+
+class tracing_program(compiled_program):
+    def __init__(self, program, bit_width, autoloop_block = True):
+        """
+        This function sets up a compiled program(see compiled_program) that additionally traces hot paths spanning several blocks.
+        Every time a block is entered through its compiled function the entry is counted.
+        Once a block has been entered hot_block_threshold times, the blocks executed from it are recorded until execution comes back around to it.
+        That path is then compiled into a single function(a trace) which runs the blocks of the path one after the other and loops for as long as the budget allows another full pass.
+        Every conditional jump in the trace is guarded, if a branch goes another way than it did when the path was recorded the trace writes the registers back and exits to the regular engine.
+        Paths that can not be traced(they halt, run into a block that already loops on itself, get too long or need the single instruction handlers) are not recorded again.
+        Traces are called as trace_function(registers, memory, budget) and return (next pc, amount of instructions executed) just like compiled blocks.
+        """
+        compiled_program.__init__(self, program, bit_width, autoloop_block)
+        self.program_instructions = program.program_instructions
+        self.block_entry_counts = [0] * len(self.handlers)
+        # Indexed by pc, only the pc of the first instruction of the block a trace starts at has a function
+        self.trace_functions = [None] * len(self.handlers)
+        self.trace_lengths = [0] * len(self.handlers)
+        # Source of every compiled trace, keyed by the block ID it starts at
+        self.trace_sources = dict()
+        # Block starts whose path could not be traced
+        self.untraceable_blocks = set()
+    def compile_trace(self, path):
+        """
+        Compiles a recorded path into a trace function and installs it at the start of the first block of the path
+        The path is a list of (block start pc, amount of instructions executed in the block) pairs, the last block leads back to the first
+        Returns True if the trace was compiled and False if the path can not be traced
+        """
+        bit_width = self.bit_width
+        anchor_pc = path[0][0]
+        trace_blocks = list()
+        for path_index in range(len(path)):
+            block_pc, executed = path[path_index]
+            if path_index + 1 < len(path):
+                next_pc = path[path_index + 1][0]
+            else:
+                next_pc = anchor_pc
+            block_id = self.points[block_pc][0]
+            block = self.program_instructions[block_id]
+            exit_number = executed - 1
+            instruction, parameters = block[str(exit_number)]
+            if instruction in ["JIE", "JNE"]:
+                # The recorded exit must have been the jump being taken
+                if self.block_starts[parameters[2]] != next_pc:
+                    return(False)
+            elif instruction != "JMP":
+                return(False)
+            trace_blocks.append((block_id, block, exit_number))
+        local_names = dict()
+        written_registers = list()
+        trace_length = 0
+        for block_id, block, exit_number in trace_blocks:
+            for instruction_number in range(exit_number + 1):
+                instruction, parameters = block[str(instruction_number)]
+                for register in CPU_engine.instruction_registers(instruction, parameters):
+                    if register not in local_names:
+                        local_names[register] = "r"+str(len(local_names))
+                for register in CPU_engine.instruction_written_registers(instruction, parameters):
+                    if register not in written_registers:
+                        written_registers.append(register)
+            trace_length = trace_length + exit_number + 1
+        writeback_lines = list()
+        for register in written_registers:
+            writeback_lines.append("registers["+str(self.register_slots[register])+"] = "+local_names[register])
+        function_name = "trace_"+str(anchor_pc)
+        lines = list()
+        lines.append("def "+function_name+"(registers, memory, budget):")
+        block_path = list()
+        for block_id, block, exit_number in trace_blocks:
+            block_path.append(block_id)
+        lines.append("    # Trace: "+" -> ".join(block_path))
+        for register in local_names:
+            lines.append("    "+local_names[register]+" = registers["+str(self.register_slots[register])+"]")
+        trace_instructions = list()
+        for block_id, block, exit_number in trace_blocks:
+            for instruction_number in range(exit_number + 1):
+                trace_instructions.append(block[str(instruction_number)])
+        lines.extend(memory_access_lines(trace_instructions))
+        lines.append("    executed = 0")
+        lines.append("    while True:")
+        indent = "        "
+        offset = 0
+        for block_id, block, exit_number in trace_blocks:
+            start = self.block_starts[block_id]
+            for instruction_number in range(exit_number + 1):
+                instruction, parameters = block[str(instruction_number)]
+                count = "executed + "+str(offset + instruction_number + 1)
+                if instruction == "JMP":
+                    continue
+                elif instruction in ["JIE", "JNE"]:
+                    reg_1, reg_2, jump_block_ID = parameters
+                    taken = instruction == "JIE"
+                    if instruction_number == exit_number:
+                        # Guard: the recorded path took this jump, leave the trace if it would not be taken
+                        taken = not taken
+                        exit_pc = start + instruction_number + 1
+                        if exit_pc == start + len(block) and self.autoloop_block == True:
+                            exit_pc = start
+                    else:
+                        exit_pc = self.block_starts[jump_block_ID]
+                    if taken == True:
+                        comparison = " == "
+                    else:
+                        comparison = " != "
+                    lines.append(indent + "if "+local_names[reg_1]+comparison+local_names[reg_2]+":")
+                    for line in writeback_lines:
+                        lines.append(indent + "    " + line)
+                    lines.append(indent + "    return("+str(exit_pc)+", "+count+")")
+                elif instruction == "END":
+                    # Not reachable, a path through END would have halted instead of coming back around
+                    return(False)
+                else:
+                    for line in generate_operation_lines(instruction, parameters, local_names, bit_width):
+                        lines.append(indent + line)
+            offset = offset + exit_number + 1
+        lines.append(indent + "executed = executed + "+str(trace_length))
+        lines.append(indent + "if budget - executed < "+str(trace_length)+":")
+        for line in writeback_lines:
+            lines.append(indent + "    " + line)
+        lines.append(indent + "    return("+str(anchor_pc)+", executed)")
+        source = "\n".join(lines) + "\n"
+        namespace = {"negate_word": CPU_engine.negate_word, "xor_word": CPU_engine.xor_word}
+        code = compile(source, "<CPU_jit trace "+str(anchor_pc)+">", "exec")
+        exec(code, namespace)
+        self.trace_sources[self.points[anchor_pc][0]] = source
+        self.trace_lengths[anchor_pc] = trace_length
+        self.trace_functions[anchor_pc] = namespace[function_name]
+        return(True)
+    def run(self, cpu, steps):
+        """
+        Executes up to the given amount of instructions on the state of the provided CPU
+        Traces are used whenever possible, then compiled blocks and the predecoded handlers cover the rest
+        Returns the amount of instructions that were executed
+        """
+        handlers = self.handlers
+        block_functions = self.block_functions
+        block_function_lengths = self.block_function_lengths
+        block_function_loops = self.block_function_loops
+        block_entry_counts = self.block_entry_counts
+        trace_functions = self.trace_functions
+        trace_lengths = self.trace_lengths
+        registers = cpu.registers.slots
+        memory = cpu.memory
+        pc = self.point_to_pc(cpu.execution_point)
+        remaining = steps
+        # While a path is being recorded this holds the (block start pc, executed) pairs of the blocks run so far
+        recording = None
+        try:
+            while remaining > 0:
+                trace_function = trace_functions[pc]
+                if trace_function != None and remaining >= trace_lengths[pc]:
+                    pc, executed = trace_function(registers, memory, remaining)
+                    remaining = remaining - executed
+                    continue
+                block_function = block_functions[pc]
+                if block_function != None and remaining >= block_function_lengths[pc]:
+                    if recording != None:
+                        if pc == recording[0][0]:
+                            # Came back around, the next pass will go through the trace
+                            if self.compile_trace(recording) == False:
+                                self.untraceable_blocks.add(recording[0][0])
+                            recording = None
+                            continue
+                        elif block_function_loops[pc] == True or len(recording) >= max_trace_blocks:
+                            self.untraceable_blocks.add(recording[0][0])
+                            recording = None
+                    else:
+                        block_entry_counts[pc] = block_entry_counts[pc] + 1
+                        if block_entry_counts[pc] == hot_block_threshold and block_function_loops[pc] == False and pc not in self.untraceable_blocks:
+                            recording = list()
+                    block_pc = pc
+                    pc, executed = block_function(registers, memory, remaining)
+                    remaining = remaining - executed
+                    if recording != None:
+                        recording.append((block_pc, executed))
+                else:
+                    if recording != None:
+                        self.untraceable_blocks.add(recording[0][0])
+                        recording = None
+                    pc = handlers[pc](registers, memory)
+                    remaining = remaining - 1
+        except CPU_engine.execution_halted:
+            pass
+        except Exception as e:
+            CPU_engine.record_executed_steps(e, steps - remaining)
+            raise
+        finally:
+            cpu.execution_point = self.points[pc]
+        return(steps - remaining)
+
+def get_compiled_program(program, bit_width, autoloop_block = True, tracing = False):
+    """
+    Returns the compiled version of the program, compiling it only if it has not been compiled for this bit width and autoloop setting before
+    If tracing is True a tracing_program is returned instead(traces recorded by one CPU are then reused by every CPU running the same program)
+    """
+    if program not in compiled_program_cache:
+        compiled_program_cache[program] = dict()
+    cache = compiled_program_cache[program]
+    key = (bit_width, autoloop_block, tracing)
+    if key not in cache:
+        if tracing == True:
+            cache[key] = tracing_program(program, bit_width, autoloop_block)
+        else:
+            cache[key] = compiled_program(program, bit_width, autoloop_block)
+    return(cache[key])
+
+def memory_access_lines(instructions):
+    """
+    Returns the lines of Python source that bind the RAM access functions to locals, only if any of the instructions access RAM
+    """
+    lines = list()
+    for instruction, parameters in instructions:
+        if instruction == "LOAD" and "    memory_get = memory.get" not in lines:
+            lines.append("    memory_get = memory.get")
+        elif instruction == "STORE" and "    memory_update = memory.update" not in lines:
+            lines.append("    memory_update = memory.update")
+    return(lines)
+
+def generate_operation_lines(instruction, parameters, local_names, bit_width):
+    """
+    Returns the lines of Python source(without indentation) for a single non control flow instruction
+    local_names maps every register used by the instruction to the local variable holding it
+    """
+    mask = (1 << bit_width) - 1
+    lines = list()
+    if instruction in ["CMP", "GT", "LT"]:
+        reg_1, reg_2, reg_3, reg_4, reg_5 = parameters
+        comparison = {"CMP": " == ", "GT": " > ", "LT": " < "}[instruction]
+        lines.append(local_names[reg_5]+" = "+local_names[reg_3]+" if "+local_names[reg_1]+comparison+local_names[reg_2]+" else "+local_names[reg_4])
+    elif instruction == "ADD":
+        reg_1, reg_2, reg_3 = parameters
+        if reg_3 == "CARRY":
+            # The overflow overrides any attempt to use REG_3 to overwrite CARRY
+            lines.append(local_names["CARRY"]+" = ("+local_names[reg_1]+" + "+local_names[reg_2]+") >> "+str(bit_width))
+        else:
+            lines.append("result = "+local_names[reg_1]+" + "+local_names[reg_2])
+            lines.append(local_names[reg_3]+" = result & "+str(mask))
+            lines.append(local_names["CARRY"]+" = result >> "+str(bit_width))
+    elif instruction == "MUL":
+        reg_1, reg_2, reg_3 = parameters
+        lines.append(local_names[reg_3]+" = ("+local_names[reg_1]+" * "+local_names[reg_2]+") & "+str(mask))
+    elif instruction == "SHUP":
+        reg_1, reg_2, reg_3 = parameters
+        lines.append(local_names[reg_3]+" = 0 if "+local_names[reg_2]+" >= "+str(bit_width)+" else ("+local_names[reg_1]+" << "+local_names[reg_2]+") & "+str(mask))
+    elif instruction == "SHDO":
+        reg_1, reg_2, reg_3 = parameters
+        lines.append(local_names[reg_3]+" = ("+local_names[reg_1]+" >> "+local_names[reg_2]+") & "+str(mask))
+    elif instruction == "NOT":
+        reg_1, reg_2 = parameters
+        lines.append(local_names[reg_2]+" = "+local_names[reg_1]+" ^ "+str(mask)+" if "+local_names[reg_1]+" <= "+str(mask)+" else negate_word("+local_names[reg_1]+", "+str(bit_width)+")")
+    elif instruction in ["AND", "OR"]:
+        reg_1, reg_2, reg_3 = parameters
+        operator = {"AND": " & ", "OR": " | "}[instruction]
+        lines.append(local_names[reg_3]+" = "+local_names[reg_1]+operator+local_names[reg_2])
+    elif instruction == "XOR":
+        reg_1, reg_2, reg_3 = parameters
+        lines.append(local_names[reg_3]+" = xor_word("+local_names[reg_1]+", "+local_names[reg_2]+", "+str(bit_width)+")")
+    elif instruction == "LOAD":
+        lines.append(local_names[parameters]+" = memory_get("+local_names["MEMAD"]+")")
+    elif instruction == "STORE":
+        lines.append("memory_update("+local_names["MEMAD"]+", "+local_names[parameters]+")")
+    elif instruction == "SET":
+        reg_1, data = parameters
+        lines.append(local_names[reg_1]+" = "+str(data % (2**bit_width)))
+    elif instruction == "COPY":
+        reg_1, reg_2 = parameters
+        lines.append(local_names[reg_2]+" = "+local_names[reg_1])
+    elif instruction == "SETMEMAD":
+        lines.append(local_names["MEMAD"]+" = "+str(parameters))
+    elif instruction == "ADDMEMAD":
+        lines.append(local_names["MEMAD"]+" = "+local_names["MEMAD"]+" + "+local_names[parameters])
+    else:
+        fmt_string = "The instruction {instruction} has not been implemented yet."
+        error_string = fmt_string.format(instruction = instruction)
+        raise NotImplementedError(error_string)
+    return(lines)
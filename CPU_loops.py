@@ -0,0 +1,384 @@
+import weakref
+
+import CPU_engine
+import CPU_jit
+
+# Fast forwarding is only done if it skips at least this many passes of the loop
+min_fast_forward_passes_global = 4
+# Most passes a loop is run for normally between two attempts to fast forward it
+max_backoff_passes_global = 4096
+
+fast_forward_program_cache = weakref.WeakKeyDictionary()
+
+class loop_summary():
+    def __init__(self, layout, program, block_id):
+        """
+        Closed form summary of a block that loops back to its own start(through a JMP, JIE or JNE to itself or by autoloop_block)
+        fast_forward works out from the state of the CPU at the start of the block how many passes of the loop run exactly alike and skips them in one go
+        A pass is run symbolically where every value is kept as an expression constant + sum of coefficient * register contents at the start of the pass
+        The registers written by the pass then have to either change by the same amount every pass or follow from registers that do, which makes every value a linear function of the pass number
+        Every branch, comparison, carry out and wrap around of the pass is turned into a condition on such a value, the passes run alike up to the first pass in which one of the conditions changes
+        The STOREs of the skipped passes are applied in bulk(see CPU_core.paged_memory.store_sequence), LOADs are only allowed in loops without STOREs
+        Loops that can not be summarized(SHDO, AND, OR or XOR of changing values, MUL of two changing values, registers that grow faster than linear...) are run normally, with exponentially fewer attempts
+        """
+        self.bit_width = layout.bit_width
+        self.modulus = 1 << layout.bit_width
+        slots = layout.register_slots
+        self.carry = slots["CARRY"]
+        self.memad = slots["MEMAD"]
+        block = program.program_instructions[block_id]
+        self.autoloop_block = layout.autoloop_block
+        # Instructions of a pass as (instruction, register slots, data, whether a jump goes back to the start of the block)
+        self.instructions = list()
+        written_slots = list()
+        self.has_store = False
+        self.falls_off = True
+        for instruction_number in range(len(block)):
+            instruction, parameters = block[str(instruction_number)]
+            operands = list()
+            data = None
+            loops_back = False
+            if instruction == "JMP":
+                loops_back = parameters == block_id
+            elif instruction in ["JIE", "JNE"]:
+                operands = [slots[parameters[0]], slots[parameters[1]]]
+                loops_back = parameters[2] == block_id
+            elif instruction == "SET":
+                operands = [slots[parameters[0]]]
+                data = parameters[1] % self.modulus
+            elif instruction == "SETMEMAD":
+                data = parameters
+            elif instruction in ["LOAD", "STORE", "ADDMEMAD"]:
+                operands = [slots[parameters]]
+            elif instruction != "END":
+                operands = CPU_engine.map_slots(slots, parameters)
+            if instruction == "STORE":
+                self.has_store = True
+            for register in CPU_engine.instruction_written_registers(instruction, parameters):
+                if slots[register] not in written_slots:
+                    written_slots.append(slots[register])
+            self.instructions.append((instruction, operands, data, loops_back))
+            if instruction in ["JMP", "END"]:
+                self.falls_off = False
+                break
+        self.written_slots = written_slots
+        # Passes to run normally before the next attempt, and the amount to wait after the next failed attempt
+        self.wait = 0
+        self.backoff = 1
+    def fast_forward(self, registers, memory, budget):
+        """
+        Skips as many passes of the loop as can be summarized(within the budget of instructions) and returns the amount of instructions skipped
+        Returns 0 without changing anything if the loop can not be fast forwarded from the current state, the next attempts are then backed off
+        """
+        executed = self.summarize(registers, memory, budget)
+        if executed == 0:
+            self.wait = self.backoff
+            self.backoff = min(self.backoff * 2, max_backoff_passes_global)
+        else:
+            self.backoff = 1
+        return(executed)
+    def summarize(self, registers, memory, budget):
+        modulus = self.modulus
+        bit_width = self.bit_width
+        no_coefficients = dict()
+        # Register slot -> expression, every written register starts out as the symbol of its contents at the start of the pass
+        values = dict()
+        for slot in self.written_slots:
+            values[slot] = (0, {slot: 1})
+        def read(slot):
+            expression = values.get(slot)
+            if expression == None:
+                return((registers[slot], no_coefficients))
+            return(expression)
+        def current(expression):
+            # Value of the expression in the first pass
+            result = expression[0]
+            for slot, coefficient in expression[1].items():
+                result = result + coefficient * registers[slot]
+            return(result)
+        def combine(expression_1, expression_2, factor):
+            # expression_1 + factor * expression_2
+            coefficients = dict(expression_1[1])
+            for slot, coefficient in expression_2[1].items():
+                coefficient = coefficients.get(slot, 0) + factor * coefficient
+                if coefficient == 0:
+                    coefficients.pop(slot, None)
+                else:
+                    coefficients[slot] = coefficient
+            return((expression_1[0] + factor * expression_2[0], coefficients))
+        def wrap(expression):
+            # Masks an expression to the bit width, the amount of wrap arounds has to stay the same for the passes to run alike
+            value = current(expression)
+            wraps = value >> bit_width
+            if len(expression[1]) > 0:
+                conditions.append(("range", expression, wraps * modulus, (wraps + 1) * modulus))
+            return((expression[0] - wraps * modulus, expression[1]), wraps)
+        def compare(expression, kind):
+            # kind is "zero"(expression == 0) or "positive"(expression > 0), returns the result in the first pass
+            if len(expression[1]) > 0:
+                conditions.append((kind, expression))
+            if kind == "zero":
+                return(current(expression) == 0)
+            return(current(expression) > 0)
+        # (kind, expression, ...) of every condition the passes depend on
+        conditions = list()
+        # (address expression, content expression) of every STORE
+        stores = list()
+        length = 0
+        loops_back = False
+        for instruction, operands, data, jump_loops_back in self.instructions:
+            length = length + 1
+            if instruction == "END":
+                return(0)
+            elif instruction == "JMP":
+                if jump_loops_back == False:
+                    return(0)
+                loops_back = True
+                break
+            elif instruction in ["JIE", "JNE"]:
+                taken = compare(combine(read(operands[0]), read(operands[1]), -1), "zero")
+                if instruction == "JNE":
+                    taken = not taken
+                if taken == True:
+                    if jump_loops_back == False:
+                        return(0)
+                    loops_back = True
+                    break
+            elif instruction in ["CMP", "GT", "LT"]:
+                reg_1, reg_2, reg_3, reg_4, reg_5 = operands
+                if instruction == "CMP":
+                    condition = compare(combine(read(reg_1), read(reg_2), -1), "zero")
+                elif instruction == "GT":
+                    condition = compare(combine(read(reg_1), read(reg_2), -1), "positive")
+                else:
+                    condition = compare(combine(read(reg_2), read(reg_1), -1), "positive")
+                if condition == True:
+                    values[reg_5] = read(reg_3)
+                else:
+                    values[reg_5] = read(reg_4)
+            elif instruction == "ADD":
+                reg_1, reg_2, reg_3 = operands
+                result, wraps = wrap(combine(read(reg_1), read(reg_2), 1))
+                if reg_3 != self.carry:
+                    values[reg_3] = result
+                values[self.carry] = (wraps, no_coefficients)
+            elif instruction in ["MUL", "SHUP"]:
+                reg_1, reg_2, reg_3 = operands
+                expression_1 = read(reg_1)
+                expression_2 = read(reg_2)
+                if instruction == "SHUP":
+                    if len(expression_2[1]) > 0:
+                        return(0)
+                    if expression_2[0] >= bit_width:
+                        values[reg_3] = (0, no_coefficients)
+                        continue
+                    expression_2 = (1 << expression_2[0], no_coefficients)
+                elif len(expression_1[1]) == 0:
+                    expression_1, expression_2 = expression_2, expression_1
+                if len(expression_2[1]) > 0:
+                    return(0)
+                values[reg_3] = wrap(combine((0, no_coefficients), expression_1, expression_2[0]))[0]
+            elif instruction == "NOT":
+                reg_1, reg_2 = operands
+                expression = read(reg_1)
+                if len(expression[1]) == 0:
+                    values[reg_2] = (CPU_engine.negate_word(expression[0], bit_width), no_coefficients)
+                else:
+                    # Inside the bit width NOT is modulus - 1 - value
+                    if wrap(expression)[1] != 0:
+                        return(0)
+                    values[reg_2] = combine((modulus - 1, no_coefficients), expression, -1)
+            elif instruction in ["SHDO", "AND", "OR", "XOR"]:
+                reg_1, reg_2, reg_3 = operands
+                expression_1 = read(reg_1)
+                expression_2 = read(reg_2)
+                if len(expression_1[1]) > 0 or len(expression_2[1]) > 0:
+                    return(0)
+                if instruction == "SHDO":
+                    result = (expression_1[0] >> expression_2[0]) & (modulus - 1)
+                elif instruction == "AND":
+                    result = expression_1[0] & expression_2[0]
+                elif instruction == "OR":
+                    result = expression_1[0] | expression_2[0]
+                else:
+                    result = CPU_engine.xor_word(expression_1[0], expression_2[0], bit_width)
+                values[reg_3] = (result, no_coefficients)
+            elif instruction == "LOAD":
+                address = read(self.memad)
+                if self.has_store == True or len(address[1]) > 0:
+                    return(0)
+                values[operands[0]] = (memory.get(address[0]), no_coefficients)
+            elif instruction == "STORE":
+                stores.append((read(self.memad), read(operands[0])))
+            elif instruction == "SET":
+                values[operands[0]] = (data, no_coefficients)
+            elif instruction == "SETMEMAD":
+                values[self.memad] = (data, no_coefficients)
+            elif instruction == "COPY":
+                values[operands[1]] = read(operands[0])
+            elif instruction == "ADDMEMAD":
+                values[self.memad] = combine(read(self.memad), read(operands[0]), 1)
+        if loops_back == False and (self.falls_off == False or self.autoloop_block == False):
+            return(0)
+        # Work out by how much every written register changes per pass
+        slopes = dict()
+        unresolved = list()
+        for slot in self.written_slots:
+            expression = values[slot]
+            if slot in expression[1]:
+                # Only registers that add the same amount every pass can depend on themselves
+                if expression[1] != {slot: 1}:
+                    return(0)
+                slopes[slot] = expression[0]
+            else:
+                unresolved.append(slot)
+        while len(unresolved) > 0:
+            still_unresolved = list()
+            for slot in unresolved:
+                expression = values[slot]
+                if all(symbol in slopes for symbol in expression[1]) == False:
+                    still_unresolved.append(slot)
+                    continue
+                slope = 0
+                for symbol, coefficient in expression[1].items():
+                    slope = slope + coefficient * slopes[symbol]
+                # The register follows the others from the second pass on, it has to already be in step with them in the first
+                if current(expression) - registers[slot] != slope:
+                    return(0)
+                slopes[slot] = slope
+            if len(still_unresolved) == len(unresolved):
+                return(0)
+            unresolved = still_unresolved
+        def linear(expression):
+            # (value in the first pass, change per pass)
+            change = 0
+            for slot, coefficient in expression[1].items():
+                change = change + coefficient * slopes[slot]
+            return((current(expression), change))
+        # Find the first pass in which a condition changes
+        passes = budget // length
+        for condition in conditions:
+            first, change = linear(condition[1])
+            changes_at = None
+            if change == 0:
+                continue
+            elif condition[0] == "range":
+                if change > 0:
+                    changes_at = ceiling_divide(condition[3] - first, change)
+                else:
+                    changes_at = ceiling_divide(first - condition[2] + 1, -change)
+            elif condition[0] == "zero":
+                if first == 0:
+                    changes_at = 1
+                elif first % change == 0 and -first // change > 0:
+                    changes_at = -first // change
+            elif first > 0:
+                if change < 0:
+                    changes_at = ceiling_divide(first, -change)
+            elif change > 0:
+                changes_at = -first // change + 1
+            if changes_at != None and changes_at < passes:
+                passes = changes_at
+        if passes < min_fast_forward_passes_global:
+            return(0)
+        linear_stores = list()
+        for address, content in stores:
+            linear_stores.append((linear(address), linear(content)))
+        new_contents = list()
+        for slot in self.written_slots:
+            new_contents.append(registers[slot] + passes * slopes[slot])
+        if len(linear_stores) == 1:
+            (address, address_step), (content, content_step) = linear_stores[0]
+            memory.store_sequence(address, address_step, content, content_step, passes)
+        elif len(linear_stores) > 1:
+            if all(store[0][1] == 0 for store in linear_stores) == True:
+                # Every pass writes the same addresses, only the last pass leaves its contents
+                passes_to_write = range(passes - 1, passes)
+            else:
+                passes_to_write = range(passes)
+            for k in passes_to_write:
+                for (address, address_step), (content, content_step) in linear_stores:
+                    memory.update(address + k * address_step, content + k * content_step)
+        for index in range(len(self.written_slots)):
+            registers[self.written_slots[index]] = new_contents[index]
+        return(passes * length)
+
+def ceiling_divide(numerator, denominator):
+    return(-(-numerator // denominator))
+
+class fast_forward_program(CPU_jit.compiled_program):
+    def __init__(self, program, bit_width, autoloop_block = True):
+        """
+        This function sets up a compiled program(see CPU_jit.compiled_program) that additionally fast forwards loops(see loop_summary)
+        Every block that can loop back to its own start gets a loop_summary, which is tried whenever execution enters the block
+        The architectural results are the same as with the other engines, only the skipped passes take next to no time
+        """
+        CPU_jit.compiled_program.__init__(self, program, bit_width, autoloop_block)
+        # Indexed by pc, only the pc of the first instruction of a looping block has a summary
+        self.loop_summaries = [None] * len(self.handlers)
+        for block_id in program.block_ids:
+            start = self.block_starts[block_id]
+            if self.block_functions[start] == None:
+                continue
+            summary = loop_summary(self, program, block_id)
+            if self.block_function_loops[start] == True or any(instruction[3] for instruction in summary.instructions) == True:
+                self.loop_summaries[start] = summary
+    def run(self, cpu, steps):
+        """
+        Executes up to the given amount of instructions on the state of the provided CPU
+        Loops are fast forwarded whenever possible, then compiled blocks and the predecoded handlers cover the rest
+        Returns the amount of instructions that were executed
+        """
+        handlers = self.handlers
+        block_functions = self.block_functions
+        block_function_lengths = self.block_function_lengths
+        block_function_loops = self.block_function_loops
+        loop_summaries = self.loop_summaries
+        registers = cpu.registers.slots
+        memory = cpu.memory
+        pc = self.point_to_pc(cpu.execution_point)
+        remaining = steps
+        try:
+            while remaining > 0:
+                block_function = block_functions[pc]
+                if block_function != None and remaining >= block_function_lengths[pc]:
+                    summary = loop_summaries[pc]
+                    budget = remaining
+                    if summary != None:
+                        if summary.wait == 0:
+                            executed = summary.fast_forward(registers, memory, remaining)
+                            if executed > 0:
+                                remaining = remaining - executed
+                                continue
+                        # Run the passes up to the next attempt normally
+                        if block_function_loops[pc] == True:
+                            if summary.wait * block_function_lengths[pc] < budget:
+                                budget = summary.wait * block_function_lengths[pc]
+                            summary.wait = 0
+                        else:
+                            summary.wait = summary.wait - 1
+                    pc, executed = block_function(registers, memory, budget)
+                    remaining = remaining - executed
+                else:
+                    pc = handlers[pc](registers, memory)
+                    remaining = remaining - 1
+        except CPU_engine.execution_halted:
+            pass
+        except Exception as e:
+            CPU_engine.record_executed_steps(e, steps - remaining)
+            raise
+        finally:
+            cpu.execution_point = self.points[pc]
+        return(steps - remaining)
+
+def get_fast_forward_program(program, bit_width, autoloop_block = True):
+    """
+    Returns the fast_forward_program of the program, building it only if it has not been built for this bit width and autoloop setting before
+    """
+    if program not in fast_forward_program_cache:
+        fast_forward_program_cache[program] = dict()
+    cache = fast_forward_program_cache[program]
+    key = (bit_width, autoloop_block)
+    if key not in cache:
+        cache[key] = fast_forward_program(program, bit_width, autoloop_block)
+    return(cache[key])
@@ -0,0 +1,694 @@
+import CPU_ASM_parser
+import CPU_engine
+
+# Instructions that are always kept, as they change the control flow or the RAM
+side_effect_instructions_global = ["END", "JMP", "JIE", "JNE", "STORE"]
+# Maximum amount of times fold_constants folds the program, it is folded again after SETs were moved out of loops
+max_fold_rounds_global = 8
+# Longest block(in instructions) that layout_blocks copies into the blocks that JMP to it
+max_tail_length_global = 4
+# layout_blocks does not grow a block past this amount of instructions by copying blocks into it
+max_layout_block_length_global = 64
+
+class control_flow_graph():
+    def __init__(self, program, autoloop_block = True):
+        """
+        Control flow graph of the blocks of a parsed program(see CPU_ASM_parser.program)
+        Execution only ever enters a block at its first instruction, either from a JMP/JIE/JNE or from the block looping back around(autoloop_block)
+        lengths holds the amount of instructions of each block that can ever execute, every instruction after the first JMP or END of a block is unreachable
+        successors holds the blocks each block can continue in, in the order they appear in it
+        ends holds the blocks that can run END, errors the blocks that error out by running past their end(without autoloop_block) or by being empty
+        """
+        self.program = program
+        self.autoloop_block = autoloop_block
+        self.lengths = dict()
+        self.successors = dict()
+        self.predecessors = dict()
+        self.ends = set()
+        self.errors = set()
+        for block_id in program.block_ids:
+            self.predecessors[block_id] = list()
+        for block_id in program.block_ids:
+            block = program.program_instructions[block_id]
+            successors = list()
+            length = len(block)
+            falls_off = True
+            for instruction_number in range(len(block)):
+                instruction, parameters = block[str(instruction_number)]
+                if instruction == "JMP":
+                    target = parameters
+                elif instruction in ["JIE", "JNE"]:
+                    target = parameters[2]
+                else:
+                    target = None
+                if target != None and target not in successors:
+                    successors.append(target)
+                if instruction == "END":
+                    self.ends.add(block_id)
+                if instruction in ["JMP", "END"]:
+                    length = instruction_number + 1
+                    falls_off = False
+                    break
+            if len(block) == 0:
+                self.errors.add(block_id)
+            elif falls_off == True:
+                if autoloop_block == True:
+                    if block_id not in successors:
+                        successors.append(block_id)
+                else:
+                    self.errors.add(block_id)
+            self.lengths[block_id] = length
+            self.successors[block_id] = successors
+            for successor in successors:
+                self.predecessors[successor].append(block_id)
+    def reachable_blocks(self, entry_block = "START"):
+        """
+        Returns the set of blocks that can be reached from the entry block
+        """
+        reachable = set([entry_block])
+        pending = [entry_block]
+        while len(pending) > 0:
+            block_id = pending.pop()
+            for successor in self.successors[block_id]:
+                if successor not in reachable:
+                    reachable.add(successor)
+                    pending.append(successor)
+        return(reachable)
+
+class register_liveness():
+    def __init__(self, graph, observed_registers = None):
+        """
+        Finds the registers whose content can still matter at every instruction of the blocks of the control flow graph
+        A register is live if it may be read by an instruction that is itself needed before it is written again, or if it is observed once the program ends
+        Instructions whose writes are all dead are treated as removed, so a register that only feeds dead writes(ie a counter nothing else reads) is dead as well
+        observed_registers are the registers whose final content matters once END runs, None means every register of the program
+        Running past the end of a block without autoloop_block(and entering an empty block) errors out, every register is treated as observed there
+        The implicit registers are modelled as well, ADD writes CARRY and SETMEMAD/ADDMEMAD write MEMAD which LOAD, STORE and ADDMEMAD read
+        """
+        self.graph = graph
+        program = graph.program
+        self.all_registers = frozenset(CPU_engine.program_register_names(program))
+        if observed_registers == None:
+            self.observed_registers = self.all_registers
+        else:
+            self.observed_registers = frozenset(observed_registers)
+        # Registers live at the start of each block, grown until nothing changes
+        self.live_in = dict()
+        for block_id in program.block_ids:
+            self.live_in[block_id] = frozenset()
+        changed = True
+        while changed == True:
+            changed = False
+            for block_id in reversed(program.block_ids):
+                live = self.block_liveness(block_id)[0]
+                if live != self.live_in[block_id]:
+                    self.live_in[block_id] = live
+                    changed = True
+    def block_liveness(self, block_id):
+        """
+        Returns (registers live at the start of the block, list of the registers live after each instruction, list of whether each instruction is dead) for the reachable instructions of the block
+        """
+        graph = self.graph
+        block = graph.program.program_instructions[block_id]
+        length = graph.lengths[block_id]
+        if length == 0:
+            return((self.all_registers, [], []))
+        live_after = [None] * length
+        dead = [False] * length
+        # Registers live once the last instruction has run
+        instruction, parameters = block[str(length - 1)]
+        if instruction == "END":
+            live = self.observed_registers
+        elif instruction == "JMP":
+            live = self.live_in[parameters]
+        elif graph.autoloop_block == True:
+            live = self.live_in[block_id]
+        else:
+            live = self.all_registers
+        for instruction_number in range(length - 1, -1, -1):
+            instruction, parameters = block[str(instruction_number)]
+            if instruction in ["JIE", "JNE"]:
+                live = live | self.live_in[parameters[2]]
+            live_after[instruction_number] = live
+            written_registers = CPU_engine.instruction_written_registers(instruction, parameters)
+            if instruction not in side_effect_instructions_global and live.isdisjoint(written_registers):
+                dead[instruction_number] = True
+                continue
+            live = (live - frozenset(written_registers)) | frozenset(CPU_engine.instruction_read_registers(instruction, parameters))
+        return((live, live_after, dead))
+
+def meet_states(state_1, state_2):
+    """
+    Returns the register contents known in both states, None stands for a block that was never reached
+    """
+    if state_1 == None:
+        return(dict(state_2))
+    result = dict()
+    for register in state_1:
+        if register in state_2 and state_2[register] == state_1[register]:
+            result[register] = state_1[register]
+    return(result)
+
+def evaluate_operation(instruction, contents, bit_width):
+    """
+    Returns the result of an ALU instruction(other than ADD) on the given register contents, matching CPU_core and CPU_engine
+    """
+    mask = (1 << bit_width) - 1
+    if instruction == "MUL":
+        return((contents[0] * contents[1]) & mask)
+    elif instruction == "SHUP":
+        if contents[1] >= bit_width:
+            return(0)
+        return((contents[0] << contents[1]) & mask)
+    elif instruction == "SHDO":
+        return((contents[0] >> contents[1]) & mask)
+    elif instruction == "NOT":
+        return(CPU_engine.negate_word(contents[0], bit_width))
+    elif instruction == "AND":
+        return(contents[0] & contents[1])
+    elif instruction == "OR":
+        return(contents[0] | contents[1])
+    elif instruction == "XOR":
+        return(CPU_engine.xor_word(contents[0], contents[1], bit_width))
+    else:
+        fmt_string = "The instruction {instruction} is not an ALU instruction."
+        error_string = fmt_string.format(instruction = instruction)
+        raise ValueError(error_string)
+
+class constant_folder():
+    def __init__(self, program, bit_width, autoloop_block = True, observed_registers = None):
+        """
+        Finds the register contents that are known at every instruction of a parsed program(see CPU_ASM_parser.program) and rewrites the instructions with them
+        Nothing is known at the start of START, as registers keep their contents between programs and can be set before a run
+        entry_states holds the register contents known at the start of each block(None for blocks that are never reached), found by following every jump whose outcome is not known
+        The liveness of the registers(see register_liveness) allows an ADD with known operands to become a SET when either of its results is not needed
+        """
+        self.program = program
+        self.bit_width = bit_width
+        self.limit = 2**bit_width
+        self.autoloop_block = autoloop_block
+        self.graph = control_flow_graph(program, autoloop_block)
+        liveness = register_liveness(self.graph, observed_registers)
+        self.live_after = dict()
+        self.entry_states = dict()
+        for block_id in program.block_ids:
+            self.live_after[block_id] = liveness.block_liveness(block_id)[1]
+            self.entry_states[block_id] = None
+        # The contents known at a block only ever shrink, so this ends once every block was folded with its final entry state
+        self.entry_states["START"] = dict()
+        pending = ["START"]
+        pending_set = set(pending)
+        while len(pending) > 0:
+            block_id = pending.pop()
+            pending_set.discard(block_id)
+            for target, state, hoistable in self.fold_block(block_id)[1]:
+                entry_state = meet_states(self.entry_states[target], state)
+                if entry_state != self.entry_states[target]:
+                    self.entry_states[target] = entry_state
+                    if target not in pending_set:
+                        pending_set.add(target)
+                        pending.append(target)
+    def set_instruction(self, register, content, known, original):
+        """
+        Returns the instruction that gives the register the content, None if it already holds it or original if SET can not give it(contents wider than the bit width)
+        """
+        if register in known and known[register] == content:
+            return(None)
+        known[register] = content
+        if content < self.limit:
+            return(("SET", (register, content)))
+        return(original)
+    def copy_instruction(self, source, destination, known):
+        """
+        Returns the instruction that copies the source register to the destination, None if nothing needs to be done
+        """
+        if source == destination:
+            return(None)
+        if source in known:
+            return(self.set_instruction(destination, known[source], known, ("COPY", (source, destination))))
+        known.pop(destination, None)
+        return(("COPY", (source, destination)))
+    def fold_block(self, block_id):
+        """
+        Folds the reachable instructions of a block with its entry state
+        Returns (list of (instruction, parameters, number of the original instruction), list of (block ID, known register contents, whether it is the JMP at the end of the block) for every block execution continues in)
+        """
+        block = self.program.program_instructions[block_id]
+        live_after = self.live_after[block_id]
+        known = dict(self.entry_states[block_id])
+        instructions = list()
+        exits = list()
+        last_dropped = None
+        for instruction_number in range(self.graph.lengths[block_id]):
+            instruction, parameters = block[str(instruction_number)]
+            original = (instruction, parameters)
+            replacement = original
+            if instruction == "END":
+                instructions.append((instruction, parameters, instruction_number))
+                return((instructions, exits))
+            elif instruction == "JMP":
+                instructions.append((instruction, parameters, instruction_number))
+                exits.append((parameters, known, True))
+                return((instructions, exits))
+            elif instruction in ["JIE", "JNE"]:
+                reg_1, reg_2, jump_block_ID = parameters
+                if reg_1 == reg_2:
+                    equal = True
+                elif reg_1 in known and reg_2 in known:
+                    equal = known[reg_1] == known[reg_2]
+                else:
+                    equal = None
+                if equal == None:
+                    exits.append((jump_block_ID, dict(known), False))
+                elif equal == (instruction == "JIE"):
+                    instructions.append(("JMP", jump_block_ID, instruction_number))
+                    exits.append((jump_block_ID, known, True))
+                    return((instructions, exits))
+                else:
+                    # Never taken, execution simply continues with the next instruction
+                    replacement = None
+            elif instruction in ["CMP", "GT", "LT"]:
+                reg_1, reg_2, reg_3, reg_4, reg_5 = parameters
+                source = None
+                if reg_3 == reg_4:
+                    source = reg_3
+                elif reg_1 in known and reg_2 in known:
+                    if instruction == "CMP":
+                        condition = known[reg_1] == known[reg_2]
+                    elif instruction == "GT":
+                        condition = known[reg_1] > known[reg_2]
+                    else:
+                        condition = known[reg_1] < known[reg_2]
+                    if condition == True:
+                        source = reg_3
+                    else:
+                        source = reg_4
+                if source == None:
+                    known.pop(reg_5, None)
+                else:
+                    replacement = self.copy_instruction(source, reg_5, known)
+            elif instruction == "COPY":
+                replacement = self.copy_instruction(parameters[0], parameters[1], known)
+            elif instruction == "SET":
+                replacement = self.set_instruction(parameters[0], parameters[1] % self.limit, known, original)
+            elif instruction == "ADD":
+                reg_1, reg_2, reg_3 = parameters
+                if reg_1 in known and reg_2 in known:
+                    result = known[reg_1] + known[reg_2]
+                    content = result % self.limit
+                    carry = result // self.limit
+                    carry_known = "CARRY" in known and known["CARRY"] == carry
+                    content_known = reg_3 in known and known[reg_3] == content
+                    if reg_3 == "CARRY":
+                        replacement = self.set_instruction("CARRY", carry, known, original)
+                    elif carry_known == True or "CARRY" not in live_after[instruction_number]:
+                        # The carry out is either already in CARRY or never read, so only the sum needs to be written
+                        replacement = self.set_instruction(reg_3, content, known, original)
+                        if carry_known == False:
+                            known.pop("CARRY", None)
+                    elif content_known == True or reg_3 not in live_after[instruction_number]:
+                        replacement = self.set_instruction("CARRY", carry, known, original)
+                        if replacement == original:
+                            known[reg_3] = content
+                        elif content_known == False:
+                            known.pop(reg_3, None)
+                    else:
+                        known[reg_3] = content
+                        known["CARRY"] = carry
+                else:
+                    known.pop(reg_3, None)
+                    known.pop("CARRY", None)
+            elif instruction in ["MUL", "SHUP", "SHDO", "AND", "OR", "XOR", "NOT"]:
+                operands = parameters[:-1]
+                destination = parameters[-1]
+                contents = list()
+                for register in operands:
+                    if register in known:
+                        contents.append(known[register])
+                if len(contents) == len(operands):
+                    replacement = self.set_instruction(destination, evaluate_operation(instruction, contents, self.bit_width), known, original)
+                else:
+                    known.pop(destination, None)
+            elif instruction == "LOAD":
+                known.pop(parameters, None)
+            elif instruction == "SETMEMAD":
+                if "MEMAD" in known and known["MEMAD"] == parameters:
+                    replacement = None
+                else:
+                    known["MEMAD"] = parameters
+            elif instruction == "ADDMEMAD":
+                if "MEMAD" in known and parameters in known:
+                    address = known["MEMAD"] + known[parameters]
+                    if address == known["MEMAD"]:
+                        replacement = None
+                    else:
+                        # MEMAD is not truncated to the bit width, so neither is the folded address
+                        replacement = ("SETMEMAD", address)
+                        known["MEMAD"] = address
+                else:
+                    known.pop("MEMAD", None)
+            if replacement == None:
+                last_dropped = (instruction, parameters, instruction_number)
+            else:
+                instructions.append((replacement[0], replacement[1], instruction_number))
+        if len(instructions) == 0 and last_dropped != None:
+            # Every dropped instruction does nothing here, so one is kept to stop the block from becoming empty(which errors out instead of looping)
+            instructions.append(last_dropped)
+        if self.autoloop_block == True and self.graph.lengths[block_id] > 0:
+            exits.append((block_id, known, False))
+        return((instructions, exits))
+    def invariant_sets(self):
+        """
+        Finds the SETs at the start of a block(before anything else uses the register or can jump away) that are redundant when coming from some blocks, usually the block itself looping around
+        Returns a dict of block ID -> list of (register, content) for the SETs to put before the JMP at the end of the other blocks that continue in it
+        Once moved the SET is redundant on every way into the block and gets dropped when the program is folded again
+        """
+        folded_blocks = dict()
+        entries = dict()
+        for block_id in self.program.block_ids:
+            entries[block_id] = list()
+        for block_id in self.program.block_ids:
+            if self.entry_states[block_id] != None:
+                folded_blocks[block_id], exits = self.fold_block(block_id)
+                for target, state, hoistable in exits:
+                    entries[target].append((block_id, state, hoistable))
+        insertions = dict()
+        for block_id in folded_blocks:
+            # START is also entered when the run starts, where nothing is known
+            if block_id == "START":
+                continue
+            used_registers = set()
+            for instruction, parameters, instruction_number in folded_blocks[block_id]:
+                if instruction in ["JIE", "JNE", "JMP", "END"]:
+                    break
+                if instruction == "SET" and parameters[0] not in used_registers:
+                    register, content = parameters
+                    known_entries = 0
+                    hoist_blocks = list()
+                    for source_block_id, state, hoistable in entries[block_id]:
+                        if register in state and state[register] == content:
+                            known_entries = known_entries + 1
+                        elif hoistable == True:
+                            hoist_blocks.append(source_block_id)
+                        else:
+                            hoist_blocks = None
+                            break
+                    if hoist_blocks != None and known_entries > 0 and len(hoist_blocks) > 0:
+                        for source_block_id in hoist_blocks:
+                            insertions.setdefault(source_block_id, []).append((register, content))
+                used_registers.update(CPU_engine.instruction_read_registers(instruction, parameters))
+                used_registers.update(CPU_engine.instruction_written_registers(instruction, parameters))
+        return(insertions)
+    def folded_program(self, insertions = {}):
+        """
+        Returns a copy of the program with every reached block folded, the blocks that are never reached are kept as they are
+        insertions holds SETs to put before the JMP at the end of blocks(see invariant_sets), they have no source line or origin
+        """
+        program = self.program
+        blocks = list()
+        for block_id in program.block_ids:
+            if self.entry_states[block_id] == None:
+                instructions = list()
+                block = program.program_instructions[block_id]
+                for instruction_number in range(len(block)):
+                    instruction, parameters = block[str(instruction_number)]
+                    instructions.append((instruction, parameters, instruction_number))
+            else:
+                instructions = self.fold_block(block_id)[0]
+            if block_id in insertions:
+                jump = instructions.pop()
+                for register, content in insertions[block_id]:
+                    instructions.append(("SET", (register, content), None))
+                instructions.append(jump)
+            blocks.append((block_id, instructions))
+        return(rebuilt_program(program, blocks))
+
+def fold_constants(program, bit_width, autoloop_block = True, observed_registers = None):
+    """
+    Returns a copy of the program with the register contents known ahead of running propagated through it(see constant_folder)
+    ALU instructions on known contents become SETs, comparisons with a known outcome become COPYs or SETs, ADDMEMADs of known addresses become SETMEMADs,
+    jumps with a known outcome become JMPs or are dropped, and SETs(and the other folded writes) of contents a register already holds are dropped
+    SETs that are only needed the first time a loop is entered are moved in front of the loop(see constant_folder.invariant_sets) and the program is folded again
+    The results depend on the bit width, so the program must be run with the bit width it was folded for
+    """
+    for fold_round in range(max_fold_rounds_global):
+        folder = constant_folder(program, bit_width, autoloop_block, observed_registers)
+        insertions = folder.invariant_sets()
+        program = folder.folded_program(insertions)
+        if len(insertions) == 0:
+            break
+    return(program)
+
+def new_program(block_ids, program_instructions, source_lines, line_count, origins = None, block_ends = None, register_names = None):
+    """
+    Returns a program object(see CPU_ASM_parser.program) holding the given blocks, for programs that are not parsed from lines
+    origins maps every block ID to a dict of instruction number -> (block ID, instruction number) of the instruction of the parsed program it was made from(see original_point)
+    block_ends maps every block ID to the (block ID, instruction number) of the parsed program that running past the end of the block errors out at
+    register_names are the registers of the parsed program, they are given their slots even if the blocks no longer use them(see CPU_engine.program_register_names)
+    """
+    result = CPU_ASM_parser.program.__new__(CPU_ASM_parser.program)
+    result.block_ids = block_ids
+    result.program_instructions = program_instructions
+    result.source_lines = source_lines
+    result.line_count = line_count
+    result.sections = None
+    result.origins = origins
+    result.block_ends = block_ends
+    result.register_names = register_names
+    return(result)
+
+def instruction_origin(program, block_id, instruction_number):
+    """
+    Returns the (block ID, instruction number) of the instruction of the parsed program that an instruction of the program was made from, None if it was added by an optimization
+    """
+    origins = getattr(program, "origins", None)
+    if origins == None:
+        return((block_id, instruction_number))
+    return(origins[block_id].get(str(instruction_number)))
+
+def block_end_origin(program, block_id, length):
+    """
+    Returns the (block ID, instruction number) of the parsed program that running past the end of a block of the program errors out at, length is the amount of reachable instructions of the block
+    """
+    block_ends = getattr(program, "block_ends", None)
+    if block_ends == None:
+        return((block_id, length))
+    return(block_ends.get(block_id))
+
+def rebuilt_program(program, blocks):
+    """
+    Returns a new program made of the given blocks, which hold instructions of the program(possibly changed) in a new order
+    blocks is a list of (block ID, list of (instruction, parameters, source)) where source is the instruction of the program it was made from as either an instruction number within the same block, a (block ID, instruction number) or None for new instructions
+    The instructions keep the source lines and origins of their sources, and the program keeps every register of the program even if no instruction uses it anymore
+    A block that runs past its end does so where the block with the same ID of the program does(the passes only add instructions in front of a JMP or END), so the end of that block is kept as well
+    """
+    graph = control_flow_graph(program)
+    block_ids = list()
+    program_instructions = dict()
+    source_lines = dict()
+    origins = dict()
+    block_ends = dict()
+    for block_id, instructions in blocks:
+        new_block = dict()
+        new_block_source_lines = dict()
+        new_block_origins = dict()
+        for new_number in range(len(instructions)):
+            instruction, parameters, source = instructions[new_number]
+            new_block[str(new_number)] = (instruction, parameters)
+            if source == None:
+                continue
+            if type(source) == int:
+                source = (block_id, source)
+            source_block_id, instruction_number = source
+            line_index = program.source_lines.get(source_block_id, {}).get(str(instruction_number))
+            if line_index != None:
+                new_block_source_lines[str(new_number)] = line_index
+            origin = instruction_origin(program, source_block_id, instruction_number)
+            if origin != None:
+                new_block_origins[str(new_number)] = origin
+        block_ids.append(block_id)
+        program_instructions[block_id] = new_block
+        source_lines[block_id] = new_block_source_lines
+        origins[block_id] = new_block_origins
+        if block_id in graph.lengths:
+            block_ends[block_id] = block_end_origin(program, block_id, graph.lengths[block_id])
+    return(new_program(block_ids, program_instructions, source_lines, getattr(program, "line_count", 0), origins, block_ends, CPU_engine.program_register_names(program)))
+
+def original_point(program, execution_point, autoloop_block = True):
+    """
+    Maps an execution point of an optimized program back to the matching execution point of the parsed program it was optimized from, for logs and error messages
+    Points of parsed programs, ("END", 0) and points that can not be mapped are returned as they are
+    Points past the end of a block are mapped like the instruction execution continues with when looping around(autoloop_block), otherwise to the point the original block runs past its end at
+    Instructions added by an optimization are mapped like the next instruction of their block that has an origin
+    """
+    origins = getattr(program, "origins", None)
+    block_id, instruction_number = execution_point
+    if origins == None or block_id not in origins:
+        return(execution_point)
+    block_length = len(program.program_instructions[block_id])
+    if block_length == 0:
+        return(execution_point)
+    if instruction_number >= block_length:
+        if autoloop_block == True:
+            instruction_number = instruction_number % block_length
+        else:
+            # Dead instructions at the end of the block may have been removed, so the kept ones can not tell where the original block ends
+            block_ends = getattr(program, "block_ends", None)
+            if block_ends == None or block_ends.get(block_id) == None:
+                return(execution_point)
+            end_block_id, end_number = block_ends[block_id]
+            return((end_block_id, end_number + instruction_number - block_length))
+    block_origins = origins[block_id]
+    for number in range(instruction_number, block_length):
+        if str(number) in block_origins:
+            return(block_origins[str(number)])
+    return(execution_point)
+
+def remove_dead_code(program, autoloop_block = True, observed_registers = None):
+    """
+    Returns a copy of the program without the blocks that can not be reached from START, the instructions after the first JMP or END of a block and the instructions whose writes are dead(see register_liveness)
+    Once the program ends(or errors out) the observed registers and the RAM hold the same contents as with the original program, the amount of steps and the registers that are not observed can differ
+    Runs that are stopped before the end(ie by an instruction budget) can see different intermediate states
+    Kept instructions are renumbered within their block and keep their source lines and origins(see original_point)
+    """
+    graph = control_flow_graph(program, autoloop_block)
+    liveness = register_liveness(graph, observed_registers)
+    reachable = graph.reachable_blocks()
+    blocks = list()
+    for block_id in program.block_ids:
+        if block_id not in reachable:
+            continue
+        block = program.program_instructions[block_id]
+        dead = liveness.block_liveness(block_id)[2]
+        kept_numbers = list()
+        for instruction_number in range(graph.lengths[block_id]):
+            if dead[instruction_number] == False:
+                kept_numbers.append(instruction_number)
+        if len(kept_numbers) == 0 and graph.lengths[block_id] > 0:
+            # A block that only loops around on itself must keep an instruction, as an empty block errors out instead of looping forever
+            kept_numbers.append(graph.lengths[block_id] - 1)
+        instructions = list()
+        for instruction_number in kept_numbers:
+            instruction, parameters = block[str(instruction_number)]
+            instructions.append((instruction, parameters, instruction_number))
+        blocks.append((block_id, instructions))
+    return(rebuilt_program(program, blocks))
+
+def jump_target(instruction, parameters):
+    """
+    Returns the block a jump instruction can continue in, None for the other instructions
+    """
+    if instruction == "JMP":
+        return(parameters)
+    elif instruction in ["JIE", "JNE"]:
+        return(parameters[2])
+    return(None)
+
+def retarget_jump(instruction, parameters, target):
+    """
+    Returns the parameters of the jump instruction with its target block replaced
+    """
+    if instruction == "JMP":
+        return(target)
+    return((parameters[0], parameters[1], target))
+
+def ends_in_jump(instructions):
+    """
+    Returns the target of the JMP that ends the instructions(a list of (instruction, parameters, source)), None if they do not end in a JMP
+    """
+    if len(instructions) > 0 and instructions[-1][0] == "JMP":
+        return(instructions[-1][1])
+    return(None)
+
+def never_falls_through(instructions):
+    """
+    Returns True if the instructions end in a JMP or END, so that execution never runs past their end(or loops around)
+    """
+    return(len(instructions) > 0 and instructions[-1][0] in ["JMP", "END"])
+
+def layout_blocks(program, autoloop_block = True):
+    """
+    Returns a copy of the program with its blocks laid out so that fewer jumps are executed
+    Jumps to a block that starts with a JMP go straight to the block that JMP leads to(jump threading, chains are followed until they loop)
+    A block whose only way in is the JMP at the end of one other block is merged into that block
+    Blocks of up to max_tail_length_global instructions that end in a JMP or END are copied into the blocks that end by JMPing to them, as long as those stay within max_layout_block_length_global instructions
+    Blocks that can then no longer be reached from START are dropped, as are the instructions after the first JMP or END of a block
+    Apart from running fewer JMPs the execution is unchanged, original_point maps its execution points back to the original block IDs
+    """
+    graph = control_flow_graph(program, autoloop_block)
+    block_ids = list(program.block_ids)
+    blocks = dict()
+    for block_id in block_ids:
+        block = program.program_instructions[block_id]
+        instructions = list()
+        for instruction_number in range(graph.lengths[block_id]):
+            instruction, parameters = block[str(instruction_number)]
+            instructions.append((instruction, parameters, (block_id, instruction_number)))
+        blocks[block_id] = instructions
+    # Jump threading
+    for block_id in block_ids:
+        instructions = blocks[block_id]
+        for instruction_number in range(len(instructions)):
+            instruction, parameters, source = instructions[instruction_number]
+            target = jump_target(instruction, parameters)
+            if target == None:
+                continue
+            seen = set()
+            while target not in seen and len(blocks[target]) > 0 and blocks[target][0][0] == "JMP":
+                seen.add(target)
+                target = blocks[target][0][1]
+            instructions[instruction_number] = (instruction, retarget_jump(instruction, parameters, target), source)
+    # Amount of ways into every block, merging keeps these the same for the blocks that are left
+    entries = dict()
+    for block_id in block_ids:
+        entries[block_id] = 0
+    entries["START"] = 1
+    for block_id in block_ids:
+        for instruction, parameters, source in blocks[block_id]:
+            target = jump_target(instruction, parameters)
+            if target != None:
+                entries[target] = entries[target] + 1
+        if autoloop_block == True and never_falls_through(blocks[block_id]) == False:
+            entries[block_id] = entries[block_id] + 1
+    # Merging blocks into their only predecessor
+    for block_id in block_ids:
+        if block_id not in blocks:
+            continue
+        target = ends_in_jump(blocks[block_id])
+        while target != None and target != block_id and entries[target] == 1 and never_falls_through(blocks[target]) == True:
+            blocks[block_id] = blocks[block_id][:-1] + blocks[target]
+            del blocks[target]
+            target = ends_in_jump(blocks[block_id])
+    block_ids = [block_id for block_id in block_ids if block_id in blocks]
+    # Copying small tail blocks into the blocks that JMP to them, every tail at most once per block so that loops between tails can not grow a block forever
+    for block_id in block_ids:
+        copied = set()
+        target = ends_in_jump(blocks[block_id])
+        while target != None and target != block_id and target not in copied:
+            tail = blocks[target]
+            if len(tail) > max_tail_length_global or never_falls_through(tail) == False:
+                break
+            if len(blocks[block_id]) - 1 + len(tail) > max_layout_block_length_global:
+                break
+            copied.add(target)
+            blocks[block_id] = blocks[block_id][:-1] + tail
+            target = ends_in_jump(blocks[block_id])
+    laid_out_program = rebuilt_program(program, [(block_id, blocks[block_id]) for block_id in block_ids])
+    reachable = control_flow_graph(laid_out_program, autoloop_block).reachable_blocks()
+    unreachable_block_ids = [block_id for block_id in block_ids if block_id not in reachable]
+    for block_id in unreachable_block_ids:
+        laid_out_program.block_ids.remove(block_id)
+        del laid_out_program.program_instructions[block_id]
+        del laid_out_program.source_lines[block_id]
+        del laid_out_program.origins[block_id]
+        del laid_out_program.block_ends[block_id]
+    return(laid_out_program)
+
+def optimize_program(program, bit_width, autoloop_block = True, observed_registers = None):
+    """
+    Runs every optimization pass over the program and returns the optimized copy, see remove_dead_code for what is kept unchanged
+    The result depends on the bit width(see fold_constants), execution points of the result can be mapped back to the program with original_point
+    """
+    program = fold_constants(program, bit_width, autoloop_block, observed_registers)
+    program = remove_dead_code(program, autoloop_block, observed_registers)
+    return(layout_blocks(program, autoloop_block))
@@ -0,0 +1,165 @@
+import hashlib
+import marshal
+import os
+import sys
+import time
+
+import CPU_ASM_parser
+
+# Bumped whenever the layout of the cache files changes
+cache_format_version_global = 2
+# Default size limit of a cache directory in bytes
+default_max_bytes_global = 64 * 1024 * 1024
+# Temporary files older than this(in seconds) were left behind by a process that died while writing and get removed on eviction
+stale_temporary_age_global = 3600
+cache_file_suffix_global = ".program"
+temporary_file_suffix_global = ".tmp"
+
+def parser_digest():
+    """
+    Returns a digest of the parser source(CPU_ASM_parser.py) so that cached programs are never used with a different parser than the one that produced them
+    """
+    digest = hashlib.sha256()
+    try:
+        with open(CPU_ASM_parser.__file__, "rb") as parser_file:
+            digest.update(parser_file.read())
+    except (OSError, AttributeError):
+        # No source to hash(ie a frozen build), the Python version below still separates incompatible caches
+        pass
+    # marshal data is only guaranteed to load on the Python version that wrote it
+    digest.update((str(cache_format_version_global)+" "+str(marshal.version)+" "+sys.version).encode("utf-8"))
+    return(digest.hexdigest())
+
+parser_digest_global = parser_digest()
+
+class parse_cache():
+    def __init__(self, directory, max_bytes = default_max_bytes_global):
+        """
+        Cache of parsed programs(see CPU_ASM_parser.program) kept as files in directory, keyed by a hash of the source lines and the parser
+        A cached program is stored with marshal as (block_ids, program_instructions, source_lines, line_count) in a file named after its key
+        Files are written to a temporary file and renamed into place, so readers only ever see complete files and any amount of processes can share the directory
+        Every hit updates the modification time of the file, and whenever a new program is stored the least recently used files are removed until the directory fits in max_bytes
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok = True)
+    def key(self, assembly_string_lines):
+        digest = hashlib.sha256(parser_digest_global.encode("ascii"))
+        for line in assembly_string_lines:
+            # Trailing line breaks are ignored like the parser does, so a file gives the same key as its split lines
+            digest.update(line.rstrip("\r\n").encode("utf-8", "surrogatepass"))
+            digest.update(b"\n")
+        return(digest.hexdigest())
+    def get_program(self, assembly_string_lines):
+        """
+        Returns the parsed program of the lines, from the cache if it holds them and otherwise by parsing them(and storing the result)
+        Lines that fail to parse raise the same errors as CPU_ASM_parser.program and are not cached
+        """
+        assembly_string_lines = list(assembly_string_lines)
+        key = self.key(assembly_string_lines)
+        cached_program = self.load(key)
+        if cached_program != None:
+            self.hits = self.hits + 1
+            return(cached_program)
+        self.misses = self.misses + 1
+        parsed_program = CPU_ASM_parser.program(assembly_string_lines)
+        self.store(key, parsed_program)
+        return(parsed_program)
+    def get_file_program(self, file_path):
+        """
+        Works like get_program for the lines of an ASM file
+        The file is read only once, so the key and the parsed program always come from the same contents even if the file is changed in between
+        """
+        with open(file_path, "r") as asm_file:
+            assembly_string_lines = asm_file.readlines()
+        return(self.get_program(assembly_string_lines))
+    def load(self, key):
+        """
+        Returns the cached program with the given key or None if it is not cached(or the file is unreadable, in which case it is removed)
+        """
+        file_path = os.path.join(self.directory, key + cache_file_suffix_global)
+        try:
+            with open(file_path, "rb") as cache_file:
+                data = cache_file.read()
+        except OSError:
+            return(None)
+        try:
+            block_ids, program_instructions, source_lines, line_count = marshal.loads(data)
+        except (EOFError, ValueError, TypeError):
+            remove_file(file_path)
+            return(None)
+        try:
+            # Mark the file as recently used for the eviction
+            os.utime(file_path)
+        except OSError:
+            pass
+        cached_program = CPU_ASM_parser.program.__new__(CPU_ASM_parser.program)
+        cached_program.block_ids = block_ids
+        cached_program.program_instructions = program_instructions
+        cached_program.source_lines = source_lines
+        cached_program.line_count = line_count
+        cached_program.sections = None
+        return(cached_program)
+    def store(self, key, parsed_program):
+        """
+        Writes the program to the cache under the given key and evicts the least recently used files if the cache got too big
+        """
+        data = marshal.dumps((parsed_program.block_ids, parsed_program.program_instructions, parsed_program.source_lines, parsed_program.line_count))
+        file_path = os.path.join(self.directory, key + cache_file_suffix_global)
+        temporary_path = file_path + "." + str(os.getpid()) + "." + os.urandom(4).hex() + temporary_file_suffix_global
+        try:
+            with open(temporary_path, "wb") as cache_file:
+                cache_file.write(data)
+            # Atomic, a concurrent writer of the same key simply replaces the file with identical contents
+            os.replace(temporary_path, file_path)
+        except OSError:
+            remove_file(temporary_path)
+            return
+        self.evict()
+    def evict(self):
+        """
+        Removes the least recently used cached programs until the cache fits in max_bytes
+        Files removed by another process in the meantime are skipped
+        """
+        entries = list()
+        total_bytes = 0
+        now = time.time()
+        try:
+            file_names = os.listdir(self.directory)
+        except OSError:
+            return
+        for file_name in file_names:
+            file_path = os.path.join(self.directory, file_name)
+            try:
+                file_stat = os.stat(file_path)
+            except OSError:
+                continue
+            if file_name.endswith(temporary_file_suffix_global):
+                if now - file_stat.st_mtime > stale_temporary_age_global:
+                    remove_file(file_path)
+            elif file_name.endswith(cache_file_suffix_global):
+                entries.append((file_stat.st_mtime, file_stat.st_size, file_path))
+                total_bytes = total_bytes + file_stat.st_size
+        if total_bytes <= self.max_bytes:
+            return
+        entries.sort()
+        for modification_time, size, file_path in entries:
+            if total_bytes <= self.max_bytes:
+                break
+            remove_file(file_path)
+            total_bytes = total_bytes - size
+    def clear(self):
+        """
+        Removes every cached program
+        """
+        for file_name in os.listdir(self.directory):
+            if file_name.endswith(cache_file_suffix_global):
+                remove_file(os.path.join(self.directory, file_name))
+
+def remove_file(file_path):
+    try:
+        os.remove(file_path)
+    except OSError:
+        pass
@@ -0,0 +1,245 @@
+import time
+
+import CPU_engine
+
+# Deepest block path kept for the collapsed stacks, older frames are dropped beyond this
+max_stack_depth_global = 64
+# Amount of instructions listed in the hottest instructions part of the report
+report_top_instructions_global = 20
+
+class profiler():
+    def __init__(self, layout, program, timing = True):
+        """
+        Collects an execution profile of a program without keeping an execution log
+        layout is the decoded program(see CPU_engine.decoded_program) of the program, every count is kept in a list indexed by its pc
+        The following is recorded:
+        executions and host time of every instruction, which give the per opcode and per instruction numbers
+        entries of every block(the executions of its first instruction)
+        taken counts of every JIE/JNE(not taken is the executions minus taken)
+        instructions executed per path of blocks for the collapsed stacks, where every block entered is a frame and re-entering a block on the path returns to it
+        Host time is measured with a clock read after every instruction and can be switched off with timing
+        """
+        self.layout = layout
+        self.timing = timing
+        pcs = len(layout.handlers)
+        self.hits = [0] * pcs
+        self.host_time = [0.0] * pcs
+        self.taken = [0] * pcs
+        # Instruction and parameters of every pc, None for the fall off and halt slots
+        self.instructions = [None] * pcs
+        # Target pc of every JIE/JNE, -1 for all other pcs
+        self.branch_targets = [-1] * pcs
+        # Block ID of every pc that starts a block
+        self.block_of_start = dict()
+        # Whether the pc is the last one of a block(so pc + 1 starts another block and a jump there looks like stepping to the next instruction)
+        self.ends_block = [False] * pcs
+        for block_id in program.block_ids:
+            start = layout.block_starts[block_id]
+            block = program.program_instructions[block_id]
+            self.block_of_start[start] = block_id
+            if len(block) > 0:
+                self.ends_block[start + len(block) - 1] = True
+            for instruction_number in range(len(block)):
+                instruction, parameters = block[str(instruction_number)]
+                self.instructions[start + instruction_number] = (instruction, parameters)
+                if instruction in ["JIE", "JNE"]:
+                    self.branch_targets[start + instruction_number] = layout.block_starts[parameters[2]]
+        self.path = None
+        self.path_blocks = None
+        self.path_key = None
+        self.stack_counts = dict()
+    def start_path(self, pc):
+        block_id = self.layout.points[pc][0]
+        self.path = [block_id]
+        self.path_blocks = {block_id}
+        self.path_key = str(block_id)
+    def enter_block(self, block_id, pending):
+        """
+        Adds the instructions executed since the last block entry to the current path and moves the path to the entered block
+        """
+        if pending > 0:
+            self.stack_counts[self.path_key] = self.stack_counts.get(self.path_key, 0) + pending
+        if block_id in self.path_blocks:
+            # Back edge, return to the frame of the block
+            while self.path[-1] != block_id:
+                self.path_blocks.discard(self.path.pop())
+        else:
+            self.path.append(block_id)
+            self.path_blocks.add(block_id)
+            if len(self.path) > max_stack_depth_global:
+                self.path_blocks.discard(self.path.pop(0))
+        self.path_key = ";".join(str(path_block) for path_block in self.path)
+    def flush_path(self, pending):
+        if pending > 0:
+            self.stack_counts[self.path_key] = self.stack_counts.get(self.path_key, 0) + pending
+    def record(self, starting_execution_point, new_execution_point, elapsed):
+        """
+        Records a single instruction that was stepped through the interpreter
+        """
+        pc = self.layout.point_to_pc(starting_execution_point)
+        next_pc = self.layout.point_to_pc(new_execution_point)
+        if self.path == None:
+            self.start_path(pc)
+        self.hits[pc] = self.hits[pc] + 1
+        self.host_time[pc] = self.host_time[pc] + elapsed
+        pending = 1
+        if next_pc != pc + 1 or self.ends_block[pc] == True:
+            if next_pc == self.branch_targets[pc]:
+                self.taken[pc] = self.taken[pc] + 1
+            block_id = self.block_of_start.get(next_pc)
+            if block_id != None:
+                self.enter_block(block_id, pending)
+                pending = 0
+        self.flush_path(pending)
+    def run(self, cpu, steps):
+        """
+        Executes up to the given amount of instructions with the handlers of the layout while recording the profile
+        Works like CPU_engine.decoded_program.run and returns the amount of instructions that were executed
+        """
+        handlers = self.layout.handlers
+        hits = self.hits
+        host_time = self.host_time
+        taken = self.taken
+        branch_targets = self.branch_targets
+        block_of_start = self.block_of_start
+        ends_block = self.ends_block
+        timing = self.timing
+        perf_counter = time.perf_counter
+        registers = cpu.registers.slots
+        memory = cpu.memory
+        pc = self.layout.point_to_pc(cpu.execution_point)
+        if self.path == None:
+            self.start_path(pc)
+        executed = steps
+        step = 0
+        pending = 0
+        last_time = perf_counter()
+        try:
+            for step in range(steps):
+                next_pc = handlers[pc](registers, memory)
+                if timing == True:
+                    now = perf_counter()
+                    host_time[pc] = host_time[pc] + (now - last_time)
+                    last_time = now
+                hits[pc] = hits[pc] + 1
+                pending = pending + 1
+                if next_pc != pc + 1 or ends_block[pc] == True:
+                    if next_pc == branch_targets[pc]:
+                        taken[pc] = taken[pc] + 1
+                    block_id = block_of_start.get(next_pc)
+                    if block_id != None:
+                        self.enter_block(block_id, pending)
+                        pending = 0
+                pc = next_pc
+        except CPU_engine.execution_halted:
+            executed = step
+        except Exception as e:
+            CPU_engine.record_executed_steps(e, step)
+            raise
+        finally:
+            self.flush_path(pending)
+            cpu.execution_point = self.layout.points[pc]
+        return(executed)
+    def opcode_profile(self):
+        """
+        Returns a dict of instruction(prefix) -> (executions, host time)
+        """
+        result = dict()
+        for pc in range(len(self.hits)):
+            if self.hits[pc] == 0 or self.instructions[pc] == None:
+                continue
+            instruction = self.instructions[pc][0]
+            executions, host_time = result.get(instruction, (0, 0.0))
+            result[instruction] = (executions + self.hits[pc], host_time + self.host_time[pc])
+        return(result)
+    def block_profile(self):
+        """
+        Returns a dict of block ID -> (entries, executed instructions, host time)
+        """
+        result = dict()
+        for block_id in self.layout.block_starts:
+            start = self.layout.block_starts[block_id]
+            end = start + self.layout.block_lengths[block_id]
+            entries = 0
+            if self.layout.block_lengths[block_id] > 0:
+                entries = self.hits[start]
+            result[block_id] = (entries, sum(self.hits[start:end]), sum(self.host_time[start:end]))
+        return(result)
+    def instruction_profile(self):
+        """
+        Returns a dict of execution point (block_id, num) -> (executions, host time) for every instruction that was executed
+        """
+        result = dict()
+        for pc in range(len(self.hits)):
+            if self.hits[pc] > 0 and self.instructions[pc] != None:
+                result[self.layout.points[pc]] = (self.hits[pc], self.host_time[pc])
+        return(result)
+    def branch_profile(self):
+        """
+        Returns a dict of execution point (block_id, num) -> (taken, not taken) for every JIE/JNE that was executed
+        """
+        result = dict()
+        for pc in range(len(self.hits)):
+            if self.branch_targets[pc] != -1 and self.hits[pc] > 0:
+                result[self.layout.points[pc]] = (self.taken[pc], self.hits[pc] - self.taken[pc])
+        return(result)
+    def collapsed_stacks(self):
+        """
+        Returns the profile in the collapsed stack format read by flamegraph tools, one "frame;frame;frame count" line per block path
+        """
+        lines = list()
+        for path_key in sorted(self.stack_counts):
+            lines.append(path_key+" "+str(self.stack_counts[path_key]))
+        return("\n".join(lines)+"\n")
+    def write_collapsed_stacks(self, file_path):
+        with open(file_path, "w") as stacks_file:
+            stacks_file.write(self.collapsed_stacks())
+    def report(self):
+        """
+        Returns a text report of the profile
+        """
+        total_executions = sum(self.hits)
+        total_time = sum(self.host_time)
+        lines = ["Profile of "+str(total_executions)+" instructions("+str(round(total_time, 6))+"s host time)"]
+        lines.append("-----")
+        lines.append("Opcodes(executions, share, host time, ns per instruction)")
+        opcodes = self.opcode_profile()
+        for instruction in sorted(opcodes, key = lambda name: opcodes[name][0], reverse = True):
+            executions, host_time = opcodes[instruction]
+            lines.append("  "+instruction.ljust(9)+str(executions).rjust(12)+format_share(executions, total_executions)+(str(round(host_time, 6))+"s").rjust(14)+str(int(host_time / executions * 1e9)).rjust(10))
+        lines.append("-----")
+        lines.append("Blocks(entries, executed instructions, share, host time)")
+        blocks = self.block_profile()
+        for block_id in sorted(blocks, key = lambda name: blocks[name][1], reverse = True):
+            entries, executions, host_time = blocks[block_id]
+            if executions == 0:
+                continue
+            lines.append("  "+str(block_id).ljust(24)+str(entries).rjust(12)+str(executions).rjust(12)+format_share(executions, total_executions)+(str(round(host_time, 6))+"s").rjust(14))
+        branches = self.branch_profile()
+        if len(branches) > 0:
+            lines.append("-----")
+            lines.append("Branches(taken, not taken)")
+            for point in sorted(branches, key = lambda point: sum(branches[point]), reverse = True):
+                taken, not_taken = branches[point]
+                instruction = self.instructions[self.layout.point_to_pc(point)][0]
+                lines.append("  "+(str(point[0])+":"+str(point[1])+" "+instruction).ljust(32)+str(taken).rjust(12)+str(not_taken).rjust(12))
+        lines.append("-----")
+        lines.append("Hottest instructions(executions, host time)")
+        instructions = self.instruction_profile()
+        hottest = sorted(instructions, key = lambda point: instructions[point][0], reverse = True)
+        for point in hottest[0:report_top_instructions_global]:
+            executions, host_time = instructions[point]
+            instruction, parameters = self.instructions[self.layout.point_to_pc(point)]
+            lines.append("  "+(str(point[0])+":"+str(point[1])+" "+instruction+" "+format_parameters(parameters)).ljust(48)+str(executions).rjust(12)+(str(round(host_time, 6))+"s").rjust(14))
+        return("\n".join(lines)+"\n")
+
+def format_share(part, total):
+    if total == 0:
+        return("0.0%".rjust(8))
+    return((str(round(100 * part / total, 1))+"%").rjust(8))
+
+def format_parameters(parameters):
+    # Single parameter instructions hold the parameter itself instead of a tuple
+    if isinstance(parameters, tuple):
+        return(" ".join(str(parameter) for parameter in parameters))
+    return(str(parameters))
@@ -0,0 +1,155 @@
+import argparse
+import concurrent.futures
+import hashlib
+import json
+import sys
+import time
+
+import CPU_core
+import CPU_ASM_parser
+import CPU_parse_cache
+
+fallback_max_instructions = 1000000
+fallback_engine = "compiled"
+
+# Parsed programs of this process keyed by file path, every worker process parses each file only once
+parsed_programs_global = dict()
+
+def get_parsed_program(file_path, cache_directory = None):
+    """
+    Returns the parsed program of the ASM file, parsing it on first use in this process
+    If cache_directory is given the parsed program is taken from(or stored in) the CPU_parse_cache.parse_cache in that directory instead of always parsing it
+    """
+    parsed_program = parsed_programs_global.get(file_path)
+    if parsed_program == None:
+        if cache_directory != None:
+            parsed_program = CPU_parse_cache.parse_cache(cache_directory).get_file_program(file_path)
+        else:
+            with open(file_path, "r") as asm_file:
+                parsed_program = CPU_ASM_parser.program(asm_file)
+        parsed_programs_global[file_path] = parsed_program
+    return(parsed_program)
+
+def memory_digest(memory):
+    """
+    Returns a SHA-256 hex digest of the memory contents(as returned by CPU.get_memory) that does not depend on the order the addresses were written in
+    """
+    digest = hashlib.sha256()
+    for address in sorted(memory, key = int):
+        digest.update((address+":"+str(memory[address])+"\n").encode("ascii"))
+    return(digest.hexdigest())
+
+def run_job(job_number, job):
+    """
+    Runs a single sweep job and returns its result as a dict
+    A job is a dict with the keys:
+    "file": path to the ASM file
+    "bit_width": bit width of the CPU
+    "max_instructions"(optional): instruction budget of the run
+    "engine"(optional): execution engine of the CPU(see CPU_core.valid_engines_global)
+    "registers"(optional): dict of register name to initial contents
+    "memory"(optional): dict of memory address to initial contents
+    "parse_cache"(optional): directory of the parse cache to get the parsed program from(see get_parsed_program)
+    "detect_cycles"(optional): if True the run stops with the "cycle" halted reason once the state of the CPU repeats(see CPU_core.CPU)
+    Errors are reported in the "error" key of the result instead of being raised
+    """
+    result = {"job": job_number, "file": job.get("file"), "bit_width": job.get("bit_width")}
+    start_time = time.perf_counter()
+    try:
+        parsed_program = get_parsed_program(job["file"], job.get("parse_cache"))
+        CPU_obj = CPU_core.CPU(job["bit_width"], engine = job.get("engine", fallback_engine), log_policy = "off", detect_cycles = job.get("detect_cycles", False))
+        CPU_obj.load_program(parsed_program)
+        initial_registers = job.get("registers", {})
+        for register in initial_registers:
+            CPU_obj.registers.update(register, initial_registers[register])
+        initial_memory = job.get("memory", {})
+        for address in initial_memory:
+            CPU_obj.memory.update(int(address), initial_memory[address])
+        summary = CPU_obj.run(max_instructions = job.get("max_instructions", fallback_max_instructions))
+        memory = CPU_obj.get_memory()
+        result["halted_reason"] = summary.halted_reason
+        if summary.cycle != None:
+            result["cycle_length"] = summary.cycle[0]
+            result["cycle_block"] = summary.cycle[1]
+        result["steps"] = summary.steps
+        result["run_time"] = summary.elapsed
+        result["instructions_per_second"] = summary.instructions_per_second
+        result["registers"] = CPU_obj.get_registers()
+        result["memory_words"] = len(memory)
+        result["memory_digest"] = memory_digest(memory)
+    except Exception as e:
+        result["error"] = str(type(e).__name__)+": "+str(e)
+    result["total_time"] = time.perf_counter() - start_time
+    return(result)
+
+def run_sweep(jobs, workers = None):
+    """
+    Runs the jobs in a process pool(with workers processes, all cores by default) and yields every result dict as soon as its job completes
+    Results arrive in completion order, their "job" key is the index of the job in jobs
+    """
+    with concurrent.futures.ProcessPoolExecutor(max_workers = workers) as executor:
+        futures = list()
+        for job_number in range(len(jobs)):
+            futures.append(executor.submit(run_job, job_number, jobs[job_number]))
+        for future in concurrent.futures.as_completed(futures):
+            yield(future.result())
+
+def parse_bit_widths(bit_widths_string):
+    """
+    Parses a list of bit widths such as "8,16,32" or "1-64" or a mix of both("1-8,16,32")
+    """
+    bit_widths = list()
+    for part in bit_widths_string.split(","):
+        part = part.strip()
+        if "-" in part:
+            first, last = part.split("-", 1)
+            bit_widths.extend(range(int(first), int(last) + 1))
+        else:
+            bit_widths.append(int(part))
+    for bit_width in bit_widths:
+        if bit_width < 1:
+            raise ValueError("Invalid bit width(<1): "+str(bit_width))
+    return(bit_widths)
+
+def main(arguments = None):
+    parser = argparse.ArgumentParser(description = "Runs ASM programs over a sweep of bit widths in parallel and prints one JSON result per line as each job completes")
+    parser.add_argument("files", nargs = "*", help = "ASM files to run")
+    parser.add_argument("--bit-widths", default = "8", help = "bit widths to run every file with, ie 8,16,32 or 1-64(default: 8)")
+    parser.add_argument("--max-instructions", type = int, default = fallback_max_instructions, help = "instruction budget of every run(default: "+str(fallback_max_instructions)+")")
+    parser.add_argument("--engine", default = fallback_engine, choices = CPU_core.valid_engines_global, help = "execution engine(default: "+fallback_engine+")")
+    parser.add_argument("--jobs", help = "JSON file with a list of job dicts(see run_job), run in addition to the files")
+    parser.add_argument("--initial-state", help = "JSON file with a dict of \"registers\" and/or \"memory\" to start every file run with")
+    parser.add_argument("--detect-cycles", action = "store_true", help = "stop every run once the state of the CPU repeats, as it would then never end")
+    parser.add_argument("--parse-cache", help = "directory to cache parsed programs in across runs(see CPU_parse_cache.py)")
+    parser.add_argument("--workers", type = int, default = None, help = "amount of worker processes(default: one per core)")
+    parser.add_argument("--output", help = "file to write the results to instead of stdout")
+    arguments = parser.parse_args(arguments)
+    initial_state = {}
+    if arguments.initial_state != None:
+        with open(arguments.initial_state, "r") as state_file:
+            initial_state = json.load(state_file)
+    jobs = list()
+    for bit_width in parse_bit_widths(arguments.bit_widths):
+        for file_path in arguments.files:
+            job = {"file": file_path, "bit_width": bit_width, "max_instructions": arguments.max_instructions, "engine": arguments.engine, "detect_cycles": arguments.detect_cycles, "parse_cache": arguments.parse_cache}
+            job.update(initial_state)
+            jobs.append(job)
+    if arguments.jobs != None:
+        with open(arguments.jobs, "r") as jobs_file:
+            jobs.extend(json.load(jobs_file))
+    if len(jobs) == 0:
+        parser.error("No jobs given, pass ASM files and/or --jobs")
+    if arguments.output != None:
+        output = open(arguments.output, "w")
+    else:
+        output = sys.stdout
+    try:
+        for result in run_sweep(jobs, arguments.workers):
+            output.write(json.dumps(result)+"\n")
+            output.flush()
+    finally:
+        if output != sys.stdout:
+            output.close()
+
+if __name__ == "__main__":
+    main()
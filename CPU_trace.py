@@ -0,0 +1,266 @@
+import json
+import mmap
+import struct
+import zlib
+
+# Every instruction gets a fixed ID in the trace records
+trace_instructions_global = ["END", "JMP", "JNE", "JIE",
+                             "CMP", "GT", "LT",
+                             "ADD", "MUL",
+                             "SHUP", "SHDO",
+                             "NOT", "AND", "OR", "XOR",
+                             "LOAD", "STORE", "SET", "COPY", "SETMEMAD", "ADDMEMAD"]
+trace_magic_global = b"CPUTRACE"
+trace_version_global = 2
+# Header: magic, version, flags, record size, chunk size(records per chunk), record count, side table offset
+trace_header_format_global = "<8sHHIIQQ"
+trace_header_size_global = struct.calcsize(trace_header_format_global)
+# Record: step number, instruction ID, write count, block index, instruction number(64 bits like the step number), then 2 writes of (kind, target, value)
+trace_record_format_global = "<QBBIQBQQBQQ"
+trace_record_size_global = struct.calcsize(trace_record_format_global)
+# Write kinds, the big flags mark that the target/value is an index into the big value table because it does not fit into 64 bits
+write_none_global = 0
+write_register_global = 1
+write_memory_global = 2
+write_big_target_global = 4
+write_big_value_global = 8
+# Flags of the trace file
+flag_compressed_global = 1
+max_word_global = 2**64 - 1
+
+class trace_writer():
+    def __init__(self, file_path, compress = False, chunk_records = 65536):
+        """
+        Creates a trace file that execution log entries are streamed into as fixed width struct packed records
+        Each record holds the step number, the instruction ID, the execution point(as a block index and instruction number) and up to 2 register/memory writes
+        Register names, block IDs and values that do not fit into 64 bits are interned into a side table that is written at the end of the file by close()
+        If compress is True, every chunk of chunk_records records is zlib compressed separately so that a chunk can still be read back on its own
+        """
+        self.file_path = file_path
+        self.compress = compress
+        self.chunk_records = chunk_records
+        self.trace_file = open(file_path, "wb")
+        self.record_count = 0
+        self.register_ids = dict()
+        self.register_names = list()
+        self.block_ids = dict()
+        self.block_names = list()
+        self.big_values = list()
+        # (file offset, compressed size) of every compressed chunk
+        self.chunks = list()
+        self.buffer = bytearray()
+        self.buffered_records = 0
+        self.record_struct = struct.Struct(trace_record_format_global)
+        self.instruction_ids = dict()
+        for instruction_id in range(len(trace_instructions_global)):
+            self.instruction_ids[trace_instructions_global[instruction_id]] = instruction_id
+        self.write_header(0)
+    def __enter__(self):
+        return(self)
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    def write_header(self, side_table_offset):
+        flags = 0
+        if self.compress == True:
+            flags = flags | flag_compressed_global
+        header = struct.pack(trace_header_format_global, trace_magic_global, trace_version_global, flags, trace_record_size_global, self.chunk_records, self.record_count, side_table_offset)
+        self.trace_file.seek(0)
+        self.trace_file.write(header)
+    def intern_register(self, register):
+        register_id = self.register_ids.get(register)
+        if register_id == None:
+            register_id = len(self.register_names)
+            self.register_ids[register] = register_id
+            self.register_names.append(register)
+        return(register_id)
+    def intern_block(self, block_id):
+        block_index = self.block_ids.get(block_id)
+        if block_index == None:
+            block_index = len(self.block_names)
+            self.block_ids[block_id] = block_index
+            self.block_names.append(block_id)
+        return(block_index)
+    def pack_word(self, value, kind, big_flag):
+        """
+        Returns (kind, word) where word is the value itself or its index in the big value table if it does not fit into 64 bits
+        """
+        if value > max_word_global:
+            self.big_values.append(value)
+            return(kind | big_flag, len(self.big_values) - 1)
+        return(kind, value)
+    def write_entry(self, step, execution_info):
+        """
+        Appends the record of a single execution log entry(see CPU.get_execution_log) for the given step number
+        """
+        instruction, involved_parameters, changed_parameters, starting_execution_point, new_execution_point = execution_info
+        writes = list()
+        if instruction == "STORE":
+            writes.append((write_memory_global, involved_parameters["MEMAD"][1], involved_parameters["Reg_1"][1]))
+        else:
+            for key in changed_parameters:
+                register, value = changed_parameters[key]
+                writes.append((write_register_global, self.intern_register(register), value))
+        if len(writes) > 2:
+            raise ValueError("Execution log entry has more writes than a trace record can hold: "+str(execution_info))
+        fields = [step, self.instruction_ids[instruction], len(writes), self.intern_block(starting_execution_point[0]), starting_execution_point[1]]
+        for write_index in range(2):
+            if write_index < len(writes):
+                kind, target, value = writes[write_index]
+                kind, target = self.pack_word(target, kind, write_big_target_global)
+                kind, value = self.pack_word(value, kind, write_big_value_global)
+                fields.extend([kind, target, value])
+            else:
+                fields.extend([write_none_global, 0, 0])
+        self.buffer.extend(self.record_struct.pack(*fields))
+        self.buffered_records = self.buffered_records + 1
+        self.record_count = self.record_count + 1
+        if self.buffered_records >= self.chunk_records:
+            self.flush()
+    def flush(self):
+        """
+        Writes the buffered records to the file(as one compressed chunk if compression is enabled)
+        """
+        if self.buffered_records == 0:
+            return
+        if self.compress == True:
+            data = zlib.compress(bytes(self.buffer))
+            self.chunks.append((self.trace_file.tell(), len(data)))
+            self.trace_file.write(data)
+        else:
+            self.trace_file.write(self.buffer)
+        self.buffer = bytearray()
+        self.buffered_records = 0
+    def close(self):
+        """
+        Flushes the remaining records, writes the side table and finalizes the header
+        """
+        if self.trace_file.closed:
+            return
+        self.flush()
+        side_table_offset = self.trace_file.tell()
+        side_table = {"instructions": trace_instructions_global,
+                      "registers": self.register_names,
+                      "blocks": self.block_names,
+                      # Stored as strings as JSON readers are not required to handle integers of arbitary size
+                      "big_values": [str(value) for value in self.big_values],
+                      "chunks": self.chunks}
+        self.trace_file.write(json.dumps(side_table).encode("utf-8"))
+        self.write_header(side_table_offset)
+        self.trace_file.close()
+
+class trace_reader():
+    def __init__(self, file_path):
+        """
+        Opens a trace file written by trace_writer with mmap for random access to its records
+        Uncompressed traces find record k directly from its offset, compressed traces decompress the one chunk holding it(the last chunk used is kept)
+        """
+        self.trace_file = open(file_path, "rb")
+        self.data = mmap.mmap(self.trace_file.fileno(), 0, access = mmap.ACCESS_READ)
+        magic, version, flags, record_size, chunk_records, record_count, side_table_offset = struct.unpack_from(trace_header_format_global, self.data, 0)
+        if magic != trace_magic_global:
+            raise ValueError("Not a CPU trace file: "+str(file_path))
+        if version != trace_version_global or record_size != trace_record_size_global:
+            raise ValueError("Unsupported CPU trace version "+str(version)+" in file: "+str(file_path))
+        if side_table_offset == 0:
+            raise ValueError("CPU trace file was not closed properly: "+str(file_path))
+        self.compressed = (flags & flag_compressed_global) != 0
+        self.chunk_records = chunk_records
+        self.record_count = record_count
+        self.record_struct = struct.Struct(trace_record_format_global)
+        side_table = json.loads(self.data[side_table_offset:].decode("utf-8"))
+        self.instructions = side_table["instructions"]
+        self.register_names = side_table["registers"]
+        self.block_names = side_table["blocks"]
+        self.big_values = [int(value) for value in side_table["big_values"]]
+        self.chunks = side_table["chunks"]
+        self.cached_chunk_index = None
+        self.cached_chunk = None
+    def __len__(self):
+        return(self.record_count)
+    def __enter__(self):
+        return(self)
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    def close(self):
+        self.data.close()
+        self.trace_file.close()
+    def get_chunk(self, chunk_index):
+        if chunk_index != self.cached_chunk_index:
+            offset, size = self.chunks[chunk_index]
+            self.cached_chunk = zlib.decompress(self.data[offset:offset + size])
+            self.cached_chunk_index = chunk_index
+        return(self.cached_chunk)
+    def get_raw_record(self, record_index):
+        """
+        Returns the unpacked fields of record k as a tuple
+        """
+        if record_index < 0 or record_index >= self.record_count:
+            raise IndexError("Trace record "+str(record_index)+" out of range")
+        if self.compressed == True:
+            chunk = self.get_chunk(record_index // self.chunk_records)
+            return(self.record_struct.unpack_from(chunk, (record_index % self.chunk_records) * trace_record_size_global))
+        return(self.record_struct.unpack_from(self.data, trace_header_size_global + record_index * trace_record_size_global))
+    def iterate_raw_records(self):
+        """
+        Yields the unpacked fields of every record in order
+        """
+        if self.compressed == True:
+            for chunk_index in range(len(self.chunks)):
+                for fields in self.record_struct.iter_unpack(self.get_chunk(chunk_index)):
+                    yield(fields)
+        else:
+            # Records are copied out of the mmap a chunk's worth at a time, slicing the whole record area would copy the entire trace into memory
+            # No view of the mmap is kept while yielding, so the reader can still be closed before the iteration finishes
+            end = trace_header_size_global + self.record_count * trace_record_size_global
+            batch_size = max(self.chunk_records, 1) * trace_record_size_global
+            for start in range(trace_header_size_global, end, batch_size):
+                for fields in self.record_struct.iter_unpack(self.data[start:min(start + batch_size, end)]):
+                    yield(fields)
+    def decode_word(self, kind, word, big_flag):
+        if kind & big_flag:
+            return(self.big_values[word])
+        return(word)
+    def decode_record(self, fields):
+        """
+        Turns the raw fields of a record into (step, instruction, execution_point(block_id, num), writes)
+        Each write is ("register", register name, value) or ("memory", memory address, value)
+        """
+        step, instruction_id, write_count, block_index, instruction_number = fields[0:5]
+        writes = list()
+        for write_index in range(write_count):
+            kind, target, value = fields[5 + 3*write_index: 8 + 3*write_index]
+            target = self.decode_word(kind, target, write_big_target_global)
+            value = self.decode_word(kind, value, write_big_value_global)
+            if kind & write_register_global:
+                writes.append(("register", self.register_names[target], value))
+            else:
+                writes.append(("memory", target, value))
+        return((step, self.instructions[instruction_id], (self.block_names[block_index], instruction_number), writes))
+    def get_record(self, record_index):
+        """
+        Returns record k decoded(see decode_record)
+        """
+        return(self.decode_record(self.get_raw_record(record_index)))
+    def iterate(self, instruction = None, register = None):
+        """
+        Yields the decoded records, optionally only those of the given instruction and/or those writing the given register
+        The filters are checked on the raw fields so records that do not match are never decoded
+        """
+        if instruction != None:
+            instruction_id = self.instructions.index(instruction)
+        if register != None:
+            if register not in self.register_names:
+                return
+            register_id = self.register_names.index(register)
+        for fields in self.iterate_raw_records():
+            if instruction != None and fields[1] != instruction_id:
+                continue
+            if register != None:
+                written = False
+                for write_index in range(fields[2]):
+                    kind = fields[5 + 3*write_index]
+                    if kind & write_register_global and not kind & write_big_target_global and fields[6 + 3*write_index] == register_id:
+                        written = True
+                if written == False:
+                    continue
+            yield(self.decode_record(fields))